@@ -0,0 +1,29 @@
+"""add documents.chunk_hashes manifest
+
+Revision ID: b7c1d9e2f3a4
+Revises: a2f1b3c4d5e6
+Create Date: 2026-10-17 09:00:00.000000
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = "b7c1d9e2f3a4"
+down_revision: Union[str, None] = "a2f1b3c4d5e6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # NULL = indexed before content-addressed chunk ids (or never indexed)
+    op.add_column(
+        "documents",
+        sa.Column("chunk_hashes", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("documents", "chunk_hashes")
@@ -11,6 +11,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_current_org_id
 from app.core.database import get_db
+from app.rag.retriever import kb_collection_name
 from app.rag.retriever import search as rag_search
 from app.schemas.common import MessageResponse
 from app.schemas.knowledge_base import (
@@ -20,7 +21,7 @@ from app.schemas.knowledge_base import (
     SearchQuery,
     SearchResult,
 )
-from app.services import knowledge_base_service
+from app.services import knowledge_base_service, provider_key_service
 
 logger = structlog.get_logger("kb_api")
 
@@ -66,10 +67,14 @@ async def list_documents(
 async def upload_document(
     kb_id: UUID,
     file: UploadFile,
+    replace: bool = Query(default=False),
     org_id: UUID = Depends(get_current_org_id),
     db: AsyncSession = Depends(get_db),
 ):
-    """Upload a document — returns immediately, processes in background."""
+    """Upload a document — returns immediately, processes in background.
+
+    Pass `replace=true` to re-index an existing document with the same filename.
+    """
     content = await file.read()
     return await knowledge_base_service.upload_document(
         kb_id,
@@ -78,6 +83,7 @@ async def upload_document(
         len(content),
         content,
         db,
+        replace=replace,
     )
 
 
@@ -180,11 +186,13 @@ async def search_knowledge_base(
     kb_id: UUID,
     body: SearchQuery,
     org_id: UUID = Depends(get_current_org_id),
+    db: AsyncSession = Depends(get_db),
 ):
     """Search a knowledge base."""
-    collection_name = f"kb_{kb_id}"
+    collection_name = kb_collection_name(kb_id)
+    openai_key = await provider_key_service.get_key(org_id, "openai", db)
     try:
-        results = await rag_search(collection_name, body.query, body.top_k)
+        results = await rag_search(collection_name, body.query, body.top_k, openai_key)
         return [
             SearchResult(
                 content=r["content"],
@@ -1,79 +1,53 @@
 """WebSocket endpoint for live voice calls."""
 
+import asyncio
 import json
-import struct
 import time
+from collections.abc import AsyncGenerator
 from uuid import UUID
 
 import structlog
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core import metrics
+from app.core.config import settings
 from app.core.database import async_session_factory
 from app.core.security import verify_token
-from app.models.agent import Agent
 from app.models.call import Call, CallStatus
-from app.models.knowledge_base import KnowledgeBase
-from app.models.user import User
-from app.services import provider_key_service
+from app.services import voice_bootstrap_service
+from app.services.voice_bootstrap_service import AgentBootstrap
+from app.voice.audio import PcmBuffer
 from app.voice.pipeline import VoicePipeline
+from app.voice.response_cache import cache_namespace
+from app.voice.stt import LiveTranscription
+from app.voice.vad import VoiceActivityDetector
 
 logger = structlog.get_logger("voice_ws")
 router = APIRouter()
 
-# WAV header for 16-bit PCM mono 16kHz
-def _wav_header(data_len: int, sample_rate: int = 16000, channels: int = 1, bits: int = 16) -> bytes:
-    """Build a minimal WAV header for raw PCM data."""
-    byte_rate = sample_rate * channels * bits // 8
-    block_align = channels * bits // 8
-    header = struct.pack(
-        "<4sI4s4sIHHIIHH4sI",
-        b"RIFF",
-        36 + data_len,
-        b"WAVE",
-        b"fmt ",
-        16,
-        1,  # PCM
-        channels,
-        sample_rate,
-        byte_rate,
-        block_align,
-        bits,
-        b"data",
-        data_len,
-    )
-    return header
-
 
-async def _get_agent_and_keys(
-    agent_id: UUID, org_id: UUID, db: AsyncSession
-) -> tuple[Agent | None, dict[str, str], str | None]:
-    """Load agent, provider keys, and KB collection name."""
-    result = await db.execute(
-        select(Agent).where(Agent.id == agent_id, Agent.organization_id == org_id)
-    )
-    agent = result.scalar_one_or_none()
-    if agent is None:
-        return None, {}, None
-
-    # Gather provider keys
-    keys: dict[str, str] = {}
-    for provider in ["openai", "deepgram", "google", "anthropic", "groq", "deepseek"]:
-        key = await provider_key_service.get_key(org_id, provider, db)
-        if key:
-            keys[provider] = key
-
-    # Check for KB
-    collection_name: str | None = None
-    kb_result = await db.execute(
-        select(KnowledgeBase).where(KnowledgeBase.agent_id == agent_id).limit(1)
+def _bootstrap_error(bootstrap: AgentBootstrap | None) -> str | None:
+    """Reason a call can't start, or None if the agent is usable."""
+    if bootstrap is None:
+        return "Agent not found"
+    if bootstrap.llm_provider not in bootstrap.keys:
+        return f"No API key configured for {bootstrap.llm_provider}. Add it in Settings → API Keys."
+    if "deepgram" not in bootstrap.keys:
+        return "No Deepgram API key configured. Add it in Settings → API Keys."
+    return None
+
+
+def _response_cache_namespace(bootstrap: AgentBootstrap) -> str | None:
+    """Response cache namespace if the agent opted in to semantic caching."""
+    if not settings.RESPONSE_CACHE_ENABLED or not bootstrap.agent_metadata.get("semantic_cache"):
+        return None
+    return cache_namespace(
+        str(bootstrap.agent_id),
+        bootstrap.system_prompt,
+        bootstrap.kb_version,
+        bootstrap.tts_voice,
+        bootstrap.language,
     )
-    kb = kb_result.scalar_one_or_none()
-    if kb:
-        collection_name = f"kb_{kb.id}"
-
-    return agent, keys, collection_name
 
 
 @router.websocket("/voice/{agent_id}")
@@ -86,11 +60,23 @@ async def voice_websocket(
 
     Protocol:
     - Client sends binary frames (raw 16-bit PCM 16kHz mono audio)
-    - Client sends JSON `{"type": "end_turn"}` to signal end of speech
-    - Server responds with JSON transcript + binary audio frames
-    - Server sends JSON `{"type": "transcript", "role": "user"|"assistant", "text": "..."}`
-    - Server sends binary frames (mp3/wav audio from TTS)
-    - Server sends JSON `{"type": "audio_end"}` when done streaming audio
+    - Server-side VAD trims silence and ends the turn automatically after
+      `VAD_ENDPOINT_SILENCE_MS` of trailing silence, sending JSON
+      `{"type": "speech_started"}` / `{"type": "speech_ended"}`
+    - Client may still send JSON `{"type": "end_turn"}` to end the turn early
+    - Audio is streamed to a live STT session as it arrives; the server sends
+      JSON `{"type": "interim_transcript", "text": "...", "is_final": bool}`
+      while the caller is speaking
+    - Server sends JSON `{"type": "transcript", "role": "user", "text": "..."}`
+    - Server streams binary frames (mp3 audio from TTS) sentence by sentence
+      while the LLM is still generating
+    - Server sends JSON `{"type": "transcript", "role": "assistant", "text": "..."}`
+      once the client has had time to play the reply, then `{"type": "audio_end"}`
+    - If the caller starts speaking before then, the reply is cancelled and
+      the assistant transcript is cut to the sentences the client has played
+      (sent with `"interrupted": true`), then the server sends JSON
+      `{"type": "audio_interrupted"}`; clients should stop the audio playing
+      and drop queued audio
     """
     # Auth
     try:
@@ -103,63 +89,41 @@ async def voice_websocket(
     await websocket.accept()
     logger.info("voice_ws_connected", agent_id=agent_id, user_id=str(user_id))
 
-    # Load agent + keys
+    # Agent config, decrypted keys and KB come from one query (cached per
+    # worker); the call record is inserted on the same session.
+    call_id: UUID | None = None
     async with async_session_factory() as db:
-        # Get user org
-        user = await db.get(User, user_id)
-        if not user or not user.organization_id:
-            await websocket.send_json({"type": "error", "message": "No organization"})
+        bootstrap = await voice_bootstrap_service.get_bootstrap(UUID(agent_id), user_id, db)
+        error = _bootstrap_error(bootstrap)
+        if bootstrap is None or error:
+            await websocket.send_json({"type": "error", "message": error})
             await websocket.close()
             return
 
-        org_id = user.organization_id
-        agent, keys, collection_name = await _get_agent_and_keys(
-            UUID(agent_id), org_id, db
+        metrics.bind_org(str(bootstrap.org_id))
+        keys = bootstrap.keys
+        logger.info(
+            "building_pipeline",
+            llm_provider=bootstrap.llm_provider,
+            keys_available=list(keys.keys()),
+            has_openai="openai" in keys,
+        )
+        pipeline = VoicePipeline(
+            model=bootstrap.llm_model,
+            system_prompt=bootstrap.system_prompt,
+            voice=bootstrap.tts_voice,
+            language=bootstrap.language,
+            collection_name=bootstrap.collection_name,
+            provider=bootstrap.llm_provider,
+            api_keys=keys,
+            response_cache_namespace=_response_cache_namespace(bootstrap),
         )
 
-    if agent is None:
-        await websocket.send_json({"type": "error", "message": "Agent not found"})
-        await websocket.close()
-        return
-
-    # Check for required keys
-    llm_provider = agent.llm_provider or "openai"
-    if llm_provider not in keys:
-        await websocket.send_json({
-            "type": "error",
-            "message": f"No API key configured for {llm_provider}. Add it in Settings → API Keys.",
-        })
-        await websocket.close()
-        return
-
-    if "deepgram" not in keys:
-        await websocket.send_json({
-            "type": "error",
-            "message": "No Deepgram API key configured. Add it in Settings → API Keys.",
-        })
-        await websocket.close()
-        return
-
-    # Build pipeline
-    logger.info("building_pipeline", llm_provider=llm_provider, keys_available=list(keys.keys()), has_openai="openai" in keys)
-    pipeline = VoicePipeline(
-        model=agent.llm_model,
-        system_prompt=agent.system_prompt,
-        voice=agent.tts_voice,
-        language=agent.language,
-        collection_name=collection_name,
-        provider=llm_provider,
-        api_keys=keys,
-    )
-
-    await websocket.send_json({"type": "ready", "agent": agent.name})
+        await websocket.send_json({"type": "ready", "agent": bootstrap.name})
 
-    # Create call record
-    call_id: UUID | None = None
-    async with async_session_factory() as db:
         call = Call(
-            agent_id=UUID(agent_id),
-            organization_id=org_id,
+            agent_id=bootstrap.agent_id,
+            organization_id=bootstrap.org_id,
             status=CallStatus.IN_PROGRESS,
         )
         db.add(call)
@@ -167,9 +131,133 @@ async def voice_websocket(
         call_id = call.id
         logger.info("call_started", call_id=str(call_id))
 
-    audio_buffer = bytearray()
+    audio_buffer = PcmBuffer()
+    turn_bytes = 0
     transcripts: list[dict] = []
+    turn_latencies: list[dict[str, int]] = []
     call_start = time.time()
+    vad = VoiceActivityDetector() if settings.VAD_ENABLED else None
+
+    async def send_interim(text: str, is_final: bool) -> None:
+        await websocket.send_json(
+            {"type": "interim_transcript", "text": text, "is_final": is_final}
+        )
+        # Start knowledge-base retrieval before the caller has finished speaking
+        if live_stt is not None:
+            pipeline.speculate(live_stt.partial_transcript)
+
+    live_stt: LiveTranscription | None = None
+    response_task: asyncio.Task | None = None
+
+    async def stream_reply(turn: AsyncGenerator[dict | bytes | memoryview, None]) -> None:
+        """Forward transcripts and audio as the pipeline produces them."""
+        timing = metrics.current_turn()
+        try:
+            async for item in turn:
+                if isinstance(item, dict):
+                    await websocket.send_json(item)
+                    if item["type"] == "transcript":
+                        transcripts.append({"role": item["role"], "text": item["text"]})
+                else:
+                    if timing is not None:
+                        # End of the caller's turn → first reply audio on the wire
+                        timing.mark("first_audio")
+                    with metrics.timed("ws_send"):
+                        # ASGI messages carry bytes, not buffer views
+                        await websocket.send_bytes(bytes(item))
+
+            await websocket.send_json({"type": "audio_end"})
+
+        except Exception as exc:
+            logger.error("pipeline_error", error=str(exc))
+            await websocket.send_json(
+                {
+                    "type": "error",
+                    "message": f"Processing error: {str(exc)[:200]}",
+                }
+            )
+        finally:
+            # On barge-in, settle the pipeline (cancel LLM, truncate history) now
+            await turn.aclose()
+            if timing is not None and timing.stages:
+                turn_latencies.append(timing.as_dict())
+
+    async def interrupt() -> None:
+        """Cancel the reply being generated or played when the caller barges in."""
+        nonlocal response_task
+        if response_task is None or response_task.done():
+            return
+        response_task.cancel()
+        await asyncio.wait([response_task])
+        response_task = None
+
+        spoken = pipeline.last_spoken
+        if spoken:
+            transcripts.append({"role": "assistant", "text": spoken})
+            await websocket.send_json(
+                {
+                    "type": "transcript",
+                    "role": "assistant",
+                    "text": spoken,
+                    "interrupted": True,
+                }
+            )
+        await websocket.send_json({"type": "audio_interrupted"})
+        logger.info("barge_in", spoken_len=len(spoken))
+
+    async def run_turn() -> None:
+        """Transcribe the buffered turn and start streaming the agent's reply."""
+        nonlocal turn_bytes, response_task
+        if turn_bytes < 3200:  # < 0.1s of audio at 16kHz
+            turn_bytes = 0
+            audio_buffer.clear()
+            if live_stt is not None:
+                await live_stt.finalize()
+            pipeline.cancel_speculation()
+            return
+        turn_bytes = 0
+
+        # A new turn supersedes any reply still being spoken
+        await interrupt()
+        metrics.start_turn()
+
+        try:
+            if live_stt is not None:
+                user_text = await live_stt.finalize()
+                turn = pipeline.stream_user_turn(user_text)
+            else:
+                # Upload the buffered PCM in place, then reuse the buffer
+                try:
+                    user_text = await pipeline.stt.transcribe_pcm(
+                        audio_buffer.view(), pipeline.language
+                    )
+                finally:
+                    audio_buffer.clear()
+                turn = pipeline.stream_user_turn(user_text)
+        except Exception as exc:
+            logger.error("pipeline_error", error=str(exc))
+            await websocket.send_json(
+                {
+                    "type": "error",
+                    "message": f"Processing error: {str(exc)[:200]}",
+                }
+            )
+            return
+
+        # Run the reply as its own task so the receive loop keeps reading frames
+        response_task = asyncio.create_task(stream_reply(turn))
+
+    # Greet the caller straight away (pre-rendered, usually a cache hit);
+    # barging in cancels it like any other reply
+    response_task = asyncio.create_task(
+        stream_reply(pipeline.stream_greeting(bootstrap.greeting_message))
+    )
+
+    # One live STT session per call; fall back to per-turn uploads if it can't open
+    try:
+        live_stt = await pipeline.stt.open_live(pipeline.language, on_transcript=send_interim)
+    except Exception as exc:
+        logger.warning("stt_live_unavailable", error=str(exc))
 
     try:
         while True:
@@ -178,9 +266,29 @@ async def voice_websocket(
             if message.get("type") == "websocket.disconnect":
                 break
 
-            # Binary frame → audio chunk
+            # Binary frame → audio chunk (only speech is kept when VAD is on)
             if "bytes" in message and message["bytes"]:
-                audio_buffer.extend(message["bytes"])
+                audio = message["bytes"]
+                speech_ended = False
+                if vad is not None:
+                    result = vad.process(audio)
+                    audio, speech_ended = result.audio, result.speech_ended
+                    if result.speech_started:
+                        await websocket.send_json({"type": "speech_started"})
+                        if settings.BARGE_IN_ENABLED:
+                            await interrupt()
+
+                if audio:
+                    turn_bytes += len(audio)
+                    if live_stt is not None:
+                        await live_stt.send(audio)
+                    else:
+                        audio_buffer.extend(audio)
+
+                if speech_ended:
+                    # Trailing silence reached the endpoint — end the turn server-side
+                    await websocket.send_json({"type": "speech_ended"})
+                    await run_turn()
                 continue
 
             # Text frame → JSON command
@@ -193,51 +301,9 @@ async def voice_websocket(
                 msg_type = data.get("type", "")
 
                 if msg_type == "end_turn":
-                    if len(audio_buffer) < 3200:  # < 0.1s of audio at 16kHz
-                        audio_buffer.clear()
-                        continue
-
-                    # Wrap raw PCM in WAV header for Deepgram
-                    pcm_data = bytes(audio_buffer)
-                    wav_data = _wav_header(len(pcm_data)) + pcm_data
-                    audio_buffer.clear()
-
-                    try:
-                        user_text, agent_text, audio_response = (
-                            await pipeline.process_audio(wav_data)
-                        )
-
-                        # Send user transcript
-                        await websocket.send_json({
-                            "type": "transcript",
-                            "role": "user",
-                            "text": user_text,
-                        })
-                        transcripts.append({"role": "user", "text": user_text})
-
-                        # Send agent transcript
-                        await websocket.send_json({
-                            "type": "transcript",
-                            "role": "assistant",
-                            "text": agent_text,
-                        })
-                        transcripts.append({"role": "assistant", "text": agent_text})
-
-                        # Send audio in chunks (8KB each)
-                        chunk_size = 8192
-                        for i in range(0, len(audio_response), chunk_size):
-                            await websocket.send_bytes(
-                                audio_response[i : i + chunk_size]
-                            )
-
-                        await websocket.send_json({"type": "audio_end"})
-
-                    except Exception as exc:
-                        logger.error("pipeline_error", error=str(exc))
-                        await websocket.send_json({
-                            "type": "error",
-                            "message": f"Processing error: {str(exc)[:200]}",
-                        })
+                    if vad is not None:
+                        vad.reset()
+                    await run_turn()
 
                 elif msg_type == "ping":
                     await websocket.send_json({"type": "pong"})
@@ -250,6 +316,11 @@ async def voice_websocket(
     except Exception as exc:
         logger.error("voice_ws_error", error=str(exc))
     finally:
+        if response_task is not None and not response_task.done():
+            response_task.cancel()
+        pipeline.cancel_speculation()
+        if live_stt is not None:
+            await live_stt.close()
         duration = int(time.time() - call_start)
         logger.info(
             "voice_ws_disconnected",
@@ -269,6 +340,10 @@ async def voice_websocket(
                         call.transcript = "\n".join(
                             f"{t['role'].title()}: {t['text']}" for t in transcripts
                         )
+                        call.call_metadata = {
+                            **(call.call_metadata or {}),
+                            "turn_latency_ms": turn_latencies,
+                        }
                         await db.commit()
                         logger.info("call_completed", call_id=str(call_id), duration=duration)
             except Exception as exc:
@@ -23,6 +23,12 @@ class Settings(BaseSettings):
     # Qdrant
     QDRANT_URL: str = "http://localhost:6333"
     QDRANT_API_KEY: str = ""
+    # 0: one collection per knowledge base; N: KBs share N tenant-indexed collections
+    # (run app.scripts.migrate_shared_collections before switching)
+    QDRANT_SHARED_COLLECTIONS: int = 0
+    # Vector storage of new collections: full, int8, binary, 512, int8-512
+    # (see app.rag.profiles; compare with app.scripts.storage_profile_report)
+    QDRANT_STORAGE_PROFILE: str = "full"
 
     # JWT
     JWT_SECRET: str = "change-me-jwt-secret-key"
@@ -37,8 +43,90 @@ class Settings(BaseSettings):
     # OpenAI
     OPENAI_API_KEY: str = ""
 
+    # Embeddings (content-addressed cache + micro-batching of single queries)
+    EMBEDDING_CACHE_MEMORY_ITEMS: int = 4096
+    EMBEDDING_CACHE_TTL_SECONDS: float = 7 * 86400.0
+    EMBEDDING_BATCH_WINDOW_MS: float = 5.0
+    EMBEDDING_BATCH_MAX_TEXTS: int = 64
+    # Bulk (document) embedding: token-bounded requests, sent concurrently
+    EMBEDDING_REQUEST_MAX_TOKENS: int = 50_000
+    EMBEDDING_REQUEST_MAX_INPUTS: int = 256
+    EMBEDDING_CONCURRENCY: int = 4
+    EMBEDDING_MAX_RETRIES: int = 5
+
+    # Document ingestion: chunks embedded and upserted per window
+    INGEST_WINDOW_CHUNKS: int = 256
+    # Ingestion worker tier (Celery, "ingestion" queue)
+    INGEST_WORKER_CONCURRENCY: int = 2
+    INGEST_MAX_RUNNING_PER_ORG: int = 2
+    INGEST_FAIRNESS_RETRY_SECONDS: float = 5.0
+    INGEST_TASK_TIME_LIMIT_SECONDS: int = 1800
+    # Text extraction process pool (PDF page ranges run in parallel). Each
+    # non-daemonic process that extracts owns EXTRACT_WORKERS children; Celery
+    # prefork children extract in-process, so the ingestion tier runs at most
+    # INGEST_WORKER_CONCURRENCY extractions at a time.
+    EXTRACT_WORKERS: int = 2
+    EXTRACT_PDF_PAGES_PER_JOB: int = 25
+    EXTRACT_TIMEOUT_SECONDS: float = 120.0
+    EXTRACT_MEMORY_LIMIT_MB: int = 2048
+    EXTRACT_MAX_JOBS_PER_PROCESS: int = 100
+    # Vector garbage collection: deletes run inline (queued if Qdrant fails, or
+    # always if disabled); a periodic job removes whatever was missed
+    VECTOR_DELETE_INLINE: bool = True
+    VECTOR_GC_INTERVAL_SECONDS: float = 6 * 3600.0
+    VECTOR_GC_BATCH_SIZE: int = 100
+
     # Deepgram
     DEEPGRAM_API_KEY: str = ""
+    DEEPGRAM_MAX_CONNECTIONS: int = 50
+    DEEPGRAM_KEEPALIVE_SECONDS: float = 30.0
+    DEEPGRAM_TIMEOUT_SECONDS: float = 15.0
+
+    # Conversation memory (per-call LLM history)
+    LLM_HISTORY_TOKEN_BUDGET: int = 1500
+    LLM_HISTORY_KEEP_TURNS: int = 3
+    LLM_SUMMARY_MAX_TOKENS: int = 200
+
+    # Speculative RAG: retrieve on interim transcripts, reuse if the final matches
+    RAG_SPECULATION_ENABLED: bool = True
+    RAG_SPECULATION_MIN_WORDS: int = 3
+    RAG_SPECULATION_SIMILARITY: float = 0.8
+
+    # Hybrid retrieval: dense + sparse (BM25) prefetch fused with RRF
+    RAG_HYBRID_ENABLED: bool = True
+    RAG_HYBRID_PREFETCH_LIMIT: int = 20
+
+    # In-process index for small knowledge bases (voice retrieval); Qdrant is the fallback
+    RAG_HOT_INDEX_ENABLED: bool = True
+    RAG_HOT_INDEX_MAX_CHUNKS: int = 5000
+    RAG_HOT_INDEX_MEMORY_MB: int = 256
+    RAG_HOT_INDEX_DTYPE: str = "float32"  # or "int8": 4x smaller, slightly approximate
+    RAG_HOT_INDEX_RECHECK_SECONDS: float = 300.0
+
+    # Voice call bootstrap cache (agent config + decrypted keys, per worker)
+    VOICE_BOOTSTRAP_CACHE_TTL_SECONDS: float = 300.0
+    VOICE_BOOTSTRAP_CACHE_SIZE: int = 2048
+
+    # Semantic response cache (opt-in per agent via agent_metadata.semantic_cache)
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_SIMILARITY: float = 0.95
+    RESPONSE_CACHE_MIN_WORDS: int = 4
+    RESPONSE_CACHE_TTL_SECONDS: float = 3600.0
+    RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+
+    # TTS audio cache (memory LRU + S3 tier for greetings)
+    TTS_CACHE_ENABLED: bool = True
+    TTS_CACHE_MEMORY_ITEMS: int = 512
+    TTS_CACHE_TTL_SECONDS: float = 86400.0
+    TTS_CACHE_STORAGE_ENABLED: bool = True
+
+    # Voice activity detection (server-side endpointing on the voice websocket)
+    VAD_ENABLED: bool = True
+    VAD_ENERGY_THRESHOLD_DB: float = -45.0
+    VAD_ENDPOINT_SILENCE_MS: int = 700
+    VAD_MIN_SPEECH_MS: int = 120
+    VAD_PADDING_MS: int = 200
+    BARGE_IN_ENABLED: bool = True
 
     # Stripe
     STRIPE_SECRET_KEY: str = ""
@@ -51,6 +139,10 @@ class Settings(BaseSettings):
     S3_BUCKET: str = "voxa-uploads"
     S3_REGION: str = "auto"
 
+    # Observability
+    # Bearer token for /metrics; the endpoint is not served when empty
+    METRICS_TOKEN: str = ""
+
     # Rate Limiting
     RATE_LIMIT_PER_MINUTE: int = 60
     RATE_LIMIT_PER_HOUR: int = 1000
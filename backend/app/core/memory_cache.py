@@ -0,0 +1,57 @@
+"""In-process LRU cache with per-entry TTL.
+
+For hot-path lookups that must not pay a Redis round trip. Each worker
+process has its own copy, so entries should be short-lived or explicitly
+invalidated.
+"""
+
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+
+
+class TTLCache[K: Hashable, V]:
+    """Bounded mapping whose entries expire `ttl` seconds after being set."""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: K) -> V | None:
+        """Return a live entry (marking it recently used), or None."""
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires, value = item
+        if expires < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: K, value: V, ttl: float | None = None) -> None:
+        """Store an entry, evicting the least recently used if full."""
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: K) -> V | None:
+        """Remove and return an entry."""
+        item = self._data.pop(key, None)
+        return item[1] if item is not None else None
+
+    def pop_where(self, predicate: Callable[[K, V], bool]) -> int:
+        """Remove every entry matching `predicate`; returns how many."""
+        doomed = [k for k, (_, v) in self._data.items() if predicate(k, v)]
+        for key in doomed:
+            del self._data[key]
+        return len(doomed)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        self._data.clear()
@@ -0,0 +1,256 @@
+"""In-process metrics with Prometheus text exposition.
+
+Metrics live in this worker's memory; each worker exposes its own values
+on `/metrics` and the scraper aggregates across workers.
+"""
+
+import hashlib
+import hmac
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from app.core.config import settings
+
+# Latency buckets in seconds, tuned for voice turns (tens of ms to seconds)
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.5, 5.0, 10.0)
+
+# Per-turn stages where only the first occurrence matters for the breakdown
+FIRST_ONLY_STAGES = {"llm_first_token", "tts_first_byte"}
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    """Render a Prometheus label set."""
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values, strict=True)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the text format."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def family(self) -> str:
+        """Metric family name used in the HELP and TYPE lines."""
+        return f"{self.name}_total"
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Increase the counter for a label set."""
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        """Current value for a label set."""
+        return self._values.get(tuple(str(labels.get(n, "")) for n in self.labelnames), 0.0)
+
+    def samples(self) -> Iterator[str]:
+        """Exposition lines for every label set."""
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}_total{_format_labels(self.labelnames, key)} {value}"
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+
+    type_name = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        """Set the gauge for a label set."""
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    @property
+    def family(self) -> str:
+        return self.name
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._series: dict[tuple[str, ...], list[float]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def family(self) -> str:
+        """Metric family name used in the HELP and TYPE lines."""
+        return self.name
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Record one observation."""
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def samples(self) -> Iterator[str]:
+        """Exposition lines for every label set."""
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._series.items()]
+        for key, series in items:
+            for bound, count in zip(self.buckets, series[:-2], strict=True):
+                labels = _format_labels(self.labelnames, key, f'le="{bound}"')
+                yield f"{self.name}_bucket{labels} {count}"
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            yield f"{self.name}_bucket{labels} {series[-2]}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-2]}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-1]}"
+
+
+_registry: dict[str, Counter | Gauge | Histogram] = {}
+
+
+def counter(name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+    """Get or register a counter."""
+    return _registry.setdefault(name, Counter(name, documentation, labelnames))  # type: ignore[return-value]
+
+
+def gauge(name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+    """Get or register a gauge."""
+    return _registry.setdefault(name, Gauge(name, documentation, labelnames))  # type: ignore[return-value]
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labelnames: tuple[str, ...] = (),
+    buckets: tuple[float, ...] = LATENCY_BUCKETS,
+) -> Histogram:
+    """Get or register a histogram."""
+    return _registry.setdefault(  # type: ignore[return-value]
+        name, Histogram(name, documentation, labelnames, buckets)
+    )
+
+
+def render() -> str:
+    """Render all metrics in the Prometheus text format."""
+    lines: list[str] = []
+    for metric in _registry.values():
+        lines.append(f"# HELP {metric.family} {metric.documentation}")
+        lines.append(f"# TYPE {metric.family} {metric.type_name}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+# --- Voice pipeline stage timing ---
+
+STAGE_SECONDS = histogram(
+    "voxa_voice_stage_seconds",
+    "Latency of voice pipeline stages",
+    ("stage", "provider", "model", "org"),
+)
+
+
+class TurnMetrics:
+    """Latency breakdown (in seconds) for one conversational turn."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.stages: dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        """Add time spent in a stage; repeated stages accumulate."""
+        if stage in FIRST_ONLY_STAGES:
+            self.stages.setdefault(stage, seconds)
+        else:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def mark(self, stage: str) -> None:
+        """Record the time since the turn started, once."""
+        self.stages.setdefault(stage, time.perf_counter() - self.started)
+
+    def as_dict(self) -> dict[str, int]:
+        """Breakdown in whole milliseconds, for storage."""
+        return {stage: round(seconds * 1000) for stage, seconds in self.stages.items()}
+
+
+# Bound per call/turn; asyncio tasks inherit them from the code that starts them
+_org: ContextVar[str] = ContextVar("metrics_org", default="")
+_turn: ContextVar[TurnMetrics | None] = ContextVar("metrics_turn", default=None)
+
+
+def org_label(org_id: str) -> str:
+    """Opaque, stable label for an organization; ids never leave the process."""
+    digest = hmac.new(settings.SECRET_KEY.encode(), org_id.encode(), hashlib.sha256)
+    return digest.hexdigest()[:12]
+
+
+def bind_org(org_id: str) -> None:
+    """Label subsequent stage timings in this context with a hashed organization."""
+    _org.set(org_label(org_id))
+
+
+def start_turn() -> TurnMetrics:
+    """Start collecting a per-turn breakdown in this context."""
+    turn = TurnMetrics()
+    _turn.set(turn)
+    return turn
+
+
+def current_turn() -> TurnMetrics | None:
+    """The turn being timed in this context, if any."""
+    return _turn.get()
+
+
+def observe_stage(stage: str, seconds: float, provider: str = "", model: str = "") -> None:
+    """Record a stage latency in the histogram and the current turn."""
+    STAGE_SECONDS.observe(seconds, stage=stage, provider=provider, model=model, org=_org.get())
+    turn = _turn.get()
+    if turn is not None:
+        turn.add(stage, seconds)
+
+
+@contextmanager
+def timed(stage: str, provider: str = "", model: str = "") -> Iterator[None]:
+    """Time a block as a pipeline stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start, provider, model)
@@ -1,23 +1,42 @@
 """Voxa — FastAPI application factory."""
 
-from contextlib import asynccontextmanager
+import asyncio
+import secrets
+from contextlib import asynccontextmanager, suppress
 from typing import AsyncGenerator
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 from app.api.v1.router import v1_router
+from app.core import metrics
 from app.core.config import settings
+from app.core.exceptions import UnauthorizedException
 from app.core.logging import setup_logging
 from app.middleware.error_handler import register_exception_handlers
 from app.middleware.request_id import RequestIdMiddleware
+from app.rag import hot_index, retriever
+from app.services import voice_bootstrap_service
+from app.voice.clients import close_clients
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     """Application startup and shutdown events."""
     setup_logging()
+    await retriever.warm_collections()
+    await retriever.verify_shard_count()
+    listeners = [
+        asyncio.create_task(voice_bootstrap_service.listen_for_invalidations()),
+        asyncio.create_task(hot_index.listen_for_invalidations()),
+    ]
     yield
+    for listener in listeners:
+        listener.cancel()
+        with suppress(asyncio.CancelledError):
+            await listener
+    await close_clients()
 
 
 def create_app() -> FastAPI:
@@ -60,5 +79,14 @@ def _include_routers(application: FastAPI) -> None:
     async def root_health() -> dict[str, str]:
         return {"status": "healthy", "version": settings.APP_VERSION}
 
+    if settings.METRICS_TOKEN:
+
+        @application.get("/metrics", include_in_schema=False)
+        async def prometheus_metrics(authorization: str = Header("")) -> PlainTextResponse:
+            expected = f"Bearer {settings.METRICS_TOKEN}"
+            if not secrets.compare_digest(authorization.encode(), expected.encode()):
+                raise UnauthorizedException()
+            return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 
 app = create_app()
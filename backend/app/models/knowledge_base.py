@@ -4,6 +4,7 @@ import enum
 import uuid
 
 from sqlalchemy import BigInteger, Enum, ForeignKey, Integer, String, Text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base import BaseModel
@@ -51,5 +52,7 @@ class Document(BaseModel):
     )
     error_message: Mapped[str | None] = mapped_column(Text)
     storage_path: Mapped[str | None] = mapped_column(String(1000))
+    # Hashes of the chunks currently indexed, for incremental re-indexing
+    chunk_hashes: Mapped[list[str] | None] = mapped_column(JSONB)
 
     knowledge_base = relationship("KnowledgeBase", back_populates="documents")
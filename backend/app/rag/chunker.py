@@ -1,56 +1,214 @@
-"""Semantic text chunking for RAG pipeline."""
+"""Structure-aware text chunking for RAG pipeline.
+
+Text is split into blocks (headings and paragraphs), blocks into sentences,
+and each sentence's token count is computed once with the embedding
+model's tokenizer. Chunks are filled with whole sentences up to a token
+budget in a single pass. A chunk preferably ends where a section or
+paragraph does, as long as it's at least MIN_FILL of the budget. That
+keeps chunks similar in size, so embedding requests pack close to their
+token limit.
+
+Markdown headings (`#`) start sections; blank lines separate paragraphs.
+"""
 
 import re
+from collections import deque
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+
+from app.rag.embeddings import count_tokens, token_slices
+
+DEFAULT_CHUNK_TOKENS = 512
+DEFAULT_OVERLAP_TOKENS = 64
+# A chunk ends early at a heading or paragraph only once this full
+MIN_FILL = 0.75
+
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n\s*")
+HEADING = re.compile(r"^[ \t]*#{1,6}[ \t]+\S.*$", re.MULTILINE)
+WORD = re.compile(r"\s*\S+")
+
+# Text without a blank line is cut into blocks of at most this many characters
+MAX_BLOCK_CHARS = 64 * 1024
+
+# Where a sentence sits in the document's structure
+SENTENCE = 0
+PARAGRAPH = 1
+SECTION = 2
+
+_SEPARATORS = {SENTENCE: " ", PARAGRAPH: "\n\n", SECTION: "\n\n"}
+
+
+@dataclass(slots=True)
+class _Unit:
+    """A sentence (or a piece of an overlong one) with its cached token count."""
+
+    text: str
+    tokens: int
+    # SENTENCE, or PARAGRAPH / SECTION if it starts one
+    boundary: int
+
+
+def chunk_text(
+    text: str, max_tokens: int = DEFAULT_CHUNK_TOKENS, overlap_tokens: int = DEFAULT_OVERLAP_TOKENS
+) -> list[str]:
+    """Split text into chunks of at most `max_tokens` tokens (summed per sentence)."""
+    return list(iter_chunks([text], max_tokens, overlap_tokens))
+
+
+def iter_chunks(
+    segments: Iterable[str],
+    max_tokens: int = DEFAULT_CHUNK_TOKENS,
+    overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+) -> Iterator[str]:
+    """Chunk text arriving in newline-separated pieces (pages, paragraphs).
+
+    Yields the same chunks as `chunk_text("\\n".join(segments))` (unless a
+    paragraph runs MAX_BLOCK_CHARS without a sentence break) while only
+    holding the current chunk in memory. Chunks split mid-paragraph repeat
+    up to `overlap_tokens` of trailing sentences.
+    """
+    units: list[_Unit] = []
+    # units[:fresh] repeat the previous chunk's tail
+    fresh = 0
+    total = 0
+    min_tokens = int(max_tokens * MIN_FILL)
+
+    for unit in _iter_units(segments, max_tokens):
+        if unit.boundary == SECTION and total >= min_tokens and len(units) > fresh:
+            yield _join(units)
+            units, fresh, total = [], 0, 0
+
+        while total + unit.tokens > max_tokens and len(units) > fresh:
+            cut = _split_point(units, fresh, min_tokens)
+            yield _join(units[:cut])
+            if cut < len(units):
+                # Ended at a heading or paragraph: carry the rest, no overlap
+                units = units[cut:]
+                fresh = 0
+            else:
+                units = _overlap(units, overlap_tokens)
+                fresh = len(units)
+            total = sum(u.tokens for u in units)
+
+        if total + unit.tokens > max_tokens:
+            # Only overlap left, and it doesn't leave room
+            units, fresh, total = [], 0, 0
+        units.append(unit)
+        total += unit.tokens
+
+    if len(units) > fresh:
+        yield _join(units)
+
+
+def _split_point(units: list[_Unit], fresh: int, min_tokens: int) -> int:
+    """Where to end a full chunk: the last section or paragraph start leaving it
+    at least `min_tokens`, else after its last sentence."""
+    best = {SECTION: 0, PARAGRAPH: 0}
+    tokens = 0
+    for i, unit in enumerate(units):
+        if i > fresh and unit.boundary != SENTENCE and tokens >= min_tokens:
+            best[unit.boundary] = i
+        tokens += unit.tokens
+    return best[SECTION] or best[PARAGRAPH] or len(units)
+
+
+def _overlap(units: list[_Unit], overlap_tokens: int) -> list[_Unit]:
+    """Trailing sentences of a chunk totalling at most `overlap_tokens`."""
+    tokens = 0
+    start = len(units)
+    while start > 0 and tokens + units[start - 1].tokens <= overlap_tokens:
+        start -= 1
+        tokens += units[start].tokens
+    tail = units[start:]
+    if tail:
+        # Joined to what follows as the same paragraph
+        tail[0] = _Unit(tail[0].text, tail[0].tokens, SENTENCE)
+    return tail
+
+
+def _join(units: list[_Unit]) -> str:
+    parts = [units[0].text]
+    for unit in units[1:]:
+        parts.append(_SEPARATORS[unit.boundary])
+        parts.append(unit.text)
+    return "".join(parts)
+
+
+def _iter_units(segments: Iterable[str], max_tokens: int) -> Iterator[_Unit]:
+    """Sentences with token counts, each marked with the structure it starts."""
+    for text, boundary in _iter_blocks(segments):
+        for sentence in SENTENCE_BREAK.split(text):
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            tokens = count_tokens(sentence)
+            if tokens <= max_tokens:
+                yield _Unit(sentence, tokens, boundary)
+            else:
+                yield from _split_sentence(sentence, max_tokens, boundary)
+            boundary = SENTENCE
+
+
+def _split_sentence(sentence: str, max_tokens: int, boundary: int) -> Iterator[_Unit]:
+    """Cut an overlong sentence between words into pieces within the budget.
+
+    A single word over the budget (a long URL, an encoded blob) is cut
+    between tokens.
+    """
+    words: list[str] = []
+    tokens = 0
+    for word in WORD.findall(sentence):
+        count = count_tokens(word)
+        if words and tokens + count > max_tokens:
+            yield _Unit("".join(words).strip(), tokens, boundary)
+            words, tokens, boundary = [], 0, SENTENCE
+        if count > max_tokens:
+            for piece in token_slices(word.strip(), max_tokens):
+                yield _Unit(piece, count_tokens(piece), boundary)
+                boundary = SENTENCE
+            continue
+        words.append(word)
+        tokens += count
+    if words:
+        yield _Unit("".join(words).strip(), tokens, boundary)
+
+
+def _iter_blocks(segments: Iterable[str]) -> Iterator[tuple[str, int]]:
+    """Headings and paragraphs across segments; a paragraph may continue into
+    the next segment."""
+    tail: str | None = None
+    boundary = PARAGRAPH
+    for segment in segments:
+        text = segment if tail is None else f"{tail}\n{segment}"
+        *paragraphs, tail = PARAGRAPH_BREAK.split(text)
+        for paragraph in paragraphs:
+            yield from _split_headings(paragraph, boundary)
+            boundary = PARAGRAPH
+        # Text without blank lines would otherwise accumulate without bound
+        if len(tail) > MAX_BLOCK_CHARS:
+            cut = _last_sentence_end(tail)
+            yield from _split_headings(tail[:cut], boundary)
+            tail, boundary = tail[cut:], SENTENCE
+    if tail:
+        yield from _split_headings(tail, boundary)
+
+
+def _last_sentence_end(text: str) -> int:
+    """Offset after the last sentence break (or the last space) in text."""
+    last = deque(SENTENCE_BREAK.finditer(text), maxlen=1)
+    if last:
+        return last[0].end()
+    return max(text.rfind(" "), text.rfind("\n")) + 1 or len(text)
+
 
-DEFAULT_CHUNK_SIZE = 400
-DEFAULT_OVERLAP = 50
-MAX_CHUNK_SIZE = 600
-
-
-def chunk_text(text: str, chunk_size: int = DEFAULT_CHUNK_SIZE, overlap: int = DEFAULT_OVERLAP) -> list[str]:
-    """Split text into overlapping chunks at sentence boundaries."""
-    sentences = _split_sentences(text)
-    if not sentences:
-        return []
-
-    chunks: list[str] = []
-    current_chunk: list[str] = []
-    current_length = 0
-
-    for sentence in sentences:
-        sentence_len = len(sentence.split())
-        if current_length + sentence_len > chunk_size and current_chunk:
-            chunks.append(" ".join(current_chunk))
-            overlap_text = _get_overlap_sentences(current_chunk, overlap)
-            current_chunk = overlap_text
-            current_length = sum(len(s.split()) for s in current_chunk)
-
-        current_chunk.append(sentence)
-        current_length += sentence_len
-
-    if current_chunk:
-        chunks.append(" ".join(current_chunk))
-
-    return chunks
-
-
-def _split_sentences(text: str) -> list[str]:
-    """Split text into sentences using regex."""
-    text = text.strip()
-    if not text:
-        return []
-    sentences = re.split(r'(?<=[.!?])\s+', text)
-    return [s.strip() for s in sentences if s.strip()]
-
-
-def _get_overlap_sentences(sentences: list[str], target_words: int) -> list[str]:
-    """Get trailing sentences for overlap."""
-    result: list[str] = []
-    word_count = 0
-    for sentence in reversed(sentences):
-        words = len(sentence.split())
-        if word_count + words > target_words and result:
-            break
-        result.insert(0, sentence)
-        word_count += words
-    return result
+def _split_headings(paragraph: str, boundary: int) -> Iterator[tuple[str, int]]:
+    """Split heading lines out of a paragraph; each starts a section."""
+    start = 0
+    for match in HEADING.finditer(paragraph):
+        if paragraph[start : match.start()].strip():
+            yield paragraph[start : match.start()], boundary
+        yield match.group().strip(), SECTION
+        start, boundary = match.end(), PARAGRAPH
+    if paragraph[start:].strip():
+        yield paragraph[start:], boundary
@@ -1,53 +1,405 @@
-"""Generate embeddings via OpenAI."""
+"""Generate embeddings via OpenAI.
 
+Embeddings are cached by content (text + model + dimensions) in an
+in-process LRU and in Redis. Concurrent requests for the same text share
+one call, and concurrent single-text requests are micro-batched into one
+`embeddings.create` request.
+
+Bulk embedding packs texts into token-bounded requests, sends them with
+bounded concurrency and backs off on rate limits; `iter_embedding_batches`
+yields each batch as it completes so callers can store results as they go.
+"""
+
+import asyncio
+import base64
+import functools
+import hashlib
+import random
+from collections.abc import AsyncIterator
+
+import numpy as np
+import openai
 import structlog
+import tiktoken
 from openai import AsyncOpenAI
 
+from app.core.cache import get_redis
 from app.core.config import settings
+from app.core.memory_cache import TTLCache
 
 logger = structlog.get_logger("embeddings")
 
 EMBEDDING_MODEL = "text-embedding-3-small"
 EMBEDDING_DIMENSIONS = 1536
+# Per-input limit of the embedding model
+EMBEDDING_MAX_INPUT_TOKENS = 8191
+
+_RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+_RETRY_BASE_DELAY = 1.0
+_RETRY_MAX_DELAY = 60.0
+
+# One client (and connection pool) per API key
+_clients: dict[str, AsyncOpenAI] = {}
+
+# Vectors are held as float32 arrays: ~6 KB each instead of ~50 KB as lists
+_memory: TTLCache[str, np.ndarray] = TTLCache(
+    maxsize=settings.EMBEDDING_CACHE_MEMORY_ITEMS, ttl=settings.EMBEDDING_CACHE_TTL_SECONDS
+)
+
+# cache key -> the task fetching it, shared by concurrent callers
+_inflight: dict[str, asyncio.Task[np.ndarray]] = {}
+
+
+def _get_api_key(api_key: str | None) -> str | None:
+    """The caller's (tenant) key, falling back to the platform key."""
+    return api_key or settings.OPENAI_API_KEY
+
 
-# Module-level API key override for tenant-specific keys
-_api_key_override: str | None = None
+def _get_client(api_key: str | None) -> AsyncOpenAI:
+    """Get or create the pooled OpenAI client for an API key."""
+    client = _clients.get(api_key or "")
+    if client is None:
+        client = _clients[api_key or ""] = AsyncOpenAI(api_key=api_key)
+    return client
 
 
-def set_api_key(api_key: str | None) -> None:
-    """Set the API key to use for embeddings (tenant-specific)."""
-    global _api_key_override
-    _api_key_override = api_key
+def _cache_key(text: str) -> str:
+    """Content address of an embedding."""
+    digest = hashlib.sha256(text.encode()).hexdigest()
+    return f"emb:{EMBEDDING_MODEL}:{EMBEDDING_DIMENSIONS}:{digest}"
 
 
-def _get_api_key() -> str | None:
-    """Get the API key - tenant override or fallback to settings."""
-    return _api_key_override or settings.OPENAI_API_KEY
+def reduce_dimensions(vector: list[float], dimensions: int) -> list[float]:
+    """Shorten an embedding to `dimensions`.
+
+    text-embedding-3 vectors are Matryoshka-trained: truncating and
+    re-normalising gives what the API's `dimensions` parameter returns, so
+    one cached full-size vector serves collections of any size.
+    """
+    if dimensions >= len(vector):
+        return vector
+    head = np.asarray(vector[:dimensions], dtype=np.float32)
+    norm = float(np.linalg.norm(head))
+    return (head / norm if norm else head).tolist()
 
 
 async def generate_embedding(text: str, api_key: str | None = None) -> list[float]:
     """Generate a single embedding vector for text."""
-    key = api_key or _get_api_key()
-    client = AsyncOpenAI(api_key=key)
-    response = await client.embeddings.create(
-        model=EMBEDDING_MODEL,
-        input=text,
-        dimensions=EMBEDDING_DIMENSIONS,
-    )
-    return response.data[0].embedding
+    key = _cache_key(text)
+    vector = _memory.get(key)
+    if vector is not None:
+        return vector.tolist()
+
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(_fetch_one(key, text, _get_api_key(api_key)))
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _settle(key, t))
+    # Shielded so one caller giving up doesn't cancel the others' result
+    return (await asyncio.shield(task)).tolist()
+
+
+def _settle(key: str, task: asyncio.Task) -> None:
+    """Forget a finished fetch; mark its error retrieved if nobody awaited it."""
+    _inflight.pop(key, None)
+    if not task.cancelled():
+        task.exception()
+
+
+async def _fetch_one(key: str, text: str, api_key: str | None) -> np.ndarray:
+    """Redis, then the micro-batcher; fills both cache tiers."""
+    vector = (await _redis_get([key]))[0]
+    if vector is None:
+        vector = await _get_batcher(api_key).submit(text)
+        await _redis_set({key: vector})
+    _memory.set(key, vector)
+    return vector
 
 
 async def generate_embeddings(texts: list[str], api_key: str | None = None) -> list[list[float]]:
     """Generate embedding vectors for multiple texts."""
+    results: list[list[float]] = [[] for _ in texts]
+    async for start, vectors in iter_embedding_batches(texts, api_key):
+        results[start : start + len(vectors)] = vectors
+    return results
+
+
+async def iter_embedding_batches(
+    texts: list[str], api_key: str | None = None
+) -> AsyncIterator[tuple[int, list[list[float]]]]:
+    """Embed texts in token-bounded batches, sent concurrently.
+
+    Yields `(offset, vectors)` for each batch in completion order, where
+    `vectors` belong to `texts[offset:offset + len(vectors)]`. If a batch
+    fails for good, the error is raised and unfinished batches are cancelled.
+    """
     if not texts:
-        return []
+        return
+    api_key = _get_api_key(api_key)
+    semaphore = _get_semaphore()
+
+    async def run(start: int, batch: list[str]) -> tuple[int, list[list[float]]]:
+        async with semaphore:
+            return start, await _embed_batch(batch, api_key)
+
+    tasks = [asyncio.create_task(run(start, batch)) for start, batch in pack_batches(texts)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def pack_batches(texts: list[str]) -> list[tuple[int, list[str]]]:
+    """Split texts into consecutive `(offset, batch)` runs within the request limits.
+
+    Texts longer than the model's input limit are truncated to it.
+    """
+    batches: list[tuple[int, list[str]]] = []
+    batch: list[str] = []
+    start = tokens = 0
+    for i, text in enumerate(texts):
+        text, count = _fit_input(text)
+        if batch and (
+            tokens + count > settings.EMBEDDING_REQUEST_MAX_TOKENS
+            or len(batch) >= settings.EMBEDDING_REQUEST_MAX_INPUTS
+        ):
+            batches.append((start, batch))
+            batch, start, tokens = [], i, 0
+        batch.append(text)
+        tokens += count
+    if batch:
+        batches.append((start, batch))
+    return batches
+
+
+@functools.cache
+def _tokenizer() -> tiktoken.Encoding:
+    """The embedding model's tokenizer, looked up once."""
+    return tiktoken.encoding_for_model(EMBEDDING_MODEL)
+
+
+def _encode(text: str) -> list[int]:
+    # Special-token text in documents is ordinary text to the embedding model
+    return _tokenizer().encode(text, disallowed_special=())
+
+
+def count_tokens(text: str) -> int:
+    """Number of embedding-model tokens in a text."""
+    return len(_encode(text))
+
+
+def token_slices(text: str, size: int) -> list[str]:
+    """Cut a text into consecutive pieces of at most `size` tokens."""
+    tokens = _encode(text)
+    return [_tokenizer().decode(tokens[i : i + size]) for i in range(0, len(tokens), size)]
+
 
-    key = api_key or _get_api_key()
-    client = AsyncOpenAI(api_key=key)
-    response = await client.embeddings.create(
+def _fit_input(text: str) -> tuple[str, int]:
+    """Token count of a text, truncating it to the per-input limit."""
+    tokens = _encode(text)
+    if len(tokens) <= EMBEDDING_MAX_INPUT_TOKENS:
+        return text, len(tokens)
+    logger.warning("embedding_input_truncated", tokens=len(tokens))
+    text = _tokenizer().decode(tokens[:EMBEDDING_MAX_INPUT_TOKENS])
+    return text, EMBEDDING_MAX_INPUT_TOKENS
+
+
+async def _embed_batch(texts: list[str], api_key: str | None) -> list[list[float]]:
+    """Embed one batch, reusing cached vectors.
+
+    Duplicate texts are embedded once. Results go to Redis only, so indexing
+    a document doesn't flush the in-process cache used by live queries.
+    """
+    keys = [_cache_key(t) for t in texts]
+    found: dict[str, np.ndarray] = {}
+    for key in keys:
+        vector = _memory.get(key)
+        if vector is not None:
+            found[key] = vector
+
+    missing = list(dict.fromkeys(k for k in keys if k not in found))
+    for key, vector in zip(missing, await _redis_get(missing), strict=True):
+        if vector is not None:
+            found[key] = vector
+
+    todo = {k: t for k, t in zip(keys, texts, strict=True) if k not in found}
+    if todo:
+        vectors = await _create_with_retry(api_key, list(todo.values()))
+        fresh = dict(zip(todo, vectors, strict=True))
+        found.update(fresh)
+        await _redis_set(fresh)
+
+    logger.info("embeddings_generated", total=len(texts), embedded=len(todo))
+    return [found[k].tolist() for k in keys]
+
+
+async def _create(api_key: str | None, texts: list[str]) -> list[np.ndarray]:
+    """One `embeddings.create` request."""
+    response = await _get_client(api_key).embeddings.create(
         model=EMBEDDING_MODEL,
         input=texts,
         dimensions=EMBEDDING_DIMENSIONS,
     )
     sorted_data = sorted(response.data, key=lambda x: x.index)
-    return [item.embedding for item in sorted_data]
+    return [np.asarray(item.embedding, dtype=np.float32) for item in sorted_data]
+
+
+async def _create_with_retry(api_key: str | None, texts: list[str]) -> list[np.ndarray]:
+    """`_create` with backoff on rate limits and transient errors.
+
+    A batch the API rejects outright is split in half and each half retried
+    on its own, so one bad input doesn't fail its neighbours.
+    """
+    attempt = 0
+    while True:
+        try:
+            return await _create(api_key, texts)
+        except _RETRYABLE_ERRORS as exc:
+            if attempt >= settings.EMBEDDING_MAX_RETRIES:
+                raise
+            delay = _retry_delay(exc, attempt)
+            attempt += 1
+            logger.warning(
+                "embedding_batch_retry",
+                attempt=attempt,
+                delay=round(delay, 2),
+                size=len(texts),
+                error=str(exc),
+            )
+            await asyncio.sleep(delay)
+        except openai.BadRequestError:
+            if len(texts) == 1:
+                raise
+            half = len(texts) // 2
+            return await _create_with_retry(api_key, texts[:half]) + await _create_with_retry(
+                api_key, texts[half:]
+            )
+
+
+def _retry_delay(exc: Exception, attempt: int) -> float:
+    """Server-suggested delay if any, else exponential backoff with jitter."""
+    response = getattr(exc, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), _RETRY_MAX_DELAY)
+        except ValueError:
+            pass
+    return min(_RETRY_BASE_DELAY * 2**attempt, _RETRY_MAX_DELAY) * random.uniform(0.5, 1.0)
+
+
+_semaphores: dict[asyncio.AbstractEventLoop, asyncio.Semaphore] = {}
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    """Worker-wide cap on concurrent bulk embedding requests."""
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        _semaphores.clear()
+        semaphore = _semaphores[loop] = asyncio.Semaphore(settings.EMBEDDING_CONCURRENCY)
+    return semaphore
+
+
+# ---------------------------------------------------------------------------
+# Redis tier
+# ---------------------------------------------------------------------------
+
+
+async def _redis_get(keys: list[str]) -> list[np.ndarray | None]:
+    """Fetch cached vectors; a Redis failure reads as a miss."""
+    if not keys:
+        return []
+    try:
+        client = await get_redis()
+        values = await client.mget(keys)
+    except Exception as exc:
+        logger.warning("embedding_cache_read_failed", error=str(exc))
+        return [None] * len(keys)
+    return [np.frombuffer(base64.b64decode(v), dtype=np.float32) if v else None for v in values]
+
+
+async def _redis_set(vectors: dict[str, np.ndarray]) -> None:
+    """Store vectors as base64 float32 with the cache TTL."""
+    if not vectors:
+        return
+    try:
+        client = await get_redis()
+        async with client.pipeline(transaction=False) as pipe:
+            for key, vector in vectors.items():
+                encoded = base64.b64encode(vector.astype(np.float32).tobytes()).decode()
+                pipe.set(key, encoded, ex=int(settings.EMBEDDING_CACHE_TTL_SECONDS))
+            await pipe.execute()
+    except Exception as exc:
+        logger.warning("embedding_cache_write_failed", error=str(exc))
+
+
+# ---------------------------------------------------------------------------
+# Micro-batching of single-text requests
+# ---------------------------------------------------------------------------
+
+
+class _MicroBatcher:
+    """Collects single-text requests for a few ms and sends them together."""
+
+    def __init__(self, api_key: str | None) -> None:
+        self.api_key = api_key
+        self.loop = asyncio.get_running_loop()
+        self._pending: list[tuple[str, asyncio.Future[np.ndarray]]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._sending: set[asyncio.Task] = set()
+
+    def submit(self, text: str) -> asyncio.Future[np.ndarray]:
+        """Queue a text; the future resolves to its vector."""
+        future = self.loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= settings.EMBEDDING_BATCH_MAX_TEXTS:
+            self._flush()
+        elif self._timer is None:
+            self._timer = self.loop.call_later(
+                settings.EMBEDDING_BATCH_WINDOW_MS / 1000, self._flush
+            )
+        return future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = self.loop.create_task(self._send(batch))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send(self, batch: list[tuple[str, asyncio.Future[np.ndarray]]]) -> None:
+        try:
+            vectors = await _create(self.api_key, [text for text, _ in batch])
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for (_, future), vector in zip(batch, vectors, strict=True):
+            if not future.done():
+                future.set_result(vector)
+        if len(batch) > 1:
+            logger.debug("embeddings_micro_batched", size=len(batch))
+
+
+_batchers: dict[str, _MicroBatcher] = {}
+
+
+def _get_batcher(api_key: str | None) -> _MicroBatcher:
+    """Get the batcher for an API key on the running event loop."""
+    batcher = _batchers.get(api_key or "")
+    if batcher is None or batcher.loop is not asyncio.get_running_loop():
+        batcher = _batchers[api_key or ""] = _MicroBatcher(api_key)
+    return batcher
@@ -0,0 +1,279 @@
+"""Document text extraction in a process pool.
+
+pypdf and python-docx are CPU-bound and hold the GIL, so they run in
+separate processes; large PDFs are split into page ranges extracted in
+parallel. Jobs have a timeout and each pool process a memory cap.
+
+Every process that extracts owns a pool of EXTRACT_WORKERS processes.
+Daemonic processes can't have children, so there (e.g. the children of a
+Celery prefork worker, already one process per task) jobs run in the
+calling thread instead, bounded by the task's time limit rather than the
+per-job timeout and memory cap.
+
+Keep this module's imports light: pool processes are spawned and import it.
+"""
+
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from collections.abc import Callable, Iterator
+from concurrent.futures import CancelledError, Executor, Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any
+
+import structlog
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = structlog.get_logger("extraction")
+
+EXTRACTION_SECONDS = metrics.histogram(
+    "voxa_extraction_seconds",
+    "Document text extraction time",
+    ("file_type",),
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0),
+)
+EXTRACTED_UNITS = metrics.counter(
+    "voxa_extraction_units",
+    "Pages (PDF) or paragraphs (DOCX) extracted",
+    ("file_type",),
+)
+EXTRACTED_BYTES = metrics.counter(
+    "voxa_extraction_bytes", "Document bytes extracted", ("file_type",)
+)
+PAGES_PER_SECOND = metrics.gauge(
+    "voxa_extraction_pages_per_second",
+    "Pages (or paragraphs) per second of extraction time, last document",
+    ("file_type",),
+)
+MEGABYTES_PER_SECOND = metrics.gauge(
+    "voxa_extraction_megabytes_per_second",
+    "Megabytes per second of extraction time, last document",
+    ("file_type",),
+)
+
+# A job is resubmitted at most this many times after other jobs' pool resets
+MAX_JOB_ATTEMPTS = 3
+
+_pool: Executor | None = None
+_pool_lock = threading.Lock()
+# Pools killed on purpose; their other jobs failed through no fault of their own
+_killed_pools: weakref.WeakSet[Executor] = weakref.WeakSet()
+
+
+class _InlineExecutor(Executor):
+    """Runs jobs in the calling thread, for processes that can't have children."""
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        future: Future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as exc:
+            future.set_exception(exc)
+        return future
+
+
+def get_pool() -> Executor:
+    """Get or create this process's extraction pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is None and multiprocessing.current_process().daemon:
+            _pool = _InlineExecutor()
+        elif _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.EXTRACT_WORKERS,
+                # Spawned, not forked: callers run in threads of an async worker
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_limit_memory,
+                initargs=(settings.EXTRACT_MEMORY_LIMIT_MB * 1024 * 1024,),
+                max_tasks_per_child=settings.EXTRACT_MAX_JOBS_PER_PROCESS,
+            )
+        return _pool
+
+
+def _reset_pool(pool: Executor) -> None:
+    """Kill a pool (e.g. a job overran its timeout); the next job starts a new one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+        if pool in _killed_pools:
+            return
+        _killed_pools.add(pool)
+    # A running job can't be cancelled, only its process killed
+    for process in list(getattr(pool, "_processes", {}).values()):
+        process.kill()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+@dataclass(slots=True)
+class _Job:
+    """A submitted extraction call, resubmittable if its pool is reset under it."""
+
+    func: Callable[..., Any]
+    args: tuple[Any, ...]
+    pool: Executor
+    future: Future
+
+    @classmethod
+    def submit(cls, func: Callable[..., Any], *args: Any) -> "_Job":
+        pool = get_pool()
+        return cls(func, args, pool, pool.submit(_job, func, *args))
+
+    def resubmit(self) -> None:
+        self.pool = get_pool()
+        self.future = self.pool.submit(_job, self.func, *self.args)
+
+
+def iter_pdf_pages(path: str) -> Iterator[str]:
+    """Extract a PDF file's text page by page, page ranges in parallel."""
+    with _measure("pdf", os.path.getsize(path)) as stats:
+        page_count = _result(_Job.submit(_pdf_page_count, path), stats)
+        per_job = settings.EXTRACT_PDF_PAGES_PER_JOB
+        ranges = (
+            (start, min(start + per_job, page_count)) for start in range(0, page_count, per_job)
+        )
+
+        # Keep only as many ranges in flight as there are workers
+        pending: deque[_Job] = deque(
+            _Job.submit(_pdf_pages, path, start, stop)
+            for start, stop in itertools.islice(ranges, settings.EXTRACT_WORKERS)
+        )
+        try:
+            while pending:
+                pages = _result(pending.popleft(), stats)
+                for start, stop in itertools.islice(ranges, 1):
+                    pending.append(_Job.submit(_pdf_pages, path, start, stop))
+                stats["units"] += len(pages)
+                yield from pages
+        finally:
+            for job in pending:
+                job.future.cancel()
+
+
+def iter_docx_paragraphs(path: str) -> Iterator[str]:
+    """Extract a DOCX file's text paragraph by paragraph."""
+    with _measure("docx", os.path.getsize(path)) as stats:
+        paragraphs = _result(_Job.submit(_docx_paragraphs, path), stats)
+        stats["units"] = len(paragraphs)
+        yield from paragraphs
+
+
+def _result(job: _Job, stats: dict[str, float]) -> Any:
+    """Wait for a job, enforcing the per-job timeout, and add up its run time.
+
+    The pool is shared by every document this process extracts; a job lost
+    because another document's job got the pool killed is run again.
+    """
+    for attempt in range(1, MAX_JOB_ATTEMPTS + 1):
+        try:
+            result, seconds = job.future.result(timeout=settings.EXTRACT_TIMEOUT_SECONDS)
+            stats["seconds"] += seconds
+            return result
+        except FutureTimeoutError:
+            _reset_pool(job.pool)
+            raise TimeoutError(
+                f"Text extraction timed out after {settings.EXTRACT_TIMEOUT_SECONDS:g}s"
+            ) from None
+        except (BrokenProcessPool, CancelledError):
+            if job.pool in _killed_pools and attempt < MAX_JOB_ATTEMPTS:
+                logger.info("extraction_job_resubmitted", attempt=attempt)
+                job.resubmit()
+                continue
+            # A process died, most likely over its memory cap
+            _reset_pool(job.pool)
+            raise MemoryError("Text extraction process died (document too large?)") from None
+
+
+@contextmanager
+def _measure(file_type: str, size: int) -> Iterator[dict[str, float]]:
+    """Record extraction time and throughput.
+
+    Time is the jobs' own run time, not wall time: the caller pauses the
+    extraction between windows of chunks while it embeds them.
+    """
+    stats = {"units": 0, "seconds": 0.0}
+    yield stats
+    elapsed = max(stats["seconds"], 1e-6)
+    pages_per_sec = stats["units"] / elapsed
+    mb_per_sec = size / 1024 / 1024 / elapsed
+    EXTRACTION_SECONDS.observe(elapsed, file_type=file_type)
+    EXTRACTED_UNITS.inc(stats["units"], file_type=file_type)
+    EXTRACTED_BYTES.inc(size, file_type=file_type)
+    PAGES_PER_SECOND.set(pages_per_sec, file_type=file_type)
+    MEGABYTES_PER_SECOND.set(mb_per_sec, file_type=file_type)
+    logger.info(
+        "text_extracted",
+        file_type=file_type,
+        units=int(stats["units"]),
+        seconds=round(elapsed, 2),
+        units_per_sec=round(pages_per_sec, 1),
+        mb_per_sec=round(mb_per_sec, 2),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Pool-side functions
+# ---------------------------------------------------------------------------
+
+
+def _limit_memory(limit_bytes: int) -> None:
+    """Cap the pool process's address space."""
+    try:
+        import resource
+
+        resource.setrlimit(resource.RLIMIT_AS, (limit_bytes, limit_bytes))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+def _job(func: Callable[..., Any], *args: Any) -> tuple[Any, float]:
+    """Run an extraction function, returning its result and run time."""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def _pdf_page_count(path: str) -> int:
+    from pypdf import PdfReader
+
+    return len(PdfReader(path).pages)
+
+
+def _pdf_pages(path: str, start: int, stop: int) -> list[str]:
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def _docx_paragraphs(path: str) -> list[str]:
+    """Paragraphs as Markdown-style blocks: headings marked with `#`, each
+    followed by a blank line, so the chunker sees the document's structure."""
+    import docx
+
+    blocks = []
+    for paragraph in docx.Document(path).paragraphs:
+        style = paragraph.style.name if paragraph.style is not None else ""
+        level = 1 if style == "Title" else _heading_level(style)
+        text = paragraph.text
+        if level and text.strip():
+            text = f"{'#' * level} {text}"
+        blocks.append(f"{text}\n")
+    return blocks
+
+
+def _heading_level(style: str) -> int:
+    """1-6 for Word's "Heading N" styles, else 0."""
+    name, _, level = style.rpartition(" ")
+    if name == "Heading" and level.isdigit():
+        return min(int(level), 6)
+    return 0
@@ -0,0 +1,329 @@
+"""In-process vector index for small knowledge bases.
+
+Most knowledge bases are a few thousand chunks, small enough to search in
+the worker with one matrix-vector product instead of a Qdrant round trip.
+`search_vector` answers from memory when the knowledge base is loaded and
+otherwise from Qdrant, scheduling a background load. Qdrant stays the
+source of truth: loaded indexes are dropped when ingestion events say the
+knowledge base changed, and evicted least-recently-used past a memory
+budget.
+
+Results match `retriever.search_vector`: dense-only cosine scores, or dense
+and sparse rankings fused with RRF (IDF computed over the knowledge base).
+"""
+
+import asyncio
+import json
+import math
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+import structlog
+
+from app.core import metrics
+from app.core.cache import get_redis
+from app.core.config import settings
+from app.core.memory_cache import TTLCache
+from app.core.metrics import timed
+from app.rag import retriever, sparse
+from app.rag.embeddings import reduce_dimensions
+
+logger = structlog.get_logger("hot_index")
+
+# Ingestion events (see knowledge_base_service._publish_event) after which
+# a knowledge base's points have changed
+EVENTS_PATTERN = "kb:*:events"
+CHANGE_EVENTS = {
+    "doc:completed",
+    "doc:failed",
+    "doc:deleted",
+    "kb:deleted",
+    "kb:vectors_removed",
+}
+
+# RRF constant, as Qdrant's default
+RRF_K = 2
+# int8 rows are widened to float32 this many at a time
+INT8_BLOCK_ROWS = 1024
+# Rough per-chunk payload overhead on top of its text
+PAYLOAD_OVERHEAD_BYTES = 256
+
+INDEX_BYTES = metrics.gauge("voxa_hot_index_bytes", "Memory held by in-process KB indexes")
+INDEX_COLLECTIONS = metrics.gauge("voxa_hot_index_collections", "Knowledge bases loaded in process")
+
+
+@dataclass(slots=True)
+class HotIndex:
+    """One knowledge base's points as arrays."""
+
+    payloads: list[dict]
+    # Unit vectors, one row per point; int8 rows are scaled by 127
+    vectors: np.ndarray
+    hybrid: bool
+    # Sparse vectors as an inverted index: postings of terms[i] are
+    # rows/weights[offsets[i]:offsets[i + 1]]
+    terms: np.ndarray
+    offsets: np.ndarray
+    rows: np.ndarray
+    weights: np.ndarray
+
+    @classmethod
+    def build(cls, points: list, spec: retriever.CollectionSpec, dtype: str) -> "HotIndex":
+        """Build from scrolled Qdrant points (with payloads and vectors)."""
+        dense = np.zeros((len(points), spec.dimensions), dtype=np.float32)
+        terms: list[int] = []
+        rows: list[int] = []
+        weights: list[float] = []
+        for row, point in enumerate(points):
+            vector = point.vector
+            if isinstance(vector, dict):
+                dense[row] = vector[retriever.DENSE_VECTOR]
+                lexical = vector.get(retriever.SPARSE_VECTOR)
+                if lexical is not None:
+                    terms.extend(lexical.indices)
+                    rows.extend([row] * len(lexical.indices))
+                    weights.extend(lexical.values)
+            else:
+                dense[row] = vector
+        norms = np.linalg.norm(dense, axis=1, keepdims=True)
+        dense /= np.where(norms == 0, 1, norms)
+        if dtype == "int8":
+            dense = np.round(dense * 127).astype(np.int8)
+
+        all_terms = np.asarray(terms, dtype=np.int64)
+        order = np.argsort(all_terms, kind="stable")
+        unique_terms, starts = np.unique(all_terms[order], return_index=True)
+        return cls(
+            payloads=[point.payload or {} for point in points],
+            vectors=dense,
+            hybrid=spec.hybrid,
+            terms=unique_terms,
+            offsets=np.append(starts, len(order)).astype(np.int64),
+            rows=np.asarray(rows, dtype=np.int32)[order],
+            weights=np.asarray(weights, dtype=np.float32)[order],
+        )
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.vectors, self.terms, self.offsets, self.rows, self.weights)
+        text = sum(len(p.get("content", "")) for p in self.payloads)
+        return sum(a.nbytes for a in arrays) + text + PAYLOAD_OVERHEAD_BYTES * len(self.payloads)
+
+    def search(
+        self, query_embedding: list[float], top_k: int, query_text: str | None = None
+    ) -> list[dict]:
+        """Search like `retriever.search_vector`, in process."""
+        if not self.payloads:
+            return []
+        dense = self._dense_scores(query_embedding)
+        indices: list[int] = []
+        if self.hybrid and query_text and settings.RAG_HYBRID_ENABLED:
+            indices, _ = sparse.query_vector(query_text)
+        if not indices:
+            best = _top(dense, top_k)
+            return [self._result(row, float(dense[row])) for row in best]
+
+        limit = max(top_k, settings.RAG_HYBRID_PREFETCH_LIMIT)
+        lexical = self._sparse_scores(indices)
+        fused: dict[int, float] = {}
+        for ranking in (_top(dense, limit), _top(lexical, limit, positive=True)):
+            for position, row in enumerate(ranking):
+                fused[row] = fused.get(row, 0.0) + 1 / (position + RRF_K)
+        best = sorted(fused, key=fused.__getitem__, reverse=True)[:top_k]
+        return [self._result(row, fused[row]) for row in best]
+
+    def _dense_scores(self, query_embedding: list[float]) -> np.ndarray:
+        query = np.asarray(
+            reduce_dimensions(query_embedding, self.vectors.shape[1]), dtype=np.float32
+        )
+        query /= np.linalg.norm(query) or 1
+        if self.vectors.dtype != np.int8:
+            return self.vectors @ query
+        scores = np.empty(len(self.vectors), dtype=np.float32)
+        for start in range(0, len(self.vectors), INT8_BLOCK_ROWS):
+            block = self.vectors[start : start + INT8_BLOCK_ROWS].astype(np.float32)
+            scores[start : start + INT8_BLOCK_ROWS] = block @ query
+        return scores / 127
+
+    def _sparse_scores(self, indices: list[int]) -> np.ndarray:
+        """BM25: stored term weights times the IDF modifier Qdrant applies."""
+        scores = np.zeros(len(self.payloads), dtype=np.float32)
+        count = len(self.payloads)
+        for term in indices:
+            i = int(np.searchsorted(self.terms, term))
+            if i == len(self.terms) or self.terms[i] != term:
+                continue
+            start, stop = self.offsets[i], self.offsets[i + 1]
+            df = stop - start
+            idf = math.log((count - df + 0.5) / (df + 0.5) + 1)
+            np.add.at(scores, self.rows[start:stop], idf * self.weights[start:stop])
+        return scores
+
+    def _result(self, row: int, score: float) -> dict:
+        payload = self.payloads[row]
+        return {
+            "content": payload.get("content", ""),
+            "score": score,
+            "document_id": payload.get("document_id", ""),
+            "metadata": payload,
+        }
+
+
+def _top(scores: np.ndarray, k: int, positive: bool = False) -> list[int]:
+    """Rows of the k highest scores, best first (only scores > 0 if `positive`)."""
+    candidates = np.flatnonzero(scores > 0) if positive else np.arange(len(scores))
+    if len(candidates) > k:
+        part = np.argpartition(-scores[candidates], k - 1)[:k]
+        candidates = candidates[part]
+    return candidates[np.argsort(-scores[candidates], kind="stable")].tolist()
+
+
+# ---------------------------------------------------------------------------
+# Per-worker index cache
+# ---------------------------------------------------------------------------
+
+# Logical collection name -> index, least recently used first
+_indexes: OrderedDict[str, HotIndex] = OrderedDict()
+_sizes: dict[str, int] = {}
+_loading: dict[str, asyncio.Task[None]] = {}
+# Bumped on invalidation, so a load that raced with a change is discarded
+_generations: dict[str, int] = {}
+# Collections too large to hold (or failing to load), not retried until expiry
+_skipped: TTLCache[str, bool] = TTLCache(maxsize=4096, ttl=settings.RAG_HOT_INDEX_RECHECK_SECONDS)
+
+
+async def search_vector(
+    collection_name: str,
+    query_embedding: list[float],
+    top_k: int = 5,
+    query_text: str | None = None,
+) -> list[dict]:
+    """Search a knowledge base in process if loaded, else in Qdrant."""
+    if settings.RAG_HOT_INDEX_ENABLED:
+        index = _indexes.get(collection_name)
+        if index is not None:
+            _indexes.move_to_end(collection_name)
+            with timed("vector_search", "memory"):
+                return index.search(query_embedding, top_k, query_text)
+        _schedule_load(collection_name)
+    return await retriever.search_vector(collection_name, query_embedding, top_k, query_text)
+
+
+def invalidate(collection_name: str) -> None:
+    """Drop a knowledge base's index; it's reloaded on next use."""
+    _generations[collection_name] = _generations.get(collection_name, 0) + 1
+    _skipped.pop(collection_name)
+    if _indexes.pop(collection_name, None) is not None:
+        _sizes.pop(collection_name, None)
+        _update_gauges()
+
+
+def clear() -> None:
+    """Drop every index."""
+    for name in list(_indexes):
+        invalidate(name)
+    _skipped.clear()
+
+
+def _schedule_load(collection_name: str) -> None:
+    if collection_name in _loading or _skipped.get(collection_name):
+        return
+    task = asyncio.create_task(_load(collection_name, _generations.get(collection_name, 0)))
+    _loading[collection_name] = task
+    task.add_done_callback(lambda _: _loading.pop(collection_name, None))
+
+
+async def _load(collection_name: str, generation: int) -> None:
+    """Load a knowledge base's points from Qdrant, if it fits."""
+    location = retriever.locate(collection_name)
+    try:
+        client = await retriever.get_qdrant()
+        count = await client.count(location.collection, count_filter=location.scope(), exact=True)
+        spec = await retriever.collection_spec(location.collection)
+        itemsize = 1 if settings.RAG_HOT_INDEX_DTYPE == "int8" else 4
+        if (
+            count.count > settings.RAG_HOT_INDEX_MAX_CHUNKS
+            or count.count * spec.dimensions * itemsize > _budget()
+        ):
+            _skipped.set(collection_name, True)
+            return
+        points: list = []
+        offset = None
+        while True:
+            batch, offset = await client.scroll(
+                location.collection,
+                scroll_filter=location.scope(),
+                limit=512,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True,
+            )
+            points.extend(batch)
+            if offset is None:
+                break
+        index = await asyncio.to_thread(HotIndex.build, points, spec, settings.RAG_HOT_INDEX_DTYPE)
+    except Exception as exc:
+        # Searches keep going to Qdrant
+        logger.warning("hot_index_load_failed", collection=collection_name, error=str(exc))
+        _skipped.set(collection_name, True)
+        return
+
+    if _generations.get(collection_name, 0) != generation:
+        return
+    _store(collection_name, index)
+
+
+def _store(collection_name: str, index: HotIndex) -> None:
+    """Add an index, evicting the least recently used past the memory budget."""
+    size = index.nbytes
+    if size > _budget():
+        _skipped.set(collection_name, True)
+        return
+    while _indexes and sum(_sizes.values()) + size > _budget():
+        evicted, _ = _indexes.popitem(last=False)
+        _sizes.pop(evicted, None)
+        logger.info("hot_index_evicted", collection=evicted)
+    _indexes[collection_name] = index
+    _sizes[collection_name] = size
+    _update_gauges()
+    logger.info(
+        "hot_index_loaded",
+        collection=collection_name,
+        chunks=len(index.payloads),
+        mb=round(size / 1024 / 1024, 1),
+    )
+
+
+def _budget() -> int:
+    return settings.RAG_HOT_INDEX_MEMORY_MB * 1024 * 1024
+
+
+def _update_gauges() -> None:
+    INDEX_BYTES.set(sum(_sizes.values()))
+    INDEX_COLLECTIONS.set(len(_indexes))
+
+
+async def listen_for_invalidations() -> None:
+    """Drop indexes of knowledge bases that ingestion changed (runs for the app lifetime)."""
+    while True:
+        try:
+            client = await get_redis()
+            pubsub = client.pubsub()
+            await pubsub.psubscribe(EVENTS_PATTERN)
+            # Anything loaded while we weren't listening may be stale
+            clear()
+            try:
+                async for message in pubsub.listen():
+                    if message.get("type") != "pmessage":
+                        continue
+                    if json.loads(message["data"]).get("type") in CHANGE_EVENTS:
+                        kb_id = message["channel"].split(":")[1]
+                        invalidate(retriever.kb_collection_name(kb_id))
+            finally:
+                await pubsub.aclose()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("hot_index_invalidation_listener_failed", error=str(exc))
+            await asyncio.sleep(5)
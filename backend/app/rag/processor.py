@@ -1,10 +1,29 @@
-"""Document processing pipeline for RAG."""
+"""Document processing pipeline for RAG.
+
+Ingestion streams: the document is read from a file on disk (downloaded
+there in blocks, never held whole), text is extracted page by page (PDF) or
+paragraph by paragraph (DOCX) in a process pool, chunked incrementally, and
+embedded and upserted one window of chunks at a time, so memory stays flat
+for large documents.
+
+Chunks are content-addressed: given the hashes already indexed for a
+document, re-indexing embeds only new chunks and deletes removed ones.
+"""
+
+import asyncio
+import codecs
+import importlib.util
+import itertools
+from collections.abc import Awaitable, Callable, Collection, Iterator
+from dataclasses import dataclass
 
 import structlog
 
-from app.rag.chunker import chunk_text
-from app.rag.embeddings import generate_embeddings
-from app.rag.retriever import ensure_collection, upsert_chunks
+from app.core.config import settings
+from app.rag import extraction
+from app.rag.chunker import iter_chunks
+from app.rag.embeddings import iter_embedding_batches
+from app.rag.retriever import chunk_hash, delete_chunks, ensure_collection, upsert_chunks
 
 logger = structlog.get_logger("processor")
 
@@ -15,56 +34,139 @@ SUPPORTED_TYPES = {
     "text/markdown": "md",
 }
 
+# Plain text is decoded this many bytes at a time
+TEXT_BLOCK_BYTES = 1024 * 1024
+
+
+@dataclass(slots=True)
+class IndexResult:
+    """Outcome of indexing a document."""
+
+    chunk_count: int
+    # Manifest of the chunks now indexed, in document order
+    chunk_hashes: list[str]
+    embedded: int
+    removed: int
+
 
 async def process_document(
-    doc_id: str, content: bytes, content_type: str, collection_name: str,
-    openai_key: str | None = None
-) -> int:
-    """Process a document: extract text, chunk, embed, and store."""
+    doc_id: str,
+    path: str,
+    content_type: str,
+    collection_name: str,
+    openai_key: str | None = None,
+    on_progress: Callable[[int], Awaitable[None]] | None = None,
+    indexed_hashes: Collection[str] = (),
+) -> IndexResult:
+    """Process a document file: extract text, chunk, embed, and store.
+
+    Chunks whose hash is in `indexed_hashes` are already stored and are
+    skipped; indexed chunks no longer in the document are deleted.
+    `on_progress` is awaited with the running chunk count after each window.
+    """
     file_type = SUPPORTED_TYPES.get(content_type, "txt")
-    text = _extract_text(content, file_type)
-    if not text.strip():
+    chunks = iter_chunks(iter_text(path, file_type))
+    indexed = set(indexed_hashes)
+
+    # hash -> None, in document order; repeated chunks are stored once
+    seen: dict[str, None] = {}
+    count = embedded = 0
+    collection_ready = bool(indexed)
+    # Extraction runs in a thread, one window ahead of embedding
+    pending = asyncio.ensure_future(_next_window(chunks))
+    try:
+        while window := await pending:
+            pending = asyncio.ensure_future(_next_window(chunks))
+            new_chunks: list[str] = []
+            new_indexes: list[int] = []
+            for i, chunk in enumerate(window, count):
+                digest = chunk_hash(chunk)
+                if digest in seen:
+                    continue
+                seen[digest] = None
+                if digest not in indexed:
+                    new_chunks.append(chunk)
+                    new_indexes.append(i)
+
+            if new_chunks and not collection_ready:
+                await ensure_collection(collection_name)
+                collection_ready = True
+            async for start, embeddings in iter_embedding_batches(new_chunks, api_key=openai_key):
+                stop = start + len(embeddings)
+                await upsert_chunks(
+                    collection_name,
+                    new_chunks[start:stop],
+                    embeddings,
+                    doc_id,
+                    indexes=new_indexes[start:stop],
+                )
+            embedded += len(new_chunks)
+            count += len(window)
+            if on_progress:
+                await on_progress(count)
+    finally:
+        pending.cancel()
+
+    removed = indexed.difference(seen)
+    await delete_chunks(collection_name, doc_id, removed)
+
+    if not seen:
         logger.warning("empty_document", doc_id=doc_id)
-        return 0
+    logger.info(
+        "document_processed",
+        doc_id=doc_id,
+        chunks=len(seen),
+        embedded=embedded,
+        removed=len(removed),
+    )
+    return IndexResult(
+        chunk_count=len(seen), chunk_hashes=list(seen), embedded=embedded, removed=len(removed)
+    )
+
 
-    chunks = chunk_text(text)
-    embeddings = await generate_embeddings(chunks, api_key=openai_key)
-    await ensure_collection(collection_name)
-    count = await upsert_chunks(collection_name, chunks, embeddings, doc_id)
-    logger.info("document_processed", doc_id=doc_id, chunks=count)
-    return count
+async def _next_window(chunks: Iterator[str]) -> list[str]:
+    """Pull the next window of chunks off the (blocking) extraction pipeline."""
+    return await asyncio.to_thread(
+        lambda: list(itertools.islice(chunks, settings.INGEST_WINDOW_CHUNKS))
+    )
 
 
-def _extract_text(content: bytes, file_type: str) -> str:
-    """Extract text from document bytes based on type."""
-    if file_type in ("txt", "md"):
-        return content.decode("utf-8", errors="replace")
+def iter_text(path: str, file_type: str) -> Iterator[str]:
+    """Extract text from a document file as newline-separated segments."""
     if file_type == "pdf":
-        return _extract_pdf_text(content)
+        return _iter_pdf_text(path)
     if file_type == "docx":
-        return _extract_docx_text(content)
-    return content.decode("utf-8", errors="replace")
+        return _iter_docx_text(path)
+    return _iter_plain_text(path)
 
 
-def _extract_pdf_text(content: bytes) -> str:
-    """Extract text from PDF. Requires PyPDF2 or similar."""
-    try:
-        import io
-        from pypdf import PdfReader
-        reader = PdfReader(io.BytesIO(content))
-        return "\n".join(page.extract_text() or "" for page in reader.pages)
-    except ImportError:
+def _iter_plain_text(path: str) -> Iterator[str]:
+    """Read and decode text in blocks, split at line breaks."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    carry = ""
+    with open(path, "rb") as f:
+        while data := f.read(TEXT_BLOCK_BYTES):
+            block = carry + decoder.decode(data)
+            cut = block.rfind("\n")
+            if cut < 0:
+                carry = block
+                continue
+            yield block[:cut]
+            carry = block[cut + 1 :]
+    yield carry + decoder.decode(b"", final=True)
+
+
+def _iter_pdf_text(path: str) -> Iterator[str]:
+    """Extract text from PDF page by page, off-process. Requires pypdf."""
+    if importlib.util.find_spec("pypdf") is None:
         logger.warning("pypdf not installed, treating PDF as raw text")
-        return content.decode("utf-8", errors="replace")
+        return _iter_plain_text(path)
+    return extraction.iter_pdf_pages(path)
 
 
-def _extract_docx_text(content: bytes) -> str:
-    """Extract text from DOCX. Requires python-docx."""
-    try:
-        import io
-        import docx
-        doc = docx.Document(io.BytesIO(content))
-        return "\n".join(p.text for p in doc.paragraphs)
-    except ImportError:
+def _iter_docx_text(path: str) -> Iterator[str]:
+    """Extract text from DOCX paragraph by paragraph, off-process. Requires python-docx."""
+    if importlib.util.find_spec("docx") is None:
         logger.warning("python-docx not installed, treating DOCX as raw text")
-        return content.decode("utf-8", errors="replace")
+        return _iter_plain_text(path)
+    return extraction.iter_docx_paragraphs(path)
@@ -1,83 +1,577 @@
-"""Qdrant-based hybrid retriever for RAG."""
+"""Qdrant-based hybrid retriever for RAG.
 
+Chunks are stored with a named dense vector (embedding) and a named sparse
+vector (BM25 terms, see `app.rag.sparse`). Queries prefetch from both and
+fuse the rankings with RRF inside Qdrant, in one `query_points` call.
+Collections created before sparse vectors existed are searched dense-only.
+
+Each knowledge base is addressed by its logical collection name
+(`kb_collection_name`). By default that is its own Qdrant collection; with
+QDRANT_SHARED_COLLECTIONS set, knowledge bases are spread over a few shared
+collections and every read and write is scoped by a `kb_id` tenant index.
+`locate` is the one place that mapping happens. Which shared collection a
+knowledge base hashes to depends on the shard count, so each shared
+collection records it and `verify_shard_count` refuses a different one.
+
+How a collection stores its dense vectors (dimensions, quantization) is set
+by its storage profile (`app.rag.profiles`) when it's created; embeddings
+and queries are shortened to the collection's dimensions as needed.
+"""
+
+import asyncio
+import hashlib
 import uuid
+import zlib
+from collections import defaultdict
+from collections.abc import Iterable
+from dataclasses import dataclass
 
 import structlog
 from qdrant_client import AsyncQdrantClient
-from qdrant_client.models import Distance, PointStruct, VectorParams
+from qdrant_client.http.exceptions import UnexpectedResponse
+from qdrant_client.models import (
+    Distance,
+    FieldCondition,
+    Filter,
+    FilterSelector,
+    Fusion,
+    FusionQuery,
+    HnswConfigDiff,
+    KeywordIndexParams,
+    KeywordIndexType,
+    MatchAny,
+    MatchValue,
+    Modifier,
+    PointIdsList,
+    PointStruct,
+    Prefetch,
+    SparseVector,
+    SparseVectorParams,
+    VectorParams,
+)
 
 from app.core.config import settings
-from app.rag.embeddings import EMBEDDING_DIMENSIONS, generate_embedding
+from app.core.metrics import timed
+from app.rag import profiles, sparse
+from app.rag.embeddings import EMBEDDING_MODEL, generate_embedding, reduce_dimensions
 
 logger = structlog.get_logger("retriever")
 
+DENSE_VECTOR = "dense"
+SPARSE_VECTOR = "sparse"
+
+KB_COLLECTION_PREFIX = "kb_"
+SHARED_COLLECTION_PREFIX = "kbs_shared_"
+TENANT_KEY = "kb_id"
+# Shared collections' metadata key for the shard count they were created with
+SHARDS_KEY = "shards"
+DOCUMENT_KEY = "document_id"
+
+# Most distinct knowledge bases / documents listed per collection in one call
+FACET_LIMIT = 100_000
+
 _qdrant_client: AsyncQdrantClient | None = None
 
 
+@dataclass(frozen=True, slots=True)
+class CollectionSpec:
+    """What a collection's points look like."""
+
+    # Named dense + sparse vectors (older collections have one unnamed vector)
+    hybrid: bool
+    dimensions: int
+    quantization: str | None = None
+
+
+# Collections known to exist -> their spec (None until first checked)
+_collections: dict[str, CollectionSpec | None] = {}
+_creation_locks: dict[str, asyncio.Lock] = {}
+
+
 async def get_qdrant() -> AsyncQdrantClient:
     """Get or create Qdrant client."""
     global _qdrant_client
     if _qdrant_client is None:
-        kwargs: dict = {"url": settings.QDRANT_URL}
-        if settings.QDRANT_API_KEY:
-            kwargs["api_key"] = settings.QDRANT_API_KEY
-        _qdrant_client = AsyncQdrantClient(**kwargs)
+        _qdrant_client = connect_qdrant()
     return _qdrant_client
 
 
+def connect_qdrant() -> AsyncQdrantClient:
+    """A new Qdrant client, for callers that mustn't share this process's one."""
+    kwargs: dict = {"url": settings.QDRANT_URL}
+    if settings.QDRANT_API_KEY:
+        kwargs["api_key"] = settings.QDRANT_API_KEY
+    return AsyncQdrantClient(**kwargs)
+
+
+def kb_collection_name(kb_id: object) -> str:
+    """Logical collection name of a knowledge base."""
+    return f"{KB_COLLECTION_PREFIX}{kb_id}"
+
+
+@dataclass(frozen=True, slots=True)
+class Location:
+    """Where a knowledge base's points are stored."""
+
+    collection: str
+    # kb_id payload value when the collection is shared
+    tenant: str | None = None
+
+    def scope(self, *conditions: FieldCondition) -> Filter | None:
+        """Filter matching `conditions` within this knowledge base."""
+        must = list(conditions)
+        if self.tenant is not None:
+            must.append(FieldCondition(key=TENANT_KEY, match=MatchValue(value=self.tenant)))
+        return Filter(must=must) if must else None
+
+
+def locate(collection_name: str, shards: int | None = None) -> Location:
+    """Map a knowledge base's logical collection to its physical location."""
+    shards = settings.QDRANT_SHARED_COLLECTIONS if shards is None else shards
+    if shards <= 0:
+        return Location(collection_name)
+    shard = zlib.crc32(collection_name.encode()) % shards
+    return Location(
+        f"{SHARED_COLLECTION_PREFIX}{shard}", collection_name.removeprefix(KB_COLLECTION_PREFIX)
+    )
+
+
+async def warm_collections() -> None:
+    """Load the names of existing collections (at startup)."""
+    try:
+        client = await get_qdrant()
+        collections = await client.get_collections()
+    except Exception as exc:
+        # Collections are then discovered one by one as they're used
+        logger.warning("collection_registry_warm_failed", error=str(exc))
+        return
+    for collection in collections.collections:
+        _collections.setdefault(collection.name, None)
+    logger.info("collection_registry_warmed", collections=len(_collections))
+
+
+async def verify_shard_count(
+    shards: int | None = None, client: AsyncQdrantClient | None = None
+) -> None:
+    """Refuse a shard count other than the one existing shared collections use.
+
+    Knowledge bases would hash to other shared collections and their chunks
+    be stranded. Shared collections created before the count was recorded
+    get it recorded, unless their number shows a larger count was used.
+    """
+    shards = settings.QDRANT_SHARED_COLLECTIONS if shards is None else shards
+    client = client or await get_qdrant()
+    try:
+        collections = await client.get_collections()
+    except Exception as exc:
+        # Qdrant is down; nothing can be stranded until it's back
+        logger.warning("shard_count_check_failed", error=str(exc))
+        return
+    for collection in collections.collections:
+        name = collection.name
+        if not name.startswith(SHARED_COLLECTION_PREFIX):
+            continue
+        info = await client.get_collection(name)
+        recorded = (info.config.metadata or {}).get(SHARDS_KEY)
+        shard = name.removeprefix(SHARED_COLLECTION_PREFIX)
+        if recorded is None and shard.isdigit() and int(shard) < shards:
+            await client.update_collection(name, metadata={SHARDS_KEY: shards})
+            logger.info("shard_count_recorded", name=name, shards=shards)
+        elif recorded != shards:
+            created_for = recorded if recorded is not None else "a different number of"
+            raise RuntimeError(
+                f"QDRANT_SHARED_COLLECTIONS is {shards} but {name} was created for "
+                f"{created_for} shards; changing it would strand knowledge bases' chunks"
+            )
+
+
 async def ensure_collection(collection_name: str) -> None:
-    """Create collection if it doesn't exist."""
+    """Create a knowledge base's collection if it doesn't exist."""
+    await _ensure_location(locate(collection_name))
+
+
+async def _ensure_location(location: Location, shards: int | None = None) -> None:
+    name = location.collection
+    if name in _collections:
+        return
+    # One creator per name; concurrent callers wait and then see it registered
+    lock = _creation_locks.setdefault(name, asyncio.Lock())
+    async with lock:
+        if name in _collections:
+            return
+        client = await get_qdrant()
+        if await client.collection_exists(name):
+            _collections[name] = None
+        else:
+            shared = location.tenant is not None
+            await _create_collection(client, name, shared=shared, shards=shards)
+    _creation_locks.pop(name, None)
+
+
+async def create_collection(
+    collection_name: str, profile: profiles.StorageProfile
+) -> CollectionSpec:
+    """Create a standalone collection with a given storage profile (e.g. a scratch copy).
+
+    Knowledge bases' collections are created on first write instead.
+    """
     client = await get_qdrant()
-    collections = await client.get_collections()
-    names = [c.name for c in collections.collections]
-    if collection_name not in names:
+    await _create_collection(client, collection_name, profile=profile)
+    return await _get_spec(client, collection_name)
+
+
+async def _create_collection(
+    client: AsyncQdrantClient,
+    collection_name: str,
+    shared: bool = False,
+    profile: profiles.StorageProfile | None = None,
+    shards: int | None = None,
+) -> None:
+    profile = profile or profiles.get_profile()
+    shards = settings.QDRANT_SHARED_COLLECTIONS if shards is None else shards
+    try:
         await client.create_collection(
             collection_name=collection_name,
-            vectors_config=VectorParams(size=EMBEDDING_DIMENSIONS, distance=Distance.COSINE),
+            vectors_config={
+                DENSE_VECTOR: VectorParams(
+                    size=profile.dimensions, distance=Distance.COSINE, on_disk=profile.on_disk
+                )
+            },
+            # Qdrant applies IDF over the collection at query time
+            sparse_vectors_config={SPARSE_VECTOR: SparseVectorParams(modifier=Modifier.IDF)},
+            # Shared: no global graph, one HNSW graph per tenant
+            hnsw_config=HnswConfigDiff(payload_m=16, m=0) if shared else None,
+            quantization_config=profiles.quantization_config(profile.quantization),
+            metadata={SHARDS_KEY: shards} if shared else None,
+        )
+        # Deleting and listing a document's chunks filters on it
+        await client.create_payload_index(
+            collection_name=collection_name,
+            field_name=DOCUMENT_KEY,
+            field_schema=KeywordIndexType.KEYWORD,
+        )
+        if shared:
+            await client.create_payload_index(
+                collection_name=collection_name,
+                field_name=TENANT_KEY,
+                field_schema=KeywordIndexParams(type=KeywordIndexType.KEYWORD, is_tenant=True),
+            )
+    except Exception:
+        # Another process may have created it first
+        if not await client.collection_exists(collection_name):
+            raise
+        _collections[collection_name] = None
+        return
+    _collections[collection_name] = CollectionSpec(
+        hybrid=True, dimensions=profile.dimensions, quantization=profile.quantization
+    )
+    logger.info("collection_created", name=collection_name, profile=profile.name)
+
+
+async def drop_collection(collection_name: str) -> None:
+    """Delete a knowledge base's points: its whole collection, or its share of one."""
+    await purge(locate(collection_name))
+
+
+async def purge(location: Location, doc_ids: list[str] | None = None) -> None:
+    """Delete the points of some documents, or all of a knowledge base's points."""
+    client = await get_qdrant()
+    if doc_ids is None and location.tenant is None:
+        _collections.pop(location.collection, None)
+        if await client.delete_collection(location.collection):
+            logger.info("collection_deleted", name=location.collection)
+        return
+
+    conditions = []
+    if doc_ids is not None:
+        if not doc_ids:
+            return
+        conditions.append(FieldCondition(key=DOCUMENT_KEY, match=MatchAny(any=doc_ids)))
+    try:
+        await client.delete(
+            collection_name=location.collection,
+            points_selector=FilterSelector(filter=location.scope(*conditions)),
+        )
+    except UnexpectedResponse as exc:
+        # Nothing was ever stored there
+        if exc.status_code != 404:
+            raise
+        forget_collection(location.collection)
+
+
+async def _collection_exists(client: AsyncQdrantClient, collection_name: str) -> bool:
+    """Whether a collection exists, registering it if so."""
+    if collection_name in _collections:
+        return True
+    if not await client.collection_exists(collection_name):
+        return False
+    _collections.setdefault(collection_name, None)
+    return True
+
+
+def forget_collection(collection_name: str) -> None:
+    """Drop a physical collection from the registry (e.g. it was deleted elsewhere)."""
+    _collections.pop(collection_name, None)
+
+
+async def collection_spec(collection_name: str) -> CollectionSpec:
+    """How a physical collection (see `locate`) stores its points."""
+    return await _get_spec(await get_qdrant(), collection_name)
+
+
+async def _get_spec(client: AsyncQdrantClient, collection_name: str) -> CollectionSpec:
+    """A collection's spec, read from Qdrant the first time."""
+    spec = _collections.get(collection_name)
+    if spec is None:
+        info = await client.get_collection(collection_name)
+        vectors = info.config.params.vectors
+        dense = vectors[DENSE_VECTOR] if isinstance(vectors, dict) else vectors
+        spec = CollectionSpec(
+            hybrid=SPARSE_VECTOR in (info.config.params.sparse_vectors or {}),
+            dimensions=dense.size,
+            quantization=profiles.quantization_kind(
+                dense.quantization_config or info.config.quantization_config
+            ),
         )
-        logger.info("collection_created", name=collection_name)
+        _collections[collection_name] = spec
+    return spec
 
 
-def _chunk_id(doc_id: str, chunk_index: int) -> str:
-    """Generate a deterministic UUID for a chunk based on doc_id and index."""
+def _forget_if_missing(collection_name: str, exc: Exception) -> bool:
+    """Unregister a collection Qdrant says doesn't exist, so the next call recreates it."""
+    if isinstance(exc, UnexpectedResponse) and exc.status_code == 404:
+        forget_collection(collection_name)
+        return True
+    return False
+
+
+def chunk_hash(chunk: str) -> str:
+    """Content address of a chunk (128-bit sha256 prefix)."""
+    return hashlib.sha256(chunk.encode()).hexdigest()[:32]
+
+
+def _chunk_id(doc_id: str, content_hash: str) -> str:
+    """Generate a deterministic UUID for a chunk based on doc_id and content."""
     # Use uuid5 with a namespace to create deterministic, valid UUIDs
     namespace = uuid.UUID("6ba7b810-9dad-11d1-80b4-00c04fd430c8")  # URL namespace
-    return str(uuid.uuid5(namespace, f"{doc_id}:{chunk_index}"))
+    return str(uuid.uuid5(namespace, f"{doc_id}:{content_hash}"))
 
 
 async def upsert_chunks(
-    collection_name: str, chunks: list[str], embeddings: list[list[float]],
-    doc_id: str, metadata: dict | None = None,
+    collection_name: str,
+    chunks: list[str],
+    embeddings: list[list[float]],
+    doc_id: str,
+    metadata: dict | None = None,
+    indexes: list[int] | None = None,
 ) -> int:
-    """Upsert text chunks with their embeddings into Qdrant."""
+    """Upsert text chunks with their embeddings into Qdrant.
+
+    Point ids derive from chunk content, so re-upserting unchanged text is a
+    no-op. `indexes` are the chunks' positions in the document (default 0..n).
+    """
+    location = locate(collection_name)
     client = await get_qdrant()
+    await _ensure_location(location)
+    spec = await _get_spec(client, location.collection)
+    extra = dict(metadata or {})
+    if location.tenant is not None:
+        extra[TENANT_KEY] = location.tenant
     points = [
         PointStruct(
-            id=_chunk_id(doc_id, i),
-            vector=embedding,
-            payload={"content": chunk, "document_id": doc_id, "chunk_index": i, **(metadata or {})},
+            id=_chunk_id(doc_id, chunk_hash(chunk)),
+            vector=point_vector(chunk, embedding, spec),
+            payload={"content": chunk, "document_id": doc_id, "chunk_index": i, **extra},
+        )
+        for i, chunk, embedding in zip(
+            indexes or range(len(chunks)), chunks, embeddings, strict=True
         )
-        for i, (chunk, embedding) in enumerate(zip(chunks, embeddings))
     ]
-    await client.upsert(collection_name=collection_name, points=points)
+    try:
+        await client.upsert(collection_name=location.collection, points=points)
+    except Exception as exc:
+        _forget_if_missing(location.collection, exc)
+        raise
     return len(points)
 
 
-async def search(collection_name: str, query: str, top_k: int = 5) -> list[dict]:
-    """Search collection using dense vector similarity."""
+def point_vector(chunk: str, embedding: list[float], spec: CollectionSpec) -> dict | list[float]:
+    """A chunk's vectors, as the collection stores them."""
+    embedding = reduce_dimensions(embedding, spec.dimensions)
+    if not spec.hybrid:
+        return embedding
+    indices, values = sparse.document_vector(chunk)
+    return {
+        DENSE_VECTOR: embedding,
+        SPARSE_VECTOR: SparseVector(indices=indices, values=values),
+    }
+
+
+async def delete_chunks(collection_name: str, doc_id: str, hashes: Iterable[str]) -> None:
+    """Delete a document's chunks by content hash."""
+    ids = [_chunk_id(doc_id, h) for h in hashes]
+    if not ids:
+        return
     client = await get_qdrant()
-    
-    # Ensure collection exists before searching
-    await ensure_collection(collection_name)
-    
-    query_embedding = await generate_embedding(query)
-    # Qdrant SDK v1.16+ uses query_points instead of search
-    results = await client.query_points(
-        collection_name=collection_name,
-        query=query_embedding,
-        limit=top_k,
-        with_payload=True,
+    await client.delete(
+        collection_name=locate(collection_name).collection,
+        points_selector=PointIdsList(points=ids),
+    )
+
+
+async def delete_document_chunks(collection_name: str, doc_id: str) -> None:
+    """Delete every chunk of a document, whatever its ids."""
+    await purge(locate(collection_name), [doc_id])
+
+
+# ---------------------------------------------------------------------------
+# Inventory (for reconciling against the database)
+# ---------------------------------------------------------------------------
+
+
+async def indexed_knowledge_bases() -> dict[str, list[Location]]:
+    """Every knowledge base with points in Qdrant -> where they are.
+
+    A knowledge base can be in two places while it's being migrated to a
+    shared collection.
+    """
+    client = await get_qdrant()
+    collections = await client.get_collections()
+    found: defaultdict[str, list[Location]] = defaultdict(list)
+    for collection in collections.collections:
+        name = collection.name
+        if name.startswith(SHARED_COLLECTION_PREFIX):
+            tenants = await client.facet(name, TENANT_KEY, limit=FACET_LIMIT, exact=True)
+            for hit in tenants.hits:
+                found[str(hit.value)].append(Location(name, str(hit.value)))
+        elif name.startswith(KB_COLLECTION_PREFIX):
+            found[name.removeprefix(KB_COLLECTION_PREFIX)].append(Location(name))
+    return dict(found)
+
+
+async def indexed_documents(location: Location) -> dict[str, int]:
+    """Document ids with points at a location -> their point counts."""
+    client = await get_qdrant()
+    await _ensure_document_index(client, location.collection)
+    documents = await client.facet(
+        location.collection,
+        DOCUMENT_KEY,
+        facet_filter=location.scope(),
+        limit=FACET_LIMIT,
+        exact=True,
     )
+    return {str(hit.value): hit.count for hit in documents.hits}
+
+
+async def count_points(location: Location) -> int:
+    """Number of points at a location."""
+    client = await get_qdrant()
+    result = await client.count(location.collection, count_filter=location.scope(), exact=True)
+    return result.count
+
+
+async def point_bytes(location: Location) -> int:
+    """Approximate vector storage per point (original plus quantized copy)."""
+    client = await get_qdrant()
+    spec = await _get_spec(client, location.collection)
+    quantized = {profiles.INT8: spec.dimensions, profiles.BINARY: spec.dimensions // 8}
+    return spec.dimensions * 4 + quantized.get(spec.quantization, 0)
+
+
+async def _ensure_document_index(client: AsyncQdrantClient, collection_name: str) -> None:
+    """Add the document_id index to collections created before it existed."""
+    info = await client.get_collection(collection_name)
+    if DOCUMENT_KEY not in (info.payload_schema or {}):
+        await client.create_payload_index(
+            collection_name=collection_name,
+            field_name=DOCUMENT_KEY,
+            field_schema=KeywordIndexType.KEYWORD,
+            wait=True,
+        )
+
+
+async def search(
+    collection_name: str, query: str, top_k: int = 5, api_key: str | None = None
+) -> list[dict]:
+    """Embed a query and search the collection.
+
+    Hybrid collections fuse dense and sparse (BM25) matches; see `search_vector`.
+    """
+    with timed("embedding", "openai", EMBEDDING_MODEL):
+        query_embedding = await generate_embedding(query, api_key)
+    return await search_vector(collection_name, query_embedding, top_k, query_text=query)
+
+
+async def search_vector(
+    collection_name: str,
+    query_embedding: list[float],
+    top_k: int = 5,
+    query_text: str | None = None,
+) -> list[dict]:
+    """Search collection with an already computed query embedding.
+
+    With `query_text`, dense and sparse results are fused (RRF), so scores
+    are rank-based rather than cosine similarities. Quantized collections
+    are searched with oversampling and rescored with the original vectors.
+    """
+    location = locate(collection_name)
+    client = await get_qdrant()
+    # Searching never creates anything: nothing indexed yet, nothing found
+    if not await _collection_exists(client, location.collection):
+        return []
+    try:
+        spec = await _get_spec(client, location.collection)
+    except Exception as exc:
+        # Deleted since it was registered
+        if not _forget_if_missing(location.collection, exc):
+            raise
+        return []
+    query_embedding = reduce_dimensions(query_embedding, spec.dimensions)
+    scope = location.scope()
+    params = profiles.search_params(spec.quantization)
+
+    query: dict = {
+        "query": query_embedding,
+        "using": DENSE_VECTOR if spec.hybrid else None,
+        "query_filter": scope,
+        "search_params": params,
+    }
+    if spec.hybrid and query_text and settings.RAG_HYBRID_ENABLED:
+        indices, values = sparse.query_vector(query_text)
+        if indices:
+            limit = max(top_k, settings.RAG_HYBRID_PREFETCH_LIMIT)
+            query = {
+                "prefetch": [
+                    Prefetch(
+                        query=query_embedding,
+                        using=DENSE_VECTOR,
+                        filter=scope,
+                        params=params,
+                        limit=limit,
+                    ),
+                    Prefetch(
+                        query=SparseVector(indices=indices, values=values),
+                        using=SPARSE_VECTOR,
+                        filter=scope,
+                        limit=limit,
+                    ),
+                ],
+                "query": FusionQuery(fusion=Fusion.RRF),
+            }
+
+    # Qdrant SDK v1.16+ uses query_points instead of search
+    try:
+        with timed("vector_search", "qdrant"):
+            results = await client.query_points(
+                collection_name=location.collection,
+                limit=top_k,
+                with_payload=True,
+                **query,
+            )
+    except Exception as exc:
+        if not _forget_if_missing(location.collection, exc):
+            raise
+        return []
     return [
         {"content": r.payload.get("content", ""), "score": r.score,
          "document_id": r.payload.get("document_id", ""), "metadata": r.payload}
@@ -0,0 +1,60 @@
+"""Local sparse (BM25-style) vectors for lexical matching.
+
+Tokens are hashed into a 32-bit index space, so no vocabulary is stored.
+Documents carry BM25 term-frequency weights; Qdrant's IDF modifier on the
+sparse vector supplies the inverse document frequency at query time.
+"""
+
+import re
+import zlib
+from collections import Counter
+
+from app.rag.chunker import DEFAULT_CHUNK_TOKENS
+
+# Words, with compounds like "AB-1234", "v2.1" or "555-0100" kept whole
+_TOKEN = re.compile(r"[^\W_]+(?:[-./][^\W_]+)*")
+_SEPARATOR = re.compile(r"[-./]")
+
+# BM25 parameters. Chunks fill most of their embedding-token budget, so a fixed
+# average length is close enough; full chunks of English prose hold about two
+# `tokenize` tokens for every three budget tokens.
+K1 = 1.2
+B = 0.75
+SPARSE_TOKENS_PER_BUDGET_TOKEN = 0.67
+AVG_DOC_TOKENS = round(DEFAULT_CHUNK_TOKENS * SPARSE_TOKENS_PER_BUDGET_TOKEN)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercased tokens; compounds also yield their parts and a joined form.
+
+    "SKU-44-901" gives "sku-44-901", "sku", "44", "901" and "sku44901", so
+    product codes and phone numbers match however they're punctuated.
+    """
+    tokens: list[str] = []
+    for match in _TOKEN.finditer(text.lower()):
+        token = match.group()
+        tokens.append(token)
+        parts = _SEPARATOR.split(token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+            tokens.append("".join(parts))
+    return tokens
+
+
+def document_vector(text: str) -> tuple[list[int], list[float]]:
+    """Sparse indices and BM25 term weights for a stored chunk."""
+    counts = _hashed_counts(tokenize(text))
+    length = sum(counts.values())
+    norm = K1 * (1 - B + B * length / AVG_DOC_TOKENS)
+    indices = list(counts)
+    return indices, [tf * (K1 + 1) / (tf + norm) for tf in counts.values()]
+
+
+def query_vector(text: str) -> tuple[list[int], list[float]]:
+    """Sparse indices and weights for a query (each term once)."""
+    indices = list(_hashed_counts(tokenize(text)))
+    return indices, [1.0] * len(indices)
+
+
+def _hashed_counts(tokens: list[str]) -> Counter[int]:
+    return Counter(zlib.crc32(token.encode()) for token in tokens)
@@ -19,6 +19,7 @@ class AgentCreate(BaseModel):
     language: str = "en"
     max_call_duration_seconds: int = Field(default=600, ge=30, le=3600)
     tools: dict = Field(default_factory=dict)
+    agent_metadata: dict = Field(default_factory=dict)
 
 
 class AgentUpdate(BaseModel):
@@ -34,6 +35,8 @@ class AgentUpdate(BaseModel):
     language: str | None = None
     max_call_duration_seconds: int | None = None
     tools: dict | None = None
+    # Omit to keep the current value; null is rejected (the column is NOT NULL)
+    agent_metadata: dict = Field(default=None)
     is_active: bool | None = None
 
 
@@ -52,6 +55,7 @@ class AgentResponse(BaseModel):
     language: str
     max_call_duration_seconds: int
     tools: dict
+    agent_metadata: dict
     is_active: bool
     created_at: datetime
     updated_at: datetime
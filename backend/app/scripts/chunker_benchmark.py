@@ -0,0 +1,151 @@
+"""Benchmark the chunker: throughput, chunk sizes and embedding request packing.
+
+Text is extracted up front, so only chunking (sentence splitting, token
+counting, packing) is timed. Without files, a synthetic Markdown corpus is
+generated.
+
+    python -m app.scripts.chunker_benchmark docs/*.pdf docs/*.md
+    python -m app.scripts.chunker_benchmark --synthetic-mb 50
+"""
+
+import argparse
+import mimetypes
+import random
+import statistics
+import time
+from pathlib import Path
+
+from app.core.config import settings
+from app.rag.chunker import DEFAULT_CHUNK_TOKENS, DEFAULT_OVERLAP_TOKENS, iter_chunks
+from app.rag.embeddings import count_tokens, pack_batches
+from app.rag.processor import SUPPORTED_TYPES, iter_text
+
+_WORDS = [
+    "the",
+    "a",
+    "of",
+    "to",
+    "and",
+    "in",
+    "is",
+    "for",
+    "on",
+    "with",
+    "as",
+    "by",
+    "at",
+    "from",
+    "our",
+    "your",
+    "we",
+    "you",
+    "it",
+    "this",
+    "that",
+    "be",
+    "are",
+    "account",
+    "billing",
+    "refund",
+    "policy",
+    "order",
+    "shipping",
+    "delivery",
+    "return",
+    "warranty",
+    "support",
+    "agent",
+    "customer",
+    "service",
+    "plan",
+    "price",
+    "subscription",
+    "invoice",
+    "payment",
+    "card",
+    "cancel",
+    "upgrade",
+    "appointment",
+    "schedule",
+    "hours",
+    "location",
+    "phone",
+    "email",
+    "contact",
+    "product",
+    "model",
+    "SKU-4410",
+    "v2.1",
+    "2024-06-30",
+]
+
+
+def synthetic_corpus(megabytes: float, seed: int = 0) -> list[str]:
+    """Markdown-like pages: headings, paragraphs of sentences of varied length."""
+    rng = random.Random(seed)
+    pages: list[str] = []
+    size = 0
+    while size < megabytes * 1024 * 1024:
+        lines = []
+        for _ in range(rng.randint(1, 4)):
+            lines.append(f"{'#' * rng.randint(1, 3)} {' '.join(rng.choices(_WORDS, k=4)).title()}")
+            for _ in range(rng.randint(1, 6)):
+                sentences = (
+                    " ".join(rng.choices(_WORDS, k=rng.randint(4, 40))).capitalize()
+                    + rng.choice(".?!")
+                    for _ in range(rng.randint(1, 8))
+                )
+                lines.append(" ".join(sentences) + "\n")
+        page = "\n".join(lines)
+        pages.append(page)
+        size += len(page.encode())
+    return pages
+
+
+def load(path: Path) -> list[str]:
+    """A file's text segments, as ingestion extracts them."""
+    content_type = mimetypes.guess_type(path.name)[0] or "text/plain"
+    return list(iter_text(str(path), SUPPORTED_TYPES.get(content_type, "txt")))
+
+
+def benchmark(name: str, segments: list[str], max_tokens: int, overlap_tokens: int) -> None:
+    size = sum(len(s.encode()) for s in segments)
+    start = time.perf_counter()
+    chunks = list(iter_chunks(segments, max_tokens, overlap_tokens))
+    elapsed = time.perf_counter() - start
+
+    tokens = [count_tokens(c) for c in chunks]
+    batches = pack_batches(chunks)
+    budget = settings.EMBEDDING_REQUEST_MAX_TOKENS
+    fills = [sum(tokens[offset : offset + len(batch)]) / budget for offset, batch in batches[:-1]]
+    quantiles = statistics.quantiles(tokens, n=20) if len(tokens) > 1 else tokens * 19
+
+    print(f"\n{name}: {size / 1024 / 1024:.1f} MB, {len(chunks)} chunks")
+    print(f"  throughput     {size / 1024 / 1024 / elapsed:8.2f} MB/s ({elapsed:.2f}s)")
+    print(
+        f"  chunk tokens   mean {statistics.mean(tokens):.0f}, p5 {quantiles[0]:.0f}, "
+        f"p95 {quantiles[-1]:.0f}, max {max(tokens)} (budget {max_tokens})"
+    )
+    print(
+        f"  embed requests {len(batches)}, full ones filled "
+        f"{statistics.mean(fills) * 100 if fills else 0:.1f}% of {budget} tokens"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="*", type=Path)
+    parser.add_argument("--synthetic-mb", type=float, default=20.0)
+    parser.add_argument("--max-tokens", type=int, default=DEFAULT_CHUNK_TOKENS)
+    parser.add_argument("--overlap-tokens", type=int, default=DEFAULT_OVERLAP_TOKENS)
+    args = parser.parse_args()
+
+    corpora = [(str(path), load(path)) for path in args.files] or [
+        (f"synthetic {args.synthetic_mb:g} MB", synthetic_corpus(args.synthetic_mb))
+    ]
+    for name, segments in corpora:
+        benchmark(name, segments, args.max_tokens, args.overlap_tokens)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Copy per-knowledge-base collections into the shared, tenant-indexed ones.
+
+Run before setting QDRANT_SHARED_COLLECTIONS (copying is idempotent, so
+re-running after new uploads is safe), then again with --drop once the
+setting is live to delete the old collections:
+
+    python -m app.scripts.migrate_shared_collections --shards 4
+    python -m app.scripts.migrate_shared_collections --shards 4 --drop
+
+The shard count is fixed once shared collections exist: a knowledge base's
+shared collection is its id's hash modulo the count, so another count would
+look for its chunks in the wrong collection. Each shared collection records
+the count it was created for, and the API, the workers and this script
+refuse to run with a different one.
+"""
+
+import argparse
+import asyncio
+import re
+
+import structlog
+from qdrant_client.models import PointStruct
+
+from app.core.logging import setup_logging
+from app.rag import retriever
+from app.rag.embeddings import reduce_dimensions
+
+logger = structlog.get_logger("migrate_shared_collections")
+
+KB_COLLECTION = re.compile(rf"^{retriever.KB_COLLECTION_PREFIX}[0-9a-f-]{{36}}$")
+
+
+async def migrate(shards: int, drop: bool, batch_size: int) -> None:
+    """Copy every `kb_<id>` collection into its shared collection."""
+    client = await retriever.get_qdrant()
+    await retriever.verify_shard_count(shards)
+    collections = await client.get_collections()
+    names = sorted(c.name for c in collections.collections if KB_COLLECTION.match(c.name))
+    logger.info("migration_started", collections=len(names), shards=shards)
+
+    for name in names:
+        target = retriever.locate(name, shards=shards)
+        await retriever._ensure_location(target, shards)
+        copied = await _copy(name, target, batch_size)
+
+        result = await client.count(target.collection, count_filter=target.scope(), exact=True)
+        source = await client.count(name, exact=True)
+        if result.count < source.count:
+            logger.error(
+                "migration_incomplete", collection=name, source=source.count, target=result.count
+            )
+            continue
+        logger.info("collection_migrated", collection=name, target=target.collection, points=copied)
+        if drop:
+            await client.delete_collection(name)
+            retriever.forget_collection(name)
+            logger.info("collection_dropped", collection=name)
+
+
+async def _copy(name: str, target: retriever.Location, batch_size: int) -> int:
+    """Scroll a collection and upsert its points into the shared collection."""
+    client = await retriever.get_qdrant()
+    spec = await retriever.collection_spec(target.collection)
+    copied = 0
+    offset = None
+    while True:
+        points, offset = await client.scroll(
+            name, limit=batch_size, offset=offset, with_payload=True, with_vectors=True
+        )
+        if points:
+            await client.upsert(
+                collection_name=target.collection,
+                points=[
+                    PointStruct(
+                        id=p.id,
+                        vector=_target_vector(p.vector, p.payload or {}, spec),
+                        payload={**(p.payload or {}), retriever.TENANT_KEY: target.tenant},
+                    )
+                    for p in points
+                ],
+            )
+            copied += len(points)
+        if offset is None:
+            return copied
+
+
+def _target_vector(
+    vector: list[float] | dict, payload: dict, spec: retriever.CollectionSpec
+) -> dict | list[float]:
+    """A point's vectors for the shared collection.
+
+    The sparse vector is computed for pre-hybrid collections, and the dense
+    one shortened if the shared collection's profile has fewer dimensions.
+    """
+    if isinstance(vector, dict) and retriever.SPARSE_VECTOR in vector:
+        dense = reduce_dimensions(vector[retriever.DENSE_VECTOR], spec.dimensions)
+        return {**vector, retriever.DENSE_VECTOR: dense}
+    dense = vector[retriever.DENSE_VECTOR] if isinstance(vector, dict) else vector
+    return retriever.point_vector(payload.get("content", ""), dense, spec)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shards", type=int, required=True, help="QDRANT_SHARED_COLLECTIONS")
+    parser.add_argument("--drop", action="store_true", help="delete each source once verified")
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+    if args.shards <= 0:
+        parser.error("--shards must be positive")
+    setup_logging()
+    asyncio.run(migrate(args.shards, args.drop, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""Compare vector storage profiles against full precision on real collections.
+
+For each collection, copies its points into a scratch collection per
+profile (never wider than the collection's own vectors), then runs
+held-out chunks (or queries from a file) against each. Recall@k is
+measured against an exact full-precision search, alongside search latency
+and the dense vectors' RAM. Scratch collections are deleted afterwards.
+
+    python -m app.scripts.storage_profile_report --collections kb_<id> --queries 100
+    python -m app.scripts.storage_profile_report --queries-file queries.txt
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import random
+import statistics
+import time
+import uuid
+
+import structlog
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.models import CollectionStatus, PointStruct, SearchParams
+
+from app.core.logging import setup_logging
+from app.rag import profiles, retriever
+from app.rag.embeddings import generate_embeddings, reduce_dimensions
+
+logger = structlog.get_logger("storage_profile_report")
+
+SCRATCH_PREFIX = "profile_report_"
+
+
+async def report(
+    collections: list[str] | None,
+    profile_names: list[str],
+    queries: int,
+    queries_file: str | None,
+    top_k: int,
+    max_points: int,
+) -> None:
+    client = await retriever.get_qdrant()
+    if not collections:
+        listed = await client.get_collections()
+        collections = sorted(
+            c.name for c in listed.collections if c.name.startswith(retriever.KB_COLLECTION_PREFIX)
+        )
+    query_texts = _read_queries(queries_file) if queries_file else None
+    query_vectors = await generate_embeddings(query_texts) if query_texts else None
+
+    for name in collections:
+        points = await _load(client, name, max_points)
+        if len(points) <= top_k * 5:
+            logger.info("collection_skipped", collection=name, points=len(points))
+            continue
+        if query_vectors is None:
+            # Held-out chunks stand in for queries
+            random.shuffle(points)
+            count = min(queries, len(points) // 5)
+            held_out, points = points[:count], points[count:]
+            vectors = [_dense(p.vector) for p in held_out]
+        else:
+            vectors = query_vectors
+        source = await retriever.collection_spec(name)
+        vectors = [reduce_dimensions(v, source.dimensions) for v in vectors]
+        rows = await _compare(client, name, source, points, vectors, profile_names, top_k)
+        _print_table(name, len(points), len(vectors), top_k, rows)
+
+
+async def _compare(
+    client: AsyncQdrantClient,
+    name: str,
+    source: retriever.CollectionSpec,
+    points: list,
+    queries: list[list[float]],
+    profile_names: list[str],
+    top_k: int,
+) -> list[tuple]:
+    """Recall@k, latency and RAM of each profile on one collection's points.
+
+    Vectors can only be shortened, so profiles wider than the source's
+    vectors are measured at the source's dimensions.
+    """
+    scratch = f"{SCRATCH_PREFIX}{uuid.uuid4().hex[:8]}_"
+    truth: list[set] | None = None
+    rows = []
+    try:
+        for profile in [profiles.get_profile("full")] + [
+            profiles.get_profile(p) for p in profile_names if p != "full"
+        ]:
+            profile = dataclasses.replace(
+                profile, dimensions=min(profile.dimensions, source.dimensions)
+            )
+            target = scratch + profile.name
+            spec = await retriever.create_collection(target, profile)
+            await _copy(client, target, points, spec)
+            await _wait_indexed(client, target)
+
+            if truth is None:
+                truth = [
+                    await _search(client, target, q, top_k, SearchParams(exact=True))
+                    for q in queries
+                ]
+            params = profiles.search_params(profile.quantization)
+            recalls, latencies = [], []
+            for q, expected in zip(queries, truth, strict=True):
+                start = time.perf_counter()
+                found = await _search(
+                    client, target, reduce_dimensions(q, profile.dimensions), top_k, params
+                )
+                latencies.append((time.perf_counter() - start) * 1000)
+                recalls.append(len(found & expected) / len(expected) if expected else 1.0)
+            rows.append(
+                (
+                    profile.name,
+                    statistics.mean(recalls),
+                    statistics.median(latencies),
+                    _percentile(latencies, 0.95),
+                    profile.ram_bytes_per_vector * len(points) / 1024 / 1024,
+                )
+            )
+    finally:
+        for profile_name in {"full", *profile_names}:
+            retriever.forget_collection(scratch + profile_name)
+            if await client.collection_exists(scratch + profile_name):
+                await client.delete_collection(scratch + profile_name)
+    return rows
+
+
+async def _load(client: AsyncQdrantClient, name: str, max_points: int) -> list:
+    points: list = []
+    offset = None
+    while len(points) < max_points:
+        batch, offset = await client.scroll(
+            name,
+            limit=min(256, max_points - len(points)),
+            offset=offset,
+            with_payload=True,
+            with_vectors=True,
+        )
+        points.extend(batch)
+        if offset is None:
+            break
+    return points
+
+
+async def _copy(
+    client: AsyncQdrantClient, target: str, points: list, spec: retriever.CollectionSpec
+) -> None:
+    for i in range(0, len(points), 256):
+        await client.upsert(
+            collection_name=target,
+            points=[
+                PointStruct(
+                    id=p.id,
+                    vector=retriever.point_vector(
+                        (p.payload or {}).get("content", ""), _dense(p.vector), spec
+                    ),
+                )
+                for p in points[i : i + 256]
+            ],
+        )
+
+
+async def _wait_indexed(client: AsyncQdrantClient, name: str, timeout: float = 600.0) -> None:
+    """Wait for the optimizer to finish, so latency is measured on the built index."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        info = await client.get_collection(name)
+        if info.status == CollectionStatus.GREEN:
+            return
+        await asyncio.sleep(1.0)
+    logger.warning("collection_not_indexed", collection=name)
+
+
+async def _search(
+    client: AsyncQdrantClient,
+    name: str,
+    vector: list[float],
+    top_k: int,
+    params: SearchParams | None,
+) -> set:
+    result = await client.query_points(
+        collection_name=name,
+        query=vector,
+        using=retriever.DENSE_VECTOR,
+        limit=top_k,
+        search_params=params,
+    )
+    return {p.id for p in result.points}
+
+
+def _dense(vector: list[float] | dict) -> list[float]:
+    return vector[retriever.DENSE_VECTOR] if isinstance(vector, dict) else vector
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _read_queries(path: str) -> list[str]:
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def _print_table(name: str, points: int, queries: int, top_k: int, rows: list[tuple]) -> None:
+    print(f"\n{name}: {points} points, {queries} queries, recall@{top_k} vs exact full precision")
+    print(f"{'profile':<10} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8} {'RAM MB':>8}")
+    for profile, recall, p50, p95, ram in rows:
+        print(f"{profile:<10} {recall:>7.3f} {p50:>8.2f} {p95:>8.2f} {ram:>8.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--collections", nargs="*", help="default: every kb_* collection")
+    parser.add_argument(
+        "--profiles",
+        nargs="*",
+        default=[p for p in profiles.PROFILES if p != "full"],
+        choices=list(profiles.PROFILES),
+    )
+    parser.add_argument("--queries", type=int, default=100, help="held-out chunks per collection")
+    parser.add_argument("--queries-file", help="one query per line, embedded with OpenAI")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--max-points", type=int, default=50_000)
+    args = parser.parse_args()
+    setup_logging()
+    asyncio.run(
+        report(
+            args.collections,
+            args.profiles,
+            args.queries,
+            args.queries_file,
+            args.top_k,
+            args.max_points,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
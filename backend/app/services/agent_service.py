@@ -1,5 +1,6 @@
 """Agent service — CRUD and validation."""
 
+import asyncio
 from uuid import UUID
 
 import structlog
@@ -8,11 +9,17 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.exceptions import ForbiddenException, NotFoundException
 from app.models.agent import Agent
+from app.models.knowledge_base import KnowledgeBase
 from app.models.organization import Organization
 from app.schemas.agent import AgentBrief, AgentCreate, AgentResponse, AgentUpdate
+from app.services import knowledge_base_service, provider_key_service, voice_bootstrap_service
+from app.voice import tts
 
 logger = structlog.get_logger("agent_service")
 
+# In-flight greeting renders; the loop only keeps weak references to tasks
+_prerenders: set[asyncio.Task] = set()
+
 
 async def list_agents(org_id: UUID, db: AsyncSession) -> list[AgentBrief]:
     """List all agents for an organization."""
@@ -34,7 +41,8 @@ async def create_agent(data: AgentCreate, org_id: UUID, db: AsyncSession) -> Age
     await _check_agent_limit(org_id, db)
     agent = Agent(organization_id=org_id, **data.model_dump())
     db.add(agent)
-    await db.flush()
+    await db.commit()
+    await _prerender_greeting(agent, db)
     logger.info("agent_created", agent_id=str(agent.id), org_id=str(org_id))
     return AgentResponse.model_validate(agent)
 
@@ -44,21 +52,41 @@ async def update_agent(
 ) -> AgentResponse:
     """Update an existing agent."""
     agent = await _get_agent_or_raise(agent_id, org_id, db)
-    for field, value in data.model_dump(exclude_unset=True).items():
+    changes = data.model_dump(exclude_unset=True)
+    for field, value in changes.items():
         setattr(agent, field, value)
-    await db.flush()
+    # Commit before invalidating so a concurrent call can't re-cache the old agent
+    await db.commit()
+    await voice_bootstrap_service.invalidate_agent(agent_id)
+    if changes.keys() & {"greeting_message", "tts_voice"}:
+        await _prerender_greeting(agent, db)
     logger.info("agent_updated", agent_id=str(agent_id))
     return AgentResponse.model_validate(agent)
 
 
 async def delete_agent(agent_id: UUID, org_id: UUID, db: AsyncSession) -> None:
-    """Delete an agent."""
+    """Delete an agent, its knowledge bases and their vectors."""
     agent = await _get_agent_or_raise(agent_id, org_id, db)
+    result = await db.execute(select(KnowledgeBase.id).where(KnowledgeBase.agent_id == agent_id))
+    kb_ids = result.scalars().all()
     await db.delete(agent)
-    await db.flush()
+    await db.commit()
+    await knowledge_base_service.delete_knowledge_base_vectors(kb_ids)
+    await voice_bootstrap_service.invalidate_agent(agent_id)
     logger.info("agent_deleted", agent_id=str(agent_id))
 
 
+async def _prerender_greeting(agent: Agent, db: AsyncSession) -> None:
+    """Render the greeting in the background so calls can play it instantly.
+
+    Call after the agent is committed.
+    """
+    api_key = await provider_key_service.get_key(agent.organization_id, "deepgram", db)
+    task = asyncio.create_task(tts.prerender(agent.tts_voice, agent.greeting_message, api_key))
+    _prerenders.add(task)
+    task.add_done_callback(_prerenders.discard)
+
+
 async def _get_agent_or_raise(agent_id: UUID, org_id: UUID, db: AsyncSession) -> Agent:
     """Fetch agent scoped to org, raise if not found."""
     result = await db.execute(
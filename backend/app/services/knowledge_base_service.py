@@ -1,7 +1,9 @@
 """Knowledge base service — upload, process, embed."""
 
-import asyncio
 import json
+import os
+import tempfile
+from collections.abc import Iterable
 from uuid import UUID
 
 import structlog
@@ -9,17 +11,21 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from app.core.config import settings
 from app.core.database import async_session_factory
-from app.core.exceptions import NotFoundException
+from app.core.exceptions import BadRequestException, NotFoundException
 from app.models.agent import Agent
 from app.models.knowledge_base import Document, DocumentStatus, KnowledgeBase
+from app.rag import retriever
 from app.rag.processor import process_document
+from app.rag.retriever import delete_document_chunks, kb_collection_name
 from app.schemas.knowledge_base import (
     DocumentResponse,
     KnowledgeBaseCreate,
     KnowledgeBaseResponse,
 )
-from app.services import provider_key_service, storage_service
+from app.services import provider_key_service, storage_service, voice_bootstrap_service
+from app.tasks import ingestion, maintenance
 
 logger = structlog.get_logger("kb_service")
 
@@ -56,7 +62,9 @@ async def create_knowledge_base(
     """Create a new knowledge base."""
     kb = KnowledgeBase(agent_id=agent_id, **data.model_dump())
     db.add(kb)
-    await db.flush()
+    await db.commit()
+    # Calls to this agent should start using the new collection
+    await voice_bootstrap_service.invalidate_agent(agent_id)
     logger.info("kb_created", kb_id=str(kb.id), agent_id=str(agent_id))
     return KnowledgeBaseResponse.model_validate(kb)
 
@@ -68,22 +76,46 @@ async def upload_document(
     size_bytes: int,
     content: bytes,
     db: AsyncSession,
+    replace: bool = False,
 ) -> DocumentResponse:
-    """Save metadata + S3, return immediately, process in background."""
+    """Save metadata + S3, return immediately, process on the ingestion workers.
+
+    With `replace`, an upload whose filename already exists in the knowledge
+    base replaces that document and only its changed chunks are re-embedded;
+    otherwise it is added as a new document.
+    """
     kb = await _get_kb_or_raise(kb_id, db)
     
-    # Get organization ID for API key lookup
+    # Get organization ID for fair scheduling across tenants
     agent = await db.get(Agent, kb.agent_id)
     org_id_str = str(agent.organization_id) if agent else None
 
-    doc = Document(
-        knowledge_base_id=kb.id,
-        filename=filename,
-        content_type=content_type,
-        size_bytes=size_bytes,
-        status=DocumentStatus.PENDING,
-    )
-    db.add(doc)
+    doc = None
+    if replace:
+        result = await db.execute(
+            select(Document)
+            .where(Document.knowledge_base_id == kb_id, Document.filename == filename)
+            .order_by(Document.created_at.desc())
+        )
+        doc = result.scalars().first()
+    is_new = doc is None
+    previous_size = 0
+    if doc:
+        if doc.status == DocumentStatus.PROCESSING:
+            raise BadRequestException("Document is being processed, upload again once it finishes")
+        previous_size = doc.size_bytes
+        doc.content_type = content_type
+        doc.status = DocumentStatus.PENDING
+        doc.error_message = None
+    else:
+        doc = Document(
+            knowledge_base_id=kb.id,
+            filename=filename,
+            content_type=content_type,
+            size_bytes=size_bytes,
+            status=DocumentStatus.PENDING,
+        )
+        db.add(doc)
     await db.flush()
 
     doc_id_str = str(doc.id)
@@ -106,87 +138,134 @@ async def upload_document(
         return DocumentResponse.model_validate(doc)
 
     # Update KB doc count right away
-    kb.total_documents += 1
-    kb.size_bytes += size_bytes
-    await db.flush()
-
-    response = DocumentResponse.model_validate(doc)
-
-    # Fire background processing (new DB session, new event loop task)
-    asyncio.create_task(
-        _process_document_background(kb_id_str, doc_id_str, filename, content_type, content, org_id_str)
-    )
-
-    return response
-
-
-async def _process_document_background(
-    kb_id: str, doc_id: str, filename: str, content_type: str, content: bytes, org_id: str | None
-) -> None:
-    """Process a document in the background with its own DB session."""
-    try:
+    doc.size_bytes = size_bytes
+    if is_new:
+        kb.total_documents += 1
+    kb.size_bytes += size_bytes - previous_size
+    # Committed before queueing so the worker can see the row
+    await db.commit()
+
+    await ingestion.enqueue_document(doc_id_str, org_id_str)
+    return DocumentResponse.model_validate(doc)
+
+
+async def ingest_document(doc_id: str) -> None:
+    """Process a queued document with its own DB session (runs on a worker)."""
+    async with async_session_factory() as db:
+        doc = await db.get(Document, doc_id)
+        if not doc:
+            logger.error("bg_process_doc_not_found", doc_id=doc_id)
+            return
+        if doc.status == DocumentStatus.COMPLETED:
+            # Duplicate delivery of a finished job
+            logger.info("bg_document_already_processed", doc_id=doc_id)
+            return
+
+        kb_id = str(doc.knowledge_base_id)
+        filename = doc.filename
+        previous_chunks = doc.chunk_count
         # Publish "processing" event
         await _publish_event(kb_id, "doc:processing", {
             "doc_id": doc_id, "filename": filename,
         })
 
-        async with async_session_factory() as db:
-            doc = await db.get(Document, doc_id)
-            if not doc:
-                logger.error("bg_process_doc_not_found", doc_id=doc_id)
-                return
+        doc.status = DocumentStatus.PROCESSING
+        await db.commit()
 
-            doc.status = DocumentStatus.PROCESSING
-            await db.commit()
+        async def publish_progress(chunks_done: int) -> None:
+            await _publish_event(
+                kb_id,
+                "doc:progress",
+                {
+                    "doc_id": doc_id,
+                    "filename": filename,
+                    "chunk_count": chunks_done,
+                },
+            )
+
+        try:
+            kb = await db.get(KnowledgeBase, kb_id)
+            agent = await db.get(Agent, kb.agent_id) if kb else None
 
             # Fetch OpenAI key from organization's provider keys
             openai_key = None
-            if org_id:
-                from uuid import UUID
-                openai_key = await provider_key_service.get_key(UUID(org_id), "openai", db)
-            
+            if agent:
+                openai_key = await provider_key_service.get_key(agent.organization_id, "openai", db)
             if not openai_key:
-                logger.warning("no_openai_key_for_embeddings", org_id=org_id)
-
+                logger.warning("no_openai_key_for_embeddings", doc_id=doc_id)
+
+            if not doc.storage_path:
+                raise ValueError("Document has no storage path")
+
+            collection_name = kb_collection_name(kb_id)
+            if doc.chunk_hashes is None and previous_chunks:
+                # Indexed before chunks were content-addressed: start over
+                await delete_document_chunks(collection_name, doc_id)
+            # Streamed to disk, so the worker never holds the whole file
+            fd, path = tempfile.mkstemp(prefix="voxa-ingest-")
+            os.close(fd)
             try:
-                collection_name = f"kb_{kb_id}"
-                chunk_count = await process_document(
+                try:
+                    await storage_service.download_file(doc.storage_path, path)
+                except Exception as exc:
+                    raise RuntimeError(f"S3 download failed: {exc}") from exc
+                result = await process_document(
                     doc_id=doc_id,
-                    content=content,
-                    content_type=content_type,
+                    path=path,
+                    content_type=doc.content_type,
                     collection_name=collection_name,
                     openai_key=openai_key,
+                    on_progress=publish_progress,
+                    indexed_hashes=doc.chunk_hashes or (),
                 )
+            finally:
+                os.unlink(path)
+            chunk_count = result.chunk_count
 
-                doc.status = DocumentStatus.COMPLETED
-                doc.chunk_count = chunk_count
-                await db.commit()
-
-                # Update KB chunk totals
-                kb = await db.get(KnowledgeBase, kb_id)
-                if kb:
-                    kb.total_chunks += chunk_count
-                    await db.commit()
-
-                logger.info("bg_document_processed", doc_id=doc_id, chunks=chunk_count)
-                await _publish_event(kb_id, "doc:completed", {
-                    "doc_id": doc_id, "filename": filename,
-                    "chunk_count": chunk_count,
-                })
+            doc.status = DocumentStatus.COMPLETED
+            doc.chunk_count = chunk_count
+            doc.chunk_hashes = result.chunk_hashes
+            await db.commit()
 
-            except Exception as exc:
-                logger.error("bg_document_failed", doc_id=doc_id, error=str(exc))
-                doc.status = DocumentStatus.FAILED
-                doc.error_message = str(exc)[:1000]
+            # Update KB chunk totals
+            if kb:
+                kb.total_chunks += chunk_count - previous_chunks
                 await db.commit()
+                # New KB version: calls stop reusing answers cached before it
+                await voice_bootstrap_service.invalidate_agent(kb.agent_id)
+
+            logger.info(
+                "bg_document_processed",
+                doc_id=doc_id,
+                chunks=chunk_count,
+                embedded=result.embedded,
+            )
+            await _publish_event(
+                kb_id,
+                "doc:completed",
+                {
+                    "doc_id": doc_id,
+                    "filename": filename,
+                    "chunk_count": chunk_count,
+                },
+            )
+
+        except Exception as exc:
+            logger.error("bg_document_failed", doc_id=doc_id, error=str(exc))
+            await db.rollback()
+            doc.status = DocumentStatus.FAILED
+            doc.error_message = str(exc)[:1000]
+            await db.commit()
 
-                await _publish_event(kb_id, "doc:failed", {
-                    "doc_id": doc_id, "filename": filename,
+            await _publish_event(
+                kb_id,
+                "doc:failed",
+                {
+                    "doc_id": doc_id,
+                    "filename": filename,
                     "error": str(exc)[:500],
-                })
-
-    except Exception as exc:
-        logger.error("bg_process_fatal", doc_id=doc_id, error=str(exc))
+                },
+            )
 
 
 async def list_documents(kb_id: UUID, db: AsyncSession) -> list[DocumentResponse]:
@@ -217,7 +296,10 @@ async def delete_document(kb_id: UUID, doc_id: UUID, db: AsyncSession) -> None:
     kb.total_chunks = max(0, kb.total_chunks - doc.chunk_count)
     kb.size_bytes = max(0, kb.size_bytes - doc.size_bytes)
     await db.delete(doc)
-    await db.flush()
+    # Points go once the row is gone: if this fails, nothing was deleted
+    await db.commit()
+    await _delete_vectors_soon(str(kb_id), str(doc_id))
+    await voice_bootstrap_service.invalidate_agent(kb.agent_id)
 
     await _publish_event(str(kb_id), "doc:deleted", {"doc_id": str(doc_id)})
     logger.info("document_deleted", doc_id=str(doc_id))
@@ -240,37 +322,145 @@ async def retry_document(kb_id: UUID, doc_id: UUID, db: AsyncSession) -> Documen
         from app.core.exceptions import BadRequestException
         raise BadRequestException("Document has no storage path, cannot retry")
     
-    # Get organization ID for API key lookup
+    # Get organization ID for fair scheduling across tenants
     kb = await _get_kb_or_raise(kb_id, db)
     agent = await db.get(Agent, kb.agent_id)
     org_id_str = str(agent.organization_id) if agent else None
     
-    # Download content from S3
-    try:
-        content = await storage_service.get_file(doc.storage_path)
-    except Exception as exc:
-        doc.status = DocumentStatus.FAILED
-        doc.error_message = f"S3 download failed: {exc}"
-        await db.flush()
-        return DocumentResponse.model_validate(doc)
-    
     # Reset status
     doc.status = DocumentStatus.PENDING
     doc.error_message = None
-    doc.chunk_count = 0
-    await db.flush()
-    
-    response = DocumentResponse.model_validate(doc)
+    await db.commit()
     
-    # Fire background processing
-    asyncio.create_task(
-        _process_document_background(
-            str(kb_id), str(doc_id), doc.filename, doc.content_type, content, org_id_str
-        )
-    )
+    # The worker re-reads the file from S3
+    await ingestion.enqueue_document(str(doc_id), org_id_str)
     
     logger.info("document_retry_started", doc_id=str(doc_id))
-    return response
+    return DocumentResponse.model_validate(doc)
+
+
+# ---------------------------------------------------------------------------
+# Vector garbage collection
+# ---------------------------------------------------------------------------
+
+
+async def delete_knowledge_base_vectors(kb_ids: Iterable[UUID]) -> None:
+    """Delete the vectors of deleted knowledge bases (call after the commit)."""
+    for kb_id in kb_ids:
+        await _delete_vectors_soon(str(kb_id))
+        await _publish_event(str(kb_id), "kb:deleted", {})
+
+
+async def delete_vectors(kb_id: str, doc_id: str | None = None) -> None:
+    """Delete a document's points, or all of a knowledge base's."""
+    location = retriever.locate(kb_collection_name(kb_id))
+    await retriever.purge(location, [doc_id] if doc_id else None)
+    logger.info("vectors_deleted", kb_id=kb_id, doc_id=doc_id)
+
+
+async def _delete_vectors_soon(kb_id: str, doc_id: str | None = None) -> None:
+    """Delete vectors now if possible, else on the worker tier."""
+    if settings.VECTOR_DELETE_INLINE:
+        try:
+            await delete_vectors(kb_id, doc_id)
+            return
+        except Exception as exc:
+            logger.warning("vector_delete_failed", kb_id=kb_id, doc_id=doc_id, error=str(exc))
+    try:
+        await maintenance.enqueue_vector_delete(kb_id, doc_id)
+    except Exception as exc:
+        # Left for reconcile_vectors
+        logger.warning("vector_delete_enqueue_failed", kb_id=kb_id, doc_id=doc_id, error=str(exc))
+
+
+async def reconcile_vectors() -> dict[str, int]:
+    """Delete points and collections of documents and knowledge bases that
+    are no longer in the database, and report what was reclaimed.
+
+    Qdrant is listed before the database is read, so anything indexed in
+    between isn't mistaken for an orphan.
+    """
+    stats = dict.fromkeys(
+        (
+            "collections_dropped",
+            "knowledge_bases_purged",
+            "documents_purged",
+            "points_deleted",
+            "bytes_reclaimed",
+        ),
+        0,
+    )
+    indexed = {
+        kb_id: locations
+        for kb_id, locations in (await retriever.indexed_knowledge_bases()).items()
+        if _is_uuid(kb_id)
+    }
+    async with async_session_factory() as db:
+        live = await _existing_ids(db, KnowledgeBase.id, indexed)
+
+    for kb_id, locations in indexed.items():
+        for location in locations:
+            if kb_id in live:
+                await _reconcile_documents(kb_id, location, stats)
+                continue
+            points = await retriever.count_points(location)
+            point_bytes = await retriever.point_bytes(location)
+            await retriever.purge(location)
+            dropped = "collections_dropped" if location.tenant is None else "knowledge_bases_purged"
+            stats[dropped] += 1
+            stats["points_deleted"] += points
+            stats["bytes_reclaimed"] += points * point_bytes
+            logger.info("orphan_kb_vectors_deleted", kb_id=kb_id, points=points)
+
+    mb_reclaimed = round(stats["bytes_reclaimed"] / 1024 / 1024, 1)
+    logger.info("vector_gc_completed", **stats, mb_reclaimed=mb_reclaimed)
+    return stats
+
+
+async def _reconcile_documents(kb_id: str, location: retriever.Location, stats: dict) -> None:
+    """Delete the points of a live knowledge base's deleted documents, in batches."""
+    documents = await retriever.indexed_documents(location)
+    async with async_session_factory() as db:
+        live = await _existing_ids(
+            db, Document.id, documents, Document.knowledge_base_id == UUID(kb_id)
+        )
+    orphans = [doc_id for doc_id in documents if doc_id not in live]
+    if not orphans:
+        return
+
+    point_bytes = await retriever.point_bytes(location)
+    size = settings.VECTOR_GC_BATCH_SIZE
+    for start in range(0, len(orphans), size):
+        batch = orphans[start : start + size]
+        await retriever.purge(location, batch)
+        points = sum(documents[doc_id] for doc_id in batch)
+        stats["documents_purged"] += len(batch)
+        stats["points_deleted"] += points
+        stats["bytes_reclaimed"] += points * point_bytes
+    await _publish_event(kb_id, "kb:vectors_removed", {"documents": len(orphans)})
+    logger.info("orphan_document_vectors_deleted", kb_id=kb_id, documents=len(orphans))
+
+
+async def _existing_ids(
+    db: AsyncSession, column: object, ids: Iterable[str], *criteria: object
+) -> set[str]:
+    """The ids (as strings) that exist in `column`'s table."""
+    uuids = [UUID(value) for value in ids if _is_uuid(value)]
+    found: set[str] = set()
+    for start in range(0, len(uuids), 1000):
+        result = await db.execute(
+            select(column).where(column.in_(uuids[start : start + 1000]), *criteria)
+        )
+        found.update(str(value) for value in result.scalars())
+    return found
+
+
+def _is_uuid(value: str) -> bool:
+    try:
+        UUID(value)
+    except ValueError:
+        return False
+    return True
 
 
 async def _get_kb_or_raise(kb_id: UUID, db: AsyncSession) -> KnowledgeBase:
@@ -9,6 +9,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.provider_key import ProviderKey
 from app.schemas.provider_key import ProviderKeyResponse
+from app.services import voice_bootstrap_service
 from app.services.crypto_service import decrypt, encrypt
 
 logger = structlog.get_logger("provider_key_service")
@@ -90,6 +91,9 @@ async def save_key(
 
     await db.flush()
     await db.refresh(pk)
+    # Commit before invalidating so a concurrent call can't re-cache the old key
+    await db.commit()
+    await voice_bootstrap_service.invalidate_org(org_id)
     logger.info("provider_key_saved", provider=provider, org_id=str(org_id))
     return ProviderKeyResponse(
         id=pk.id,
@@ -114,7 +118,8 @@ async def delete_key(org_id: UUID, provider: str, db: AsyncSession) -> bool:
     if pk is None:
         return False
     await db.delete(pk)
-    await db.flush()
+    await db.commit()
+    await voice_bootstrap_service.invalidate_org(org_id)
     logger.info("provider_key_deleted", provider=provider, org_id=str(org_id))
     return True
 
@@ -78,3 +78,18 @@ async def get_file(key: str) -> bytes:
         ),
     )
     return response["Body"].read()
+
+
+async def download_file(key: str, path: str) -> None:
+    """Download a file from S3/MinIO to a local path, in parts, without buffering it."""
+    loop = asyncio.get_event_loop()
+    client = _get_client()
+    await loop.run_in_executor(
+        None,
+        partial(
+            client.download_file,
+            Bucket=settings.S3_BUCKET,
+            Key=key,
+            Filename=path,
+        ),
+    )
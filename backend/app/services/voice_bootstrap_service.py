@@ -0,0 +1,181 @@
+"""Voice call bootstrap — agent config, provider keys and KB in one cached lookup."""
+
+import asyncio
+import json
+from dataclasses import dataclass, field
+from uuid import UUID
+
+import structlog
+from sqlalchemy import and_, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import get_redis
+from app.core.config import settings
+from app.core.memory_cache import TTLCache
+from app.models.agent import Agent
+from app.models.knowledge_base import KnowledgeBase
+from app.models.provider_key import ProviderKey
+from app.models.user import User
+from app.rag.retriever import kb_collection_name
+from app.services.crypto_service import decrypt
+from app.voice.clients import get_deepgram_client
+
+logger = structlog.get_logger("voice_bootstrap")
+
+PROVIDERS = ("openai", "deepgram", "google", "anthropic", "groq", "deepseek")
+
+# Workers broadcast invalidations here so every process drops stale entries
+INVALIDATION_CHANNEL = "voice:bootstrap:invalidate"
+
+
+@dataclass(frozen=True, slots=True)
+class AgentBootstrap:
+    """Everything a voice call needs before it can send `ready`."""
+
+    agent_id: UUID
+    org_id: UUID
+    name: str
+    system_prompt: str
+    greeting_message: str
+    llm_provider: str
+    llm_model: str
+    tts_voice: str
+    language: str
+    agent_metadata: dict = field(default_factory=dict)
+    keys: dict[str, str] = field(default_factory=dict)
+    collection_name: str | None = None
+    # Changes whenever the knowledge base content does
+    kb_version: str | None = None
+
+
+# (user_id, agent_id) -> bootstrap; keys are decrypted once per entry
+_cache: TTLCache[tuple[UUID, UUID], AgentBootstrap] = TTLCache(
+    maxsize=settings.VOICE_BOOTSTRAP_CACHE_SIZE, ttl=settings.VOICE_BOOTSTRAP_CACHE_TTL_SECONDS
+)
+
+
+async def get_bootstrap(agent_id: UUID, user_id: UUID, db: AsyncSession) -> AgentBootstrap | None:
+    """Resolve a caller's agent, keys and collection, from cache when possible.
+
+    Returns None if the agent doesn't exist in the user's organization.
+    """
+    key = (user_id, agent_id)
+    bootstrap = _cache.get(key)
+    if bootstrap is not None:
+        return bootstrap
+
+    bootstrap = await _load(agent_id, user_id, db)
+    if bootstrap is None:
+        return None
+    _cache.set(key, bootstrap)
+    # Build the pooled provider client now rather than on the first turn
+    if "deepgram" in bootstrap.keys:
+        get_deepgram_client(bootstrap.keys["deepgram"])
+    return bootstrap
+
+
+async def _load(agent_id: UUID, user_id: UUID, db: AsyncSession) -> AgentBootstrap | None:
+    """Load agent, org membership, KB and active keys in a single query."""
+    kb = (
+        select(KnowledgeBase.id, KnowledgeBase.updated_at)
+        .where(KnowledgeBase.agent_id == Agent.id)
+        .limit(1)
+        .correlate(Agent)
+        .lateral()
+    )
+    result = await db.execute(
+        select(Agent, kb.c.id, kb.c.updated_at, ProviderKey.provider, ProviderKey.encrypted_key)
+        .join(User, User.organization_id == Agent.organization_id)
+        .outerjoin(kb, true())
+        .outerjoin(
+            ProviderKey,
+            and_(
+                ProviderKey.organization_id == Agent.organization_id,
+                ProviderKey.is_active == True,  # noqa: E712
+                ProviderKey.provider.in_(PROVIDERS),
+            ),
+        )
+        .where(Agent.id == agent_id, User.id == user_id)
+    )
+    rows = result.all()
+    if not rows:
+        return None
+
+    agent, kb_id, kb_updated_at, _, _ = rows[0]
+    keys = {provider: decrypt(encrypted) for *_, provider, encrypted in rows if provider}
+    return AgentBootstrap(
+        agent_id=agent.id,
+        org_id=agent.organization_id,
+        name=agent.name,
+        system_prompt=agent.system_prompt,
+        greeting_message=agent.greeting_message,
+        llm_provider=agent.llm_provider or "openai",
+        llm_model=agent.llm_model,
+        tts_voice=agent.tts_voice,
+        language=agent.language,
+        agent_metadata=dict(agent.agent_metadata or {}),
+        keys=keys,
+        collection_name=kb_collection_name(kb_id) if kb_id else None,
+        kb_version=kb_updated_at.isoformat() if kb_updated_at else None,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Invalidation
+# ---------------------------------------------------------------------------
+
+
+def _evict(agent_id: str | None = None, org_id: str | None = None) -> int:
+    """Drop cached entries for an agent or a whole organization."""
+    return _cache.pop_where(
+        lambda _, b: (
+            (agent_id is not None and str(b.agent_id) == agent_id)
+            or (org_id is not None and str(b.org_id) == org_id)
+        )
+    )
+
+
+async def invalidate_agent(agent_id: UUID) -> None:
+    """Forget an agent's bootstrap on every worker (agent or KB changed)."""
+    _evict(agent_id=str(agent_id))
+    await _broadcast({"agent_id": str(agent_id)})
+
+
+async def invalidate_org(org_id: UUID) -> None:
+    """Forget all of an organization's bootstraps (provider keys changed)."""
+    _evict(org_id=str(org_id))
+    await _broadcast({"org_id": str(org_id)})
+
+
+async def _broadcast(message: dict) -> None:
+    """Publish an invalidation to the other workers."""
+    try:
+        client = await get_redis()
+        await client.publish(INVALIDATION_CHANNEL, json.dumps(message))
+    except Exception as exc:
+        # Other workers fall back to the cache TTL
+        logger.warning("bootstrap_invalidation_publish_failed", error=str(exc))
+
+
+async def listen_for_invalidations() -> None:
+    """Apply invalidations published by other workers (runs for the app lifetime)."""
+    while True:
+        try:
+            client = await get_redis()
+            pubsub = client.pubsub()
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            # Anything cached while we weren't listening may be stale
+            _cache.clear()
+            try:
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    data = json.loads(message["data"])
+                    _evict(agent_id=data.get("agent_id"), org_id=data.get("org_id"))
+            finally:
+                await pubsub.aclose()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("bootstrap_invalidation_listener_failed", error=str(exc))
+            await asyncio.sleep(5)
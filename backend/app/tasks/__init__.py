@@ -0,0 +1,23 @@
+"""Celery tasks.
+
+Each worker process keeps one event loop for the async services.
+"""
+
+import asyncio
+from collections.abc import Coroutine
+from typing import Any
+
+_loop: asyncio.AbstractEventLoop | None = None
+
+
+def run_async(coro: Coroutine[Any, Any, Any]) -> Any:
+    """Run a coroutine on this worker process's event loop.
+
+    The loop outlives individual tasks so pooled DB/Redis/Qdrant clients
+    stay bound to it.
+    """
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop.run_until_complete(coro)
@@ -0,0 +1,127 @@
+"""Document ingestion tasks, run on the Celery worker tier.
+
+The queue carries document ids only; the worker reads the file back from
+storage.
+"""
+
+import asyncio
+import random
+import time
+import uuid
+
+import structlog
+
+from app.core.cache import get_redis
+from app.core.config import settings
+from app.tasks import run_async
+from app.worker import celery_app
+
+logger = structlog.get_logger("ingestion")
+
+INGESTION_QUEUE = "ingestion"
+
+
+async def enqueue_document(doc_id: str, org_id: str | None) -> None:
+    """Queue a document for ingestion (call after its row is committed)."""
+    await asyncio.to_thread(
+        ingest_document.apply_async, args=(doc_id, org_id), queue=INGESTION_QUEUE
+    )
+    logger.info("document_enqueued", doc_id=doc_id, org_id=org_id)
+
+
+@celery_app.task(
+    name="ingestion.ingest_document",
+    acks_late=True,
+    reject_on_worker_lost=True,
+    time_limit=settings.INGEST_TASK_TIME_LIMIT_SECONDS,
+)
+def ingest_document(doc_id: str, org_id: str | None) -> None:
+    """Process one document, subject to the per-org limit and a per-document lock."""
+    run_async(_ingest(doc_id, org_id))
+
+
+async def _ingest(doc_id: str, org_id: str | None) -> None:
+    from app.services import knowledge_base_service
+
+    lease = uuid.uuid4().hex
+    if org_id and not await _acquire_org_slot(org_id, lease):
+        # The org already has its share of workers busy; come back later
+        _defer(doc_id, org_id)
+        logger.info("document_deferred", doc_id=doc_id, org_id=org_id)
+        return
+
+    try:
+        if not await _acquire_doc_lock(doc_id, lease):
+            # Redelivered while another worker is still on it; the rerun
+            # skips the document if that worker completes it
+            _defer(doc_id, org_id)
+            logger.info("document_already_running", doc_id=doc_id)
+            return
+        try:
+            await knowledge_base_service.ingest_document(doc_id)
+        finally:
+            await _release(_doc_lock_key(doc_id), lease)
+    finally:
+        if org_id:
+            client = await get_redis()
+            await client.zrem(_org_slots_key(org_id), lease)
+
+
+def _defer(doc_id: str, org_id: str | None) -> None:
+    """Re-queue a job after a jittered delay."""
+    delay = settings.INGEST_FAIRNESS_RETRY_SECONDS * random.uniform(1.0, 2.0)
+    ingest_document.apply_async(args=(doc_id, org_id), queue=INGESTION_QUEUE, countdown=delay)
+
+
+# ---------------------------------------------------------------------------
+# Redis coordination
+# ---------------------------------------------------------------------------
+
+
+def _org_slots_key(org_id: str) -> str:
+    return f"ingest:org:{org_id}:running"
+
+
+def _doc_lock_key(doc_id: str) -> str:
+    return f"ingest:doc:{doc_id}:lock"
+
+
+async def _acquire_org_slot(org_id: str, lease: str) -> bool:
+    """Take one of the org's concurrent ingestion slots.
+
+    Slots are leases scored by start time, so a crashed worker's slot
+    expires with the task time limit instead of leaking.
+    """
+    client = await get_redis()
+    key = _org_slots_key(org_id)
+    now = time.time()
+    async with client.pipeline(transaction=True) as pipe:
+        pipe.zremrangebyscore(key, 0, now - settings.INGEST_TASK_TIME_LIMIT_SECONDS)
+        pipe.zadd(key, {lease: now})
+        pipe.zrank(key, lease)
+        pipe.expire(key, settings.INGEST_TASK_TIME_LIMIT_SECONDS)
+        _, _, rank, _ = await pipe.execute()
+    if rank < settings.INGEST_MAX_RUNNING_PER_ORG:
+        return True
+    await client.zrem(key, lease)
+    return False
+
+
+async def _acquire_doc_lock(doc_id: str, lease: str) -> bool:
+    client = await get_redis()
+    return bool(
+        await client.set(
+            _doc_lock_key(doc_id), lease, nx=True, ex=settings.INGEST_TASK_TIME_LIMIT_SECONDS
+        )
+    )
+
+
+async def _release(key: str, lease: str) -> None:
+    """Delete a lock only if we still hold it."""
+    client = await get_redis()
+    await client.eval(
+        "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end",
+        1,
+        key,
+        lease,
+    )
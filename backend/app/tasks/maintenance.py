@@ -0,0 +1,55 @@
+"""Maintenance tasks: vector deletes and garbage collection."""
+
+import asyncio
+
+import structlog
+
+from app.core.cache import get_redis
+from app.core.config import settings
+from app.tasks import run_async
+from app.worker import celery_app
+
+logger = structlog.get_logger("maintenance")
+
+GC_LOCK_KEY = "vector_gc:lock"
+
+
+async def enqueue_vector_delete(kb_id: str, doc_id: str | None = None) -> None:
+    """Queue deleting a document's vectors, or a whole knowledge base's."""
+    await asyncio.to_thread(delete_vectors.apply_async, args=(kb_id, doc_id))
+    logger.info("vector_delete_enqueued", kb_id=kb_id, doc_id=doc_id)
+
+
+@celery_app.task(
+    name="maintenance.delete_vectors",
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=8,
+)
+def delete_vectors(kb_id: str, doc_id: str | None = None) -> None:
+    """Delete vectors whose document or knowledge base was deleted."""
+    from app.services import knowledge_base_service
+
+    run_async(knowledge_base_service.delete_vectors(kb_id, doc_id))
+
+
+@celery_app.task(
+    name="maintenance.reconcile_vectors",
+    time_limit=int(settings.VECTOR_GC_INTERVAL_SECONDS // 2),
+)
+def reconcile_vectors() -> dict[str, int] | None:
+    """Remove vectors the database no longer knows about (scheduled by beat)."""
+    return run_async(_reconcile())
+
+
+async def _reconcile() -> dict[str, int] | None:
+    from app.services import knowledge_base_service
+
+    client = await get_redis()
+    # Beat may run on several workers: one run per half interval
+    if not await client.set(
+        GC_LOCK_KEY, "1", nx=True, ex=int(settings.VECTOR_GC_INTERVAL_SECONDS // 2)
+    ):
+        logger.info("vector_gc_skipped")
+        return None
+    return await knowledge_base_service.reconcile_vectors()
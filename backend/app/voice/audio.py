@@ -0,0 +1,151 @@
+"""Audio buffer helpers for the voice path — avoid copying PCM and TTS audio."""
+
+import struct
+import time
+from collections.abc import AsyncGenerator, AsyncIterator, Iterator
+
+# Outgoing audio is sent to the client in frames of this size
+AUDIO_FRAME_BYTES = 8192
+# Time from sending a frame to the client starting to play it
+PLAYBACK_LATENCY_SECONDS = 0.15
+
+
+def wav_header(data_len: int, sample_rate: int = 16000, channels: int = 1, bits: int = 16) -> bytes:
+    """Build a minimal WAV header for raw PCM data."""
+    byte_rate = sample_rate * channels * bits // 8
+    block_align = channels * bits // 8
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF",
+        36 + data_len,
+        b"WAVE",
+        b"fmt ",
+        16,
+        1,  # PCM
+        channels,
+        sample_rate,
+        byte_rate,
+        block_align,
+        bits,
+        b"data",
+        data_len,
+    )
+
+
+class PcmBuffer:
+    """Append-only byte buffer that reuses its storage across turns.
+
+    Appends copy into preallocated capacity (doubling when full) instead of
+    reallocating per chunk, `view()` exposes the contents without copying,
+    and `clear()` keeps the capacity for the next turn. Storage is replaced
+    rather than resized when it grows, so outstanding views stay valid.
+    """
+
+    def __init__(self, capacity: int = 64 * 1024) -> None:
+        self._buf = bytearray(capacity)
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def extend(self, data: bytes | memoryview) -> None:
+        """Append bytes to the buffer."""
+        end = self._len + len(data)
+        if end > len(self._buf):
+            grown = bytearray(max(end, 2 * len(self._buf)))
+            grown[: self._len] = memoryview(self._buf)[: self._len]
+            self._buf = grown
+        self._buf[self._len : end] = data
+        self._len = end
+
+    def view(self) -> memoryview:
+        """Zero-copy view of the buffered bytes."""
+        return memoryview(self._buf)[: self._len]
+
+    def consume(self, n: int) -> None:
+        """Drop the first `n` bytes, keeping the (small) remainder."""
+        remaining = self._len - n
+        if remaining > 0:
+            self._buf[:remaining] = memoryview(self._buf)[n : self._len]
+        self._len = max(0, remaining)
+
+    def clear(self) -> None:
+        """Empty the buffer without releasing its capacity."""
+        self._len = 0
+
+
+class PlaybackClock:
+    """Estimates how much of the audio sent to a client has been played.
+
+    Clients play frames back to back as they arrive, so playback runs in
+    real time from the first frame and stalls whenever the audio sent so far
+    runs out. Replies are sent faster than real time, so this is how far the
+    caller actually got, not how far the server did.
+    """
+
+    def __init__(self, bytes_per_second: float, latency: float = PLAYBACK_LATENCY_SECONDS) -> None:
+        self.bytes_per_second = bytes_per_second
+        self.latency = latency
+        self.reset()
+
+    def reset(self) -> None:
+        """Start a new reply."""
+        self.sent_bytes = 0
+        self._ends_at = 0.0
+
+    def sent(self, n_bytes: int, now: float | None = None) -> None:
+        """Record a frame sent to the client."""
+        now = time.monotonic() if now is None else now
+        self._ends_at = max(self._ends_at, now + self.latency) + n_bytes / self.bytes_per_second
+        self.sent_bytes += n_bytes
+
+    def remaining(self, now: float | None = None) -> float:
+        """Seconds until everything sent so far has been played."""
+        now = time.monotonic() if now is None else now
+        return max(0.0, self._ends_at - now)
+
+    def played_bytes(self, now: float | None = None) -> int:
+        """Bytes of the reply played so far."""
+        unplayed = int(self.remaining(now) * self.bytes_per_second)
+        return max(0, self.sent_bytes - unplayed)
+
+
+def iter_frames(data: bytes, frame_size: int = AUDIO_FRAME_BYTES) -> Iterator[memoryview]:
+    """Cut complete audio (e.g. from a cache) into send frames without copying."""
+    view = memoryview(data)
+    for i in range(0, len(view), frame_size):
+        yield view[i : i + frame_size]
+
+
+async def reframe(
+    chunks: AsyncIterator[bytes], frame_size: int = AUDIO_FRAME_BYTES
+) -> AsyncGenerator[memoryview, None]:
+    """Re-cut a stream of arbitrarily sized chunks into fixed-size frames.
+
+    The first chunk is passed on as soon as it arrives, so playback can
+    start; after that, small network reads are joined once into a block,
+    which is sent as memoryview slices. The final partial frame is flushed
+    at the end.
+    """
+    pending: list[bytes] = []
+    pending_len = 0
+    first = True
+    async for chunk in chunks:
+        if first:
+            first = False
+            yield memoryview(chunk)
+            continue
+        pending.append(chunk)
+        pending_len += len(chunk)
+        if pending_len < frame_size:
+            continue
+
+        block = memoryview(pending[0] if len(pending) == 1 else b"".join(pending))
+        whole = len(block) - len(block) % frame_size
+        for i in range(0, whole, frame_size):
+            yield block[i : i + frame_size]
+        pending = [block[whole:].tobytes()] if whole < len(block) else []
+        pending_len = len(block) - whole
+
+    if pending_len:
+        yield memoryview(b"".join(pending))
@@ -0,0 +1,43 @@
+"""Shared async HTTP clients for voice providers."""
+
+import httpx
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger("voice_clients")
+
+DEEPGRAM_API_URL = "https://api.deepgram.com/v1"
+
+# One pooled client per tenant API key, reused across calls on this worker
+_deepgram_clients: dict[str, httpx.AsyncClient] = {}
+
+
+def get_deepgram_client(api_key: str) -> httpx.AsyncClient:
+    """Get or create the pooled Deepgram client for an API key.
+
+    Connections are kept alive between requests, and the pool size bounds
+    how many Deepgram requests this worker runs concurrently per key.
+    """
+    client = _deepgram_clients.get(api_key)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            base_url=DEEPGRAM_API_URL,
+            headers={"Authorization": f"Token {api_key}"},
+            limits=httpx.Limits(
+                max_connections=settings.DEEPGRAM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.DEEPGRAM_MAX_CONNECTIONS,
+                keepalive_expiry=settings.DEEPGRAM_KEEPALIVE_SECONDS,
+            ),
+            timeout=httpx.Timeout(settings.DEEPGRAM_TIMEOUT_SECONDS),
+        )
+        _deepgram_clients[api_key] = client
+        logger.info("deepgram_client_created", pool_size=settings.DEEPGRAM_MAX_CONNECTIONS)
+    return client
+
+
+async def close_clients() -> None:
+    """Close all pooled clients (application shutdown)."""
+    for client in _deepgram_clients.values():
+        await client.aclose()
+    _deepgram_clients.clear()
@@ -1,8 +1,14 @@
 """LLM conversation handler for voice agents — multi-provider via litellm."""
 
+import time
+from collections.abc import AsyncGenerator
+
 import structlog
 import litellm
 
+from app.core.metrics import observe_stage, timed
+from app.voice.memory import ConversationMemory
+
 logger = structlog.get_logger("voice_llm")
 
 # Provider prefix mapping for litellm
@@ -36,34 +42,125 @@ class ConversationHandler:
         self.litellm_model = _litellm_model(provider, model)
         self.system_prompt = system_prompt
         self.api_key = api_key
-        self.messages: list[dict[str, str]] = [{"role": "system", "content": system_prompt}]
-        logger.info("llm_handler_init", provider=provider, model=model, has_api_key=api_key is not None, key_preview=api_key[:10] if api_key else None)
+        self.memory = ConversationMemory(system_prompt, self.litellm_model, api_key)
+        logger.info(
+            "llm_handler_init",
+            provider=provider,
+            model=model,
+            has_api_key=api_key is not None,
+            key_preview=api_key[:10] if api_key else None,
+        )
 
-    async def respond(self, user_input: str) -> str:
-        """Generate a response to user input."""
-        self.messages.append({"role": "user", "content": user_input})
+    @property
+    def messages(self) -> list[dict[str, str]]:
+        """The prompt messages for the current history."""
+        return self.memory.messages()
 
+    def _completion_kwargs(self) -> dict:
+        """Build the litellm completion kwargs for the current history."""
         kwargs: dict = {
             "model": self.litellm_model,
-            "messages": self.messages,
+            "messages": self.memory.messages(),
             "max_tokens": 500,
             "temperature": 0.7,
         }
         if self.api_key:
             kwargs["api_key"] = self.api_key
+        return kwargs
 
-        logger.info("llm_calling", model=kwargs["model"], has_api_key="api_key" in kwargs, key_in_kwargs=kwargs.get("api_key", "")[:15] if kwargs.get("api_key") else None)
-        response = await litellm.acompletion(**kwargs)
+    async def respond(self, user_input: str) -> str:
+        """Generate a response to user input."""
+        self.memory.add("user", user_input)
+
+        kwargs = self._completion_kwargs()
+        logger.info(
+            "llm_calling",
+            prompt_tokens=self.memory.prompt_tokens,
+            model=kwargs["model"],
+            has_api_key="api_key" in kwargs,
+            key_in_kwargs=kwargs.get("api_key", "")[:15] if kwargs.get("api_key") else None,
+        )
+        with timed("llm_total", self.provider, self.model):
+            response = await litellm.acompletion(**kwargs)
         assistant_msg = response.choices[0].message.content or ""
-        self.messages.append({"role": "assistant", "content": assistant_msg})
+        self.memory.add("assistant", assistant_msg)
         logger.info("llm_response", model=self.litellm_model, input_len=len(user_input))
         return assistant_msg
 
+    async def respond_stream(self, user_input: str) -> AsyncGenerator[str, None]:
+        """Stream a response to user input as it is generated.
+
+        The assistant message is recorded in the history once the stream ends,
+        including when the consumer stops iterating early.
+        """
+        self.memory.add("user", user_input)
+
+        kwargs = self._completion_kwargs()
+        kwargs["stream"] = True
+        logger.info(
+            "llm_streaming",
+            model=kwargs["model"],
+            has_api_key="api_key" in kwargs,
+            prompt_tokens=self.memory.prompt_tokens,
+        )
+        start = time.perf_counter()
+        response = await litellm.acompletion(**kwargs)
+
+        parts: list[str] = []
+        try:
+            async for chunk in response:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if not parts:
+                        observe_stage(
+                            "llm_first_token",
+                            time.perf_counter() - start,
+                            self.provider,
+                            self.model,
+                        )
+                    parts.append(delta)
+                    yield delta
+        finally:
+            observe_stage("llm_total", time.perf_counter() - start, self.provider, self.model)
+            self.memory.add("assistant", "".join(parts))
+            # Release the provider connection if the stream was abandoned mid-way
+            aclose = getattr(response, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            logger.info("llm_stream_complete", model=self.litellm_model, input_len=len(user_input))
+
     async def respond_with_context(self, user_input: str, context: str) -> str:
-        """Generate a response with RAG context injected."""
-        augmented = f"Context:\n{context}\n\nUser: {user_input}"
-        return await self.respond(augmented)
+        """Generate a response with RAG context injected.
+
+        Only the latest context is kept in the prompt; it replaces the last one.
+        """
+        self.memory.set_context(context)
+        return await self.respond(user_input)
+
+    def respond_with_context_stream(
+        self, user_input: str, context: str
+    ) -> AsyncGenerator[str, None]:
+        """Stream a response with RAG context injected."""
+        self.memory.set_context(context)
+        return self.respond_stream(user_input)
+
+    def record_exchange(self, user_input: str, reply: str) -> None:
+        """Add a turn answered without the LLM (e.g. from the response cache)."""
+        self.memory.add("user", user_input)
+        self.memory.add("assistant", reply)
+
+    def record_reply(self, reply: str) -> None:
+        """Add an assistant message spoken without the LLM (e.g. the greeting)."""
+        self.memory.add("assistant", reply)
+
+    def truncate_last_reply(self, spoken_text: str) -> None:
+        """Cut the last assistant message down to what the caller actually heard."""
+        if not self.memory.truncate_last_reply(spoken_text):
+            return
+        logger.info("llm_reply_truncated", spoken_len=len(spoken_text))
 
     def reset(self) -> None:
         """Reset conversation history."""
-        self.messages = [{"role": "system", "content": self.system_prompt}]
+        self.memory.reset()
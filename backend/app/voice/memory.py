@@ -0,0 +1,198 @@
+"""Token-budgeted conversation history for voice agents."""
+
+import asyncio
+
+import litellm
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger("voice_memory")
+
+# Rough per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a phone conversation between a caller and a "
+    "voice agent. Merge the new exchanges into the existing summary. Keep names, "
+    "numbers, decisions, open questions and anything the caller asked to be "
+    "remembered. Reply with the updated summary only, in a few short sentences."
+)
+
+
+class ConversationMemory:
+    """Conversation history kept within a prompt token budget.
+
+    Each message is counted once, when it is added. Only the latest
+    retrieval context is kept, as a system message just before the newest
+    user turn. When the turns outgrow the budget, the oldest are folded into
+    a rolling summary by a background LLM call; they stay in the prompt
+    until the summary lands, so nothing drops out mid-compaction.
+    """
+
+    def __init__(
+        self,
+        system_prompt: str,
+        model: str,
+        api_key: str | None = None,
+        token_budget: int = settings.LLM_HISTORY_TOKEN_BUDGET,
+        keep_turns: int = settings.LLM_HISTORY_KEEP_TURNS,
+    ) -> None:
+        self.system_prompt = system_prompt
+        self.model = model
+        self.api_key = api_key
+        self.token_budget = token_budget
+        self.keep_messages = max(2, keep_turns * 2)
+        self._system_tokens = self._count(system_prompt)
+        self._compaction: asyncio.Task | None = None
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget the conversation (the system prompt is kept)."""
+        if self._compaction is not None:
+            self._compaction.cancel()
+            self._compaction = None
+        self.summary = ""
+        self.context: str | None = None
+        self._summary_tokens = 0
+        self._context_tokens = 0
+        self._turns: list[tuple[dict[str, str], int]] = []
+        self._turn_tokens = 0
+        self._compacting: list[tuple[dict[str, str], int]] = []
+        self._compacting_tokens = 0
+
+    @property
+    def prompt_tokens(self) -> int:
+        """Approximate token count of the prompt `messages()` would build."""
+        return (
+            self._system_tokens
+            + self._summary_tokens
+            + self._context_tokens
+            + self._compacting_tokens
+            + self._turn_tokens
+        )
+
+    def messages(self) -> list[dict[str, str]]:
+        """Build the prompt: system prompt, summary, recent turns, latest context."""
+        messages = [{"role": "system", "content": self.system_prompt}]
+        if self.summary:
+            messages.append(
+                {
+                    "role": "system",
+                    "content": f"Summary of the conversation so far:\n{self.summary}",
+                }
+            )
+        turns = [m for m, _ in self._compacting] + [m for m, _ in self._turns]
+        if self.context:
+            # Just ahead of the newest user message, so it reads as context for it
+            at = next(
+                (i for i in range(len(turns) - 1, -1, -1) if turns[i]["role"] == "user"),
+                len(turns),
+            )
+            turns.insert(at, {"role": "system", "content": f"Context:\n{self.context}"})
+        return messages + turns
+
+    def set_context(self, context: str | None) -> None:
+        """Replace the retrieval context; previous contexts are not kept."""
+        self.context = context or None
+        self._context_tokens = self._count(f"Context:\n{context}") if context else 0
+
+    def add(self, role: str, content: str) -> None:
+        """Append a message and compact the history if it is over budget."""
+        tokens = self._count(content)
+        self._turns.append(({"role": role, "content": content}, tokens))
+        self._turn_tokens += tokens
+        self._maybe_compact()
+
+    def truncate_last_reply(self, spoken_text: str) -> bool:
+        """Cut the last assistant message down to what was spoken.
+
+        Returns False if the history doesn't end with an assistant message.
+        """
+        if not self._turns or self._turns[-1][0]["role"] != "assistant":
+            return False
+        _, tokens = self._turns.pop()
+        self._turn_tokens -= tokens
+        if spoken_text:
+            self.add("assistant", spoken_text)
+        return True
+
+    def _count(self, text: str) -> int:
+        """Count tokens for one message."""
+        try:
+            tokens = litellm.token_counter(model=self.model, text=text)
+        except Exception:
+            tokens = len(text) // 4 + 1
+        return tokens + MESSAGE_OVERHEAD_TOKENS
+
+    def _maybe_compact(self) -> None:
+        """Start summarising the oldest turns once the history exceeds the budget."""
+        if self._compaction is not None and not self._compaction.done():
+            return
+        if self.prompt_tokens - self._compacting_tokens <= self.token_budget:
+            return
+
+        # Fold old turns until the rest fits in half the budget, keeping the
+        # most recent exchanges verbatim and starting the remainder on a user turn.
+        target = self.token_budget // 2
+        remaining = self.prompt_tokens
+        split = 0
+        limit = len(self._turns) - self.keep_messages
+        while split < limit and remaining > target:
+            remaining -= self._turns[split][1]
+            split += 1
+        while split < limit and self._turns[split][0]["role"] != "user":
+            split += 1
+        if split == 0:
+            return
+
+        self._compacting, self._turns = self._turns[:split], self._turns[split:]
+        self._compacting_tokens = sum(tokens for _, tokens in self._compacting)
+        self._turn_tokens -= self._compacting_tokens
+        try:
+            self._compaction = asyncio.get_running_loop().create_task(self._compact())
+        except RuntimeError:
+            # No event loop (sync caller) — drop the old turns instead
+            self._finish_compaction()
+
+    async def _compact(self) -> None:
+        """Merge the compacting turns into the rolling summary."""
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m, _ in self._compacting)
+        kwargs: dict = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {
+                    "role": "user",
+                    "content": f"Summary so far:\n{self.summary or '(none)'}\n\n"
+                    f"New exchanges:\n{transcript}",
+                },
+            ],
+            "max_tokens": settings.LLM_SUMMARY_MAX_TOKENS,
+            "temperature": 0,
+        }
+        if self.api_key:
+            kwargs["api_key"] = self.api_key
+
+        try:
+            response = await litellm.acompletion(**kwargs)
+            summary = (response.choices[0].message.content or "").strip()
+            if summary:
+                self.summary = summary
+                self._summary_tokens = self._count(summary)
+            logger.info(
+                "history_compacted",
+                messages=len(self._compacting),
+                summary_tokens=self._summary_tokens,
+            )
+        except Exception as exc:
+            # Keep the prompt bounded even if the summary couldn't be updated
+            logger.warning("history_compaction_failed", error=str(exc))
+        self._finish_compaction()
+        self._compaction = None
+        self._maybe_compact()
+
+    def _finish_compaction(self) -> None:
+        """Drop the turns that have been folded into the summary."""
+        self._compacting = []
+        self._compacting_tokens = 0
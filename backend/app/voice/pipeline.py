@@ -1,15 +1,61 @@
 """Voice pipeline orchestrator — coordinates STT, LLM, TTS."""
 
+import asyncio
+import re
+from collections.abc import AsyncGenerator, AsyncIterator
+from contextlib import aclosing
+from difflib import SequenceMatcher
+
 import structlog
 
-from app.rag import embeddings
-from app.rag.retriever import search
+from app.core.config import settings
+from app.core.metrics import timed
+from app.rag.embeddings import EMBEDDING_MODEL, generate_embedding
+from app.rag.hot_index import search_vector
+from app.voice.audio import PlaybackClock, iter_frames, reframe
 from app.voice.llm import ConversationHandler
+from app.voice.response_cache import CachedReply, get_response_cache
 from app.voice.stt import STTService
-from app.voice.tts import TTSService
+from app.voice.tts import AUDIO_BYTES_PER_SECOND, TTSService
 
 logger = structlog.get_logger("voice_pipeline")
 
+# Sentence end: terminal punctuation (plus closing quotes/brackets) followed by
+# whitespace, or a line break. Fragments shorter than MIN_SENTENCE_CHARS are
+# merged with the next sentence so TTS isn't called for "Hi." on its own.
+_SENTENCE_BOUNDARY = re.compile(r"[.!?]+[\"')\]]*\s+|\n+")
+MIN_SENTENCE_CHARS = 20
+
+_WORD = re.compile(r"\w+")
+
+
+def _words(text: str) -> list[str]:
+    """Lower-cased words of a transcript, ignoring punctuation."""
+    return _WORD.findall(text.lower())
+
+
+def transcript_similarity(a: str, b: str) -> float:
+    """Word-level similarity (0..1) between two transcripts of the same turn."""
+    return SequenceMatcher(None, _words(a), _words(b), autojunk=False).ratio()
+
+
+async def split_sentences(tokens: AsyncIterator[str]) -> AsyncGenerator[str, None]:
+    """Group streamed LLM tokens into complete sentences for TTS."""
+    buffer = ""
+    async for token in tokens:
+        buffer += token
+        start = 0
+        for match in _SENTENCE_BOUNDARY.finditer(buffer):
+            if match.end() - start < MIN_SENTENCE_CHARS:
+                continue
+            sentence = buffer[start : match.end()].strip()
+            if sentence:
+                yield sentence
+            start = match.end()
+        buffer = buffer[start:]
+    if buffer.strip():
+        yield buffer.strip()
+
 
 class VoicePipeline:
     """Orchestrates the full voice conversation pipeline."""
@@ -23,6 +69,7 @@ class VoicePipeline:
         collection_name: str | None = None,
         provider: str = "openai",
         api_keys: dict[str, str] | None = None,
+        response_cache_namespace: str | None = None,
     ) -> None:
         keys = api_keys or {}
         self.stt = STTService(api_key=keys.get("deepgram"))
@@ -36,10 +83,19 @@ class VoicePipeline:
         self.language = language
         self.collection_name = collection_name
         self.openai_key = keys.get("openai")
-        
-        # Set OpenAI key for RAG embeddings
-        if self.openai_key:
-            embeddings.set_api_key(self.openai_key)
+        # Sentences of the current/last reply whose audio was fully streamed
+        # (after an interruption: fully played)
+        self.last_spoken = ""
+        # Those sentences with the reply's audio bytes up to the end of each
+        self._reply_marks: list[tuple[str, int]] = []
+        self.playback = PlaybackClock(AUDIO_BYTES_PER_SECOND)
+        # Whether the history holds the current reply, so an interruption cuts it
+        self._reply_in_history = False
+        # Retrieval started from an interim transcript: (query, task)
+        self._speculation: tuple[str, asyncio.Task[tuple[list[float], str]]] | None = None
+        # Opt-in per agent: replies to near-identical questions are replayed
+        self.response_cache_namespace = response_cache_namespace
+        self.response_cache = get_response_cache() if response_cache_namespace else None
 
     async def process_audio(self, audio_data: bytes) -> tuple[str, str, bytes]:
         """Process audio input → text → LLM → audio output.
@@ -71,12 +127,288 @@ class VoicePipeline:
         audio_response = await self.tts.synthesize(response_text)
         return response_text, audio_response
 
+    async def stream_audio(
+        self, audio_data: bytes
+    ) -> AsyncGenerator[dict | bytes | memoryview, None]:
+        """Streaming variant of `process_audio`.
+
+        Yields the user transcript event, then audio chunks as each sentence is
+        synthesized, then the assistant transcript event.
+        """
+        user_text = await self.stt.transcribe(audio_data, self.language)
+        async with aclosing(self.stream_user_turn(user_text)) as turn:
+            async for item in turn:
+                yield item
+
+    def stream_greeting(self, text: str) -> AsyncGenerator[dict | bytes | memoryview, None]:
+        """Speak the agent's greeting at the start of a call.
+
+        Greetings are pre-rendered when the agent is saved, so this is
+        normally a cache read. Recorded as the first assistant turn.
+        """
+        return self._spoken(self._greet(text))
+
+    async def _greet(self, text: str) -> AsyncGenerator[dict | bytes | memoryview, None]:
+        if not text.strip():
+            return
+        audio = await self.tts.synthesize(text, persistent=True)
+        for frame in iter_frames(audio):
+            yield frame
+        self._mark_spoken(text, len(audio))
+        self.llm.record_reply(text)
+        self._reply_in_history = True
+        logger.info("agent_said", text=text[:100], greeting=True)
+        yield {"type": "transcript", "role": "assistant", "text": text}
+
+    async def stream_user_turn(
+        self, user_text: str
+    ) -> AsyncGenerator[dict | bytes | memoryview, None]:
+        """Stream the response to an already-transcribed user turn.
+
+        Used with live transcription, where the transcript is complete by the
+        time the turn ends. Yields nothing for an empty transcript.
+        """
+        logger.info("user_said", text=user_text[:100])
+        if not user_text.strip():
+            self.cancel_speculation()
+            return
+
+        yield {"type": "transcript", "role": "user", "text": user_text}
+        async with aclosing(self.stream_text(user_text)) as reply:
+            async for item in reply:
+                yield item
+
+    def stream_text(self, user_text: str) -> AsyncGenerator[dict | bytes | memoryview, None]:
+        """Streaming variant of `process_text`.
+
+        LLM tokens are split into sentences by a producer task while this
+        generator synthesizes them in order, so the first audio chunk is
+        yielded as soon as the first sentence is complete rather than after
+        the whole reply. Ends with the assistant transcript event, once the
+        reply has been played.
+        """
+        return self._spoken(self._reply(user_text))
+
+    async def _reply(self, user_text: str) -> AsyncGenerator[dict | bytes | memoryview, None]:
+        embedding, context = None, ""
+        if self._needs_retrieval(user_text):
+            embedding, context = await self._retrieve(user_text)
+        else:
+            self.cancel_speculation()
+
+        cacheable = embedding is not None and self._cacheable(user_text)
+        if cacheable:
+            cached = self.response_cache.lookup(self.response_cache_namespace, embedding)
+            if cached is not None:
+                async with aclosing(self._replay(user_text, cached)) as replay:
+                    async for item in replay:
+                        yield item
+                return
+
+        sentences: asyncio.Queue[str | None] = asyncio.Queue()
+
+        async def produce() -> None:
+            try:
+                async for sentence in split_sentences(self._reply_tokens(user_text, context)):
+                    sentences.put_nowait(sentence)
+            finally:
+                sentences.put_nowait(None)
+
+        producer = asyncio.create_task(produce())
+        audio: list[bytes] = []
+        sent = 0
+        try:
+            while (sentence := await sentences.get()) is not None:
+                async for frame in reframe(self.tts.synthesize_stream(sentence)):
+                    if cacheable:
+                        audio.append(bytes(frame))
+                    sent += len(frame)
+                    yield frame
+                self._mark_spoken(sentence, sent)
+            # Surface LLM/retrieval errors raised inside the producer
+            await producer
+        finally:
+            if not producer.done():
+                # Interrupted: stop the LLM request and wait for it to settle
+                # so the history holds the reply before it is cut.
+                producer.cancel()
+                await asyncio.wait([producer])
+
+        if cacheable and self.last_spoken:
+            self.response_cache.store(
+                self.response_cache_namespace,
+                embedding,
+                CachedReply(text=self.last_spoken, audio=b"".join(audio)),
+            )
+        logger.info("agent_said", text=self.last_spoken[:100], sentences=len(self._reply_marks))
+        yield {"type": "transcript", "role": "assistant", "text": self.last_spoken}
+
+    async def _replay(
+        self, user_text: str, cached: CachedReply
+    ) -> AsyncGenerator[dict | bytes | memoryview, None]:
+        """Speak a cached reply without calling the LLM or TTS."""
+        self.llm.record_exchange(user_text, cached.text)
+        self._reply_in_history = True
+        for frame in iter_frames(cached.audio):
+            yield frame
+        self._mark_spoken(cached.text, len(cached.audio))
+        logger.info("agent_said", text=cached.text[:100], cached=True)
+        yield {"type": "transcript", "role": "assistant", "text": cached.text}
+
+    async def _reply_tokens(self, user_text: str, context: str) -> AsyncGenerator[str, None]:
+        """Stream LLM tokens for a user turn, with RAG context if configured."""
+        if self.collection_name:
+            stream = self.llm.respond_with_context_stream(user_text, context)
+        else:
+            stream = self.llm.respond_stream(user_text)
+        # From here on the history holds this turn, so an interruption truncates it
+        self._reply_in_history = True
+        async for token in stream:
+            yield token
+
+    async def _spoken(
+        self, reply: AsyncGenerator[dict | bytes | memoryview, None]
+    ) -> AsyncGenerator[dict | bytes | memoryview, None]:
+        """Track a reply's playback and cut it short if it's closed early.
+
+        Audio is sent faster than real time, so the assistant transcript is
+        held back until the client has played the reply. If the reply is
+        closed before then (the caller barged in), the history keeps only
+        the sentences played in full, and `last_spoken` is set to them.
+        """
+        self._start_reply()
+        finished = False
+        try:
+            async for item in reply:
+                if not isinstance(item, dict):
+                    self.playback.sent(len(item))
+                elif item["type"] == "transcript" and item["role"] == "assistant":
+                    await asyncio.sleep(self.playback.remaining())
+                yield item
+            finished = True
+        finally:
+            # Settle the reply first (stops the LLM stream, records its history)
+            await reply.aclose()
+            if not finished:
+                self._cut_to_played()
+
+    def _start_reply(self) -> None:
+        self.playback.reset()
+        self.last_spoken = ""
+        self._reply_marks = []
+        self._reply_in_history = False
+
+    def _mark_spoken(self, sentence: str, audio_bytes: int) -> None:
+        """Record a sentence whose audio has been streamed up to `audio_bytes`."""
+        self._reply_marks.append((sentence, audio_bytes))
+        self.last_spoken = " ".join(s for s, _ in self._reply_marks)
+
+    def _cut_to_played(self) -> None:
+        """Cut the current reply down to the sentences the client played in full."""
+        played = self.playback.played_bytes()
+        self.last_spoken = " ".join(s for s, end in self._reply_marks if end <= played)
+        # A turn interrupted before the LLM started has no reply to cut
+        if self._reply_in_history:
+            self.llm.truncate_last_reply(self.last_spoken)
+            self._reply_in_history = False
+
+    def speculate(self, partial_text: str) -> None:
+        """Start retrieval for the turn from an interim transcript.
+
+        Called while the caller is still speaking. Retrieval is restarted
+        whenever the transcript drifts from the one being searched, so by the
+        end of the turn the context for (nearly) the final wording is ready.
+        """
+        if not self._needs_retrieval(partial_text) or not settings.RAG_SPECULATION_ENABLED:
+            return
+        if len(_words(partial_text)) < settings.RAG_SPECULATION_MIN_WORDS:
+            return
+        if self._speculation is not None:
+            query, task = self._speculation
+            if transcript_similarity(query, partial_text) >= settings.RAG_SPECULATION_SIMILARITY:
+                return
+            task.cancel()
+        task = asyncio.create_task(self._embed_and_search(partial_text))
+        # A discarded speculation's error is never awaited; don't warn about it
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._speculation = (partial_text, task)
+
+    def cancel_speculation(self) -> None:
+        """Drop any in-flight speculative retrieval."""
+        if self._speculation is not None:
+            self._speculation[1].cancel()
+            self._speculation = None
+
+    def _cacheable(self, user_text: str) -> bool:
+        """Whether a reply to this turn may be served from or stored in the cache."""
+        return (
+            self.response_cache is not None
+            and len(_words(user_text)) >= settings.RESPONSE_CACHE_MIN_WORDS
+        )
+
+    def _needs_retrieval(self, user_text: str) -> bool:
+        """Whether the turn's query must be embedded, for the KB or the cache."""
+        return bool(self.collection_name) or self._cacheable(user_text)
+
+    async def _retrieve_context(self, user_text: str) -> str:
+        """Fetch the RAG context block for a user query."""
+        _, context = await self._retrieve(user_text)
+        return context
+
+    async def _retrieve(self, user_text: str) -> tuple[list[float] | None, str]:
+        """Embed the query and fetch its RAG context.
+
+        Reuses the speculative result when the final transcript is close
+        enough to the interim one it was started from. The time spent
+        waiting here is recorded as the turn's `retrieval` stage. Without a
+        knowledge base the embedding only serves the response cache, so a
+        failure there is logged rather than failing the turn.
+        """
+        try:
+            with timed("retrieval"):
+                return await self._await_retrieval(user_text)
+        except Exception as exc:
+            if self.collection_name:
+                raise
+            logger.warning("query_embedding_failed", error=str(exc))
+            return None, ""
+
+    async def _await_retrieval(self, user_text: str) -> tuple[list[float], str]:
+        """Speculative-or-fresh retrieval behind `_retrieve`."""
+        speculation, self._speculation = self._speculation, None
+        if speculation is not None:
+            query, task = speculation
+            similarity = transcript_similarity(query, user_text)
+            if similarity >= settings.RAG_SPECULATION_SIMILARITY:
+                try:
+                    result = await task
+                    logger.info("rag_speculation_hit", similarity=round(similarity, 2))
+                    return result
+                except asyncio.CancelledError:
+                    if asyncio.current_task().cancelling():
+                        raise
+                except Exception as exc:
+                    logger.warning("rag_speculation_failed", error=str(exc))
+            else:
+                task.cancel()
+                logger.info("rag_speculation_miss", similarity=round(similarity, 2))
+        return await self._embed_and_search(user_text)
+
+    async def _embed_and_search(self, query: str) -> tuple[list[float], str]:
+        """Embed a query and, with a knowledge base, join its top results."""
+        with timed("embedding", "openai", EMBEDDING_MODEL):
+            embedding = await generate_embedding(query, self.openai_key)
+        if not self.collection_name:
+            return embedding, ""
+        results = await search_vector(self.collection_name, embedding, top_k=3, query_text=query)
+        return embedding, "\n\n".join(r["content"] for r in results)
+
     async def _respond_with_rag(self, user_text: str) -> str:
         """Get LLM response with RAG context."""
-        results = await search(self.collection_name, user_text, top_k=3)
-        context = "\n\n".join(r["content"] for r in results)
+        context = await self._retrieve_context(user_text)
         return await self.llm.respond_with_context(user_text, context)
 
     def reset(self) -> None:
         """Reset conversation state."""
+        self.cancel_speculation()
         self.llm.reset()
@@ -0,0 +1,151 @@
+"""Semantic cache of spoken replies, keyed by query embedding."""
+
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+import structlog
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = structlog.get_logger("response_cache")
+
+CACHE_REQUESTS = metrics.counter(
+    "voxa_response_cache_requests",
+    "Semantic response cache lookups",
+    ("result",),
+)
+CACHE_BYTES = metrics.gauge("voxa_response_cache_bytes", "Audio bytes held in the response cache")
+
+
+def cache_namespace(
+    agent_id: str, system_prompt: str, kb_version: str | None, voice: str, language: str
+) -> str:
+    """Namespace for an agent's cached replies.
+
+    Changing the prompt, knowledge base, voice or language starts a fresh
+    namespace, so stale answers are never served; old entries age out.
+    """
+    raw = "\x1f".join([agent_id, system_prompt, kb_version or "", voice, language])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+@dataclass(slots=True)
+class CachedReply:
+    """A complete reply: its text and the synthesized audio."""
+
+    text: str
+    audio: bytes
+
+
+@dataclass(slots=True)
+class _Entry:
+    namespace: str
+    vector: np.ndarray
+    reply: CachedReply
+    expires: float
+
+
+class SemanticResponseCache:
+    """Per-worker LRU/TTL cache of replies, matched by cosine similarity.
+
+    Entries are grouped by namespace; a lookup compares the query embedding
+    against every live entry in its namespace with one matrix product.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = settings.RESPONSE_CACHE_MAX_BYTES,
+        ttl: float = settings.RESPONSE_CACHE_TTL_SECONDS,
+        threshold: float = settings.RESPONSE_CACHE_SIMILARITY,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()
+        self._by_namespace: dict[str, list[int]] = {}
+        self._matrices: dict[str, np.ndarray] = {}
+        self._bytes = 0
+        self._next_id = 0
+
+    def lookup(self, namespace: str, embedding: list[float]) -> CachedReply | None:
+        """Return the closest cached reply above the similarity threshold."""
+        ids = self._by_namespace.get(namespace)
+        if not ids:
+            CACHE_REQUESTS.inc(result="miss")
+            return None
+
+        matrix = self._matrices.get(namespace)
+        if matrix is None:
+            matrix = self._matrices[namespace] = np.stack([self._entries[i].vector for i in ids])
+        scores = matrix @ _normalize(embedding)
+        best = int(np.argmax(scores))
+        entry_id = ids[best]
+        entry = self._entries[entry_id]
+
+        if entry.expires < time.monotonic():
+            self._remove(entry_id)
+            CACHE_REQUESTS.inc(result="miss")
+            return None
+        if scores[best] < self.threshold:
+            CACHE_REQUESTS.inc(result="miss")
+            return None
+
+        self._entries.move_to_end(entry_id)
+        CACHE_REQUESTS.inc(result="hit")
+        logger.info("response_cache_hit", similarity=round(float(scores[best]), 3))
+        return entry.reply
+
+    def store(self, namespace: str, embedding: list[float], reply: CachedReply) -> None:
+        """Cache a reply, evicting least recently used entries to fit."""
+        if not reply.audio or len(reply.audio) > self.max_bytes:
+            return
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = _Entry(
+            namespace, _normalize(embedding), reply, time.monotonic() + self.ttl
+        )
+        self._by_namespace.setdefault(namespace, []).append(entry_id)
+        self._matrices.pop(namespace, None)
+        self._bytes += len(reply.audio)
+        while self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+        CACHE_BYTES.set(self._bytes)
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        self._entries.clear()
+        self._by_namespace.clear()
+        self._matrices.clear()
+        self._bytes = 0
+        CACHE_BYTES.set(0)
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        self._bytes -= len(entry.reply.audio)
+        ids = self._by_namespace[entry.namespace]
+        ids.remove(entry_id)
+        if not ids:
+            del self._by_namespace[entry.namespace]
+        self._matrices.pop(entry.namespace, None)
+
+
+def _normalize(embedding: list[float]) -> np.ndarray:
+    """Unit-length float32 vector, so a dot product is cosine similarity."""
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+_cache: SemanticResponseCache | None = None
+
+
+def get_response_cache() -> SemanticResponseCache:
+    """Get or create the worker's response cache."""
+    global _cache
+    if _cache is None:
+        _cache = SemanticResponseCache()
+    return _cache
@@ -1,13 +1,30 @@
 """Speech-to-Text service using Deepgram."""
 
-from typing import AsyncGenerator
+import asyncio
+import json
+import time
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from urllib.parse import urlencode
 
 import structlog
+from websockets.asyncio.client import ClientConnection, connect
+from websockets.exceptions import ConnectionClosed
 
 from app.core.config import settings
+from app.core.exceptions import VoiceServiceException
+from app.core.metrics import timed
+from app.voice.audio import PcmBuffer, wav_header
+from app.voice.clients import get_deepgram_client
 
 logger = structlog.get_logger("stt")
 
+DEEPGRAM_LISTEN_URL = "wss://api.deepgram.com/v1/listen"
+
+# Deepgram closes idle live connections after ~10s without audio
+KEEPALIVE_INTERVAL_SECONDS = 5.0
+
+TranscriptCallback = Callable[[str, bool], Awaitable[None]]
+
 
 class STTService:
     """Deepgram Speech-to-Text service."""
@@ -16,34 +33,242 @@ class STTService:
         self.api_key = api_key or settings.DEEPGRAM_API_KEY
 
     async def transcribe(self, audio_data: bytes, language: str = "en") -> str:
-        """Transcribe audio bytes to text."""
-        from deepgram import DeepgramClient
-
-        client = DeepgramClient(api_key=self.api_key)
-        # SDK v5+ uses direct parameters instead of PrerecordedOptions
-        response = client.listen.v1.media.transcribe_file(
-            request=audio_data,
-            model="nova-2",
-            language=language,
-            smart_format=True,
+        """Transcribe a complete audio file (e.g. WAV) to text."""
+        return await self._transcribe(audio_data, language, {"Content-Type": "audio/wav"})
+
+    async def transcribe_pcm(
+        self, pcm: memoryview, language: str = "en", sample_rate: int = 16000
+    ) -> str:
+        """Transcribe raw 16-bit mono PCM.
+
+        The WAV header is streamed ahead of the PCM view instead of being
+        concatenated onto a copy of it.
+        """
+        header = wav_header(len(pcm), sample_rate)
+
+        async def body() -> AsyncGenerator[bytes | memoryview, None]:
+            yield header
+            yield pcm
+
+        return await self._transcribe(
+            body(),
+            language,
+            {"Content-Type": "audio/wav", "Content-Length": str(len(header) + len(pcm))},
         )
-        transcript = response.results.channels[0].alternatives[0].transcript
+
+    async def _transcribe(self, content, language: str, headers: dict[str, str]) -> str:
+        """POST audio to Deepgram's prerecorded endpoint."""
+        client = get_deepgram_client(self.api_key)
+        with timed("stt", "deepgram", "nova-2"):
+            response = await client.post(
+                "/listen",
+                params={"model": "nova-2", "language": language, "smart_format": "true"},
+                content=content,
+                headers=headers,
+            )
+        if response.status_code != 200:
+            raise VoiceServiceException(
+                f"Deepgram STT returned {response.status_code}: {response.text[:200]}"
+            )
+        transcript = response.json()["results"]["channels"][0]["alternatives"][0]["transcript"]
         logger.info("transcription_complete", length=len(transcript))
         return transcript
 
-    async def stream_transcribe(
-        self, audio_stream: AsyncGenerator[bytes, None], language: str = "en"
-    ) -> AsyncGenerator[str, None]:
-        """Stream transcription from audio chunks."""
-        buffer = b""
-        async for chunk in audio_stream:
-            buffer += chunk
-            if len(buffer) >= 16000:
-                text = await self.transcribe(buffer, language)
-                if text:
-                    yield text
-                buffer = b""
-        if buffer:
-            text = await self.transcribe(buffer, language)
-            if text:
-                yield text
+    async def open_live(
+        self,
+        language: str = "en",
+        sample_rate: int = 16000,
+        on_transcript: TranscriptCallback | None = None,
+    ) -> "LiveTranscription":
+        """Open a live transcription session for raw 16-bit mono PCM."""
+        session = LiveTranscription(
+            api_key=self.api_key,
+            language=language,
+            sample_rate=sample_rate,
+            on_transcript=on_transcript,
+        )
+        await session.start()
+        return session
+
+
+class LiveTranscription:
+    """A Deepgram live-transcription websocket kept open for a whole call.
+
+    Audio frames are forwarded as they arrive, so by the time a turn ends
+    Deepgram has already transcribed almost all of it. `finalize` flushes
+    the remainder and returns the turn's final transcript.
+
+    Audio not yet covered by a final result is kept, so a dropped stream is
+    reopened and the audio replayed. If it can't be reopened, the session
+    falls back to uploading each turn's audio when it's finalized.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        language: str = "en",
+        sample_rate: int = 16000,
+        on_transcript: TranscriptCallback | None = None,
+    ) -> None:
+        self.api_key = api_key
+        self.language = language
+        self.sample_rate = sample_rate
+        self.on_transcript = on_transcript
+        self._ws: ClientConnection | None = None
+        self._reader: asyncio.Task | None = None
+        self._keepalive: asyncio.Task | None = None
+        self._finals: list[str] = []
+        self._interim = ""
+        self._finalized = asyncio.Event()
+        # Audio sent since the last final result
+        self._pending = PcmBuffer()
+        self._last_send = 0.0
+
+    async def start(self) -> None:
+        """Open the websocket and start reading results."""
+        params = {
+            "model": "nova-2",
+            "language": self.language,
+            "encoding": "linear16",
+            "sample_rate": self.sample_rate,
+            "channels": 1,
+            "interim_results": "true",
+            "smart_format": "true",
+        }
+        self._ws = await connect(
+            f"{DEEPGRAM_LISTEN_URL}?{urlencode(params)}",
+            additional_headers={"Authorization": f"Token {self.api_key}"},
+        )
+        self._last_send = time.monotonic()
+        self._reader = asyncio.create_task(self._read_loop(self._ws))
+        self._keepalive = asyncio.create_task(self._keepalive_loop(self._ws))
+        logger.info("stt_live_opened", language=self.language)
+
+    @property
+    def partial_transcript(self) -> str:
+        """Everything heard so far this turn, including the latest interim result."""
+        return " ".join([*self._finals, self._interim]).strip()
+
+    async def send(self, chunk: bytes | memoryview) -> None:
+        """Forward a frame of PCM audio."""
+        self._pending.extend(chunk)
+        self._last_send = time.monotonic()
+        if self._ws is None:
+            return
+        try:
+            await self._ws.send(chunk)
+        except ConnectionClosed:
+            await self._reconnect()
+
+    async def finalize(self, timeout: float = 2.0) -> str:
+        """Flush pending audio and return the final transcript for the turn."""
+        try:
+            if self._pending:
+                flushed = False
+                if self._ws is not None:
+                    with timed("stt", "deepgram", "nova-2"):
+                        flushed = await self._flush(timeout)
+                if not flushed:
+                    # The stream is gone: transcribe what it didn't get to
+                    self._finals.append(
+                        await STTService(self.api_key).transcribe_pcm(
+                            self._pending.view(), self.language, self.sample_rate
+                        )
+                    )
+            transcript = " ".join(self._finals).strip()
+        finally:
+            self._finals.clear()
+            self._interim = ""
+            self._pending.clear()
+        logger.info("transcription_complete", length=len(transcript), live=True)
+        return transcript
+
+    async def close(self) -> None:
+        """Close the stream and stop background tasks."""
+        self._stop_tasks()
+        if self._ws is not None:
+            try:
+                await self._ws.send(json.dumps({"type": "CloseStream"}))
+                await self._ws.close()
+            except ConnectionClosed:
+                pass
+            self._ws = None
+        logger.info("stt_live_closed")
+
+    async def _flush(self, timeout: float) -> bool:
+        """Ask Deepgram to finalize pending audio; False if the stream dropped."""
+        assert self._ws is not None and self._reader is not None
+        self._finalized.clear()
+        try:
+            await self._ws.send(json.dumps({"type": "Finalize"}))
+            await asyncio.wait_for(self._finalized.wait(), timeout)
+        except ConnectionClosed:
+            return False
+        except TimeoutError:
+            logger.warning("stt_finalize_timeout", timeout=timeout)
+        return not self._reader.done()
+
+    async def _reconnect(self) -> None:
+        """Reopen a dropped stream and replay the audio it hadn't finalized.
+
+        If that fails the session stays closed and turns are transcribed by
+        upload in `finalize`.
+        """
+        self._stop_tasks()
+        self._ws = None
+        logger.warning("stt_live_reconnecting", pending_bytes=len(self._pending))
+        try:
+            await self.start()
+            assert self._ws is not None
+            await self._ws.send(bytes(self._pending.view()))
+        except Exception as exc:
+            self._stop_tasks()
+            self._ws = None
+            logger.warning("stt_live_fallback_to_upload", error=str(exc))
+
+    def _stop_tasks(self) -> None:
+        for task in (self._keepalive, self._reader):
+            if task is not None:
+                task.cancel()
+        self._keepalive = self._reader = None
+
+    async def _read_loop(self, ws: ClientConnection) -> None:
+        """Dispatch interim and final results from Deepgram."""
+        try:
+            async for raw in ws:
+                message = json.loads(raw)
+                if message.get("type") != "Results":
+                    continue
+
+                alternatives = message.get("channel", {}).get("alternatives") or [{}]
+                text = alternatives[0].get("transcript", "")
+                is_final = bool(message.get("is_final"))
+                if is_final:
+                    self._pending.clear()
+                    self._interim = ""
+                    if text:
+                        self._finals.append(text)
+                else:
+                    self._interim = text
+                if text and self.on_transcript:
+                    try:
+                        await self.on_transcript(text, is_final)
+                    except Exception as exc:
+                        logger.warning("stt_transcript_callback_failed", error=str(exc))
+                if message.get("from_finalize"):
+                    self._finalized.set()
+        except ConnectionClosed as exc:
+            logger.warning("stt_live_connection_closed", code=exc.rcvd.code if exc.rcvd else None)
+        finally:
+            # Don't leave a pending finalize() waiting on a dead connection
+            self._finalized.set()
+
+    async def _keepalive_loop(self, ws: ClientConnection) -> None:
+        """Keep the connection open while the caller is silent."""
+        while True:
+            await asyncio.sleep(KEEPALIVE_INTERVAL_SECONDS)
+            if time.monotonic() - self._last_send >= KEEPALIVE_INTERVAL_SECONDS:
+                try:
+                    await ws.send(json.dumps({"type": "KeepAlive"}))
+                except ConnectionClosed:
+                    return
@@ -1,36 +1,112 @@
 """Text-to-Speech service using Deepgram."""
 
+import asyncio
+import time
+from collections.abc import AsyncGenerator
+
 import structlog
 
 from app.core.config import settings
+from app.core.exceptions import VoiceServiceException
+from app.core.metrics import observe_stage
+from app.voice.clients import get_deepgram_client
+from app.voice.tts_cache import TTSCache, audio_key, get_tts_cache
 
 logger = structlog.get_logger("tts")
 
+# Constant-bitrate mp3, so playback time follows from the bytes sent
+AUDIO_FORMAT = "mp3"
+MP3_BIT_RATE = 48_000
+AUDIO_BYTES_PER_SECOND = MP3_BIT_RATE // 8
+
 
 class TTSService:
     """Deepgram Text-to-Speech service."""
 
-    def __init__(self, voice: str = "aura-asteria-en", api_key: str | None = None) -> None:
+    def __init__(
+        self,
+        voice: str = "aura-asteria-en",
+        api_key: str | None = None,
+        cache: TTSCache | None = None,
+    ) -> None:
         self.api_key = api_key or settings.DEEPGRAM_API_KEY
         self.voice = voice
+        self.cache = (
+            cache
+            if cache is not None
+            else (get_tts_cache() if settings.TTS_CACHE_ENABLED else None)
+        )
 
-    async def synthesize(self, text: str) -> bytes:
-        """Convert text to speech audio bytes."""
-        from deepgram import DeepgramClient
+    async def synthesize(self, text: str, persistent: bool = False) -> bytes:
+        """Convert text to speech audio bytes.
 
-        client = DeepgramClient(api_key=self.api_key)
-        # SDK v5+ uses direct parameters instead of SpeakOptions
-        audio_data = b""
-        for chunk in client.speak.v1.audio.generate(text=text, model=self.voice):
-            audio_data += chunk
+        Renderings are cached by content; `persistent` phrases (greetings)
+        are also kept in object storage so every worker can reuse them.
+        """
+        key = audio_key(self.voice, text, AUDIO_FORMAT)
+        if self.cache is not None:
+            cached = await self.cache.get(key, persistent)
+            if cached is not None:
+                return cached
+
+        chunks = [chunk async for chunk in self._render(text)]
+        audio_data = b"".join(chunks)
         logger.info("tts_complete", text_length=len(text), audio_bytes=len(audio_data))
+        if self.cache is not None:
+            await self.cache.put(key, audio_data, persistent)
         return audio_data
 
-    async def synthesize_stream(self, text: str):
-        """Stream TTS audio chunks."""
-        from deepgram import DeepgramClient
+    async def synthesize_stream(self, text: str) -> AsyncGenerator[bytes, None]:
+        """Stream TTS audio chunks, from the memory cache when possible."""
+        if self.cache is None:
+            async for chunk in self._render(text):
+                yield chunk
+            return
+
+        key = audio_key(self.voice, text, AUDIO_FORMAT)
+        cached = self.cache.get_local(key)
+        if cached is not None:
+            yield cached
+            return
 
-        client = DeepgramClient(api_key=self.api_key)
-        # SDK v5+ returns an iterator directly
-        for chunk in client.speak.v1.audio.generate(text=text, model=self.voice):
+        chunks: list[bytes] = []
+        async for chunk in self._render(text):
+            chunks.append(chunk)
             yield chunk
+        # Only complete renderings are cached
+        self.cache.put_local(key, b"".join(chunks))
+
+    async def _render(self, text: str) -> AsyncGenerator[bytes, None]:
+        """Stream TTS audio chunks as Deepgram renders them."""
+        client = get_deepgram_client(self.api_key)
+        start = time.perf_counter()
+        first = True
+        params = {"model": self.voice, "encoding": AUDIO_FORMAT, "bit_rate": MP3_BIT_RATE}
+        async with client.stream("POST", "/speak", params=params, json={"text": text}) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                detail = body[:200].decode(errors="replace")
+                raise VoiceServiceException(
+                    f"Deepgram TTS returned {response.status_code}: {detail}"
+                )
+            async for chunk in response.aiter_bytes():
+                if first:
+                    first = False
+                    observe_stage(
+                        "tts_first_byte", time.perf_counter() - start, "deepgram", self.voice
+                    )
+                yield chunk
+        observe_stage("tts_total", time.perf_counter() - start, "deepgram", self.voice)
+
+
+async def prerender(voice: str, text: str, api_key: str | None) -> None:
+    """Render a phrase into every cache tier ahead of time (e.g. a greeting)."""
+    if not text.strip():
+        return
+    try:
+        await TTSService(voice=voice, api_key=api_key).synthesize(text, persistent=True)
+        logger.info("tts_prerendered", voice=voice, text_length=len(text))
+    except asyncio.CancelledError:
+        raise
+    except Exception as exc:
+        logger.warning("tts_prerender_failed", voice=voice, error=str(exc))
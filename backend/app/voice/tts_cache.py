@@ -0,0 +1,98 @@
+"""Content-addressed cache of synthesized speech.
+
+Two tiers: a bounded in-process LRU for the hot set, and the S3 bucket
+(via `storage_service`) for phrases worth keeping across workers and
+restarts, such as agent greetings.
+"""
+
+import hashlib
+
+import structlog
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.memory_cache import TTLCache
+from app.services import storage_service
+
+logger = structlog.get_logger("tts_cache")
+
+STORAGE_PREFIX = "tts-cache"
+
+CACHE_REQUESTS = metrics.counter(
+    "voxa_tts_cache_requests",
+    "TTS cache lookups by the tier that answered",
+    ("tier",),
+)
+
+
+def audio_key(voice: str, text: str, audio_format: str) -> str:
+    """Content address for a rendering of `text`."""
+    return hashlib.sha256(f"{voice}\x1f{audio_format}\x1f{text}".encode()).hexdigest()
+
+
+class TTSCache:
+    """In-memory LRU tier backed by an optional S3 tier."""
+
+    def __init__(
+        self,
+        max_items: int = settings.TTS_CACHE_MEMORY_ITEMS,
+        ttl: float = settings.TTS_CACHE_TTL_SECONDS,
+    ) -> None:
+        self._memory: TTLCache[str, bytes] = TTLCache(maxsize=max_items, ttl=ttl)
+
+    def get_local(self, key: str) -> bytes | None:
+        """Memory tier only — free to call on the streaming hot path."""
+        audio = self._memory.get(key)
+        CACHE_REQUESTS.inc(tier="memory" if audio is not None else "miss")
+        return audio
+
+    def put_local(self, key: str, audio: bytes) -> None:
+        """Store a rendering in the memory tier."""
+        if audio:
+            self._memory.set(key, audio)
+
+    async def get(self, key: str, persistent: bool = False) -> bytes | None:
+        """Look up memory, then (for persistent phrases) S3."""
+        audio = self._memory.get(key)
+        if audio is not None:
+            CACHE_REQUESTS.inc(tier="memory")
+            return audio
+
+        if persistent and settings.TTS_CACHE_STORAGE_ENABLED:
+            try:
+                audio = await storage_service.get_file(_storage_key(key))
+            except Exception:
+                audio = None
+            if audio:
+                CACHE_REQUESTS.inc(tier="storage")
+                self.put_local(key, audio)
+                return audio
+
+        CACHE_REQUESTS.inc(tier="miss")
+        return None
+
+    async def put(self, key: str, audio: bytes, persistent: bool = False) -> None:
+        """Store a rendering; persistent phrases are also written to S3."""
+        self.put_local(key, audio)
+        if not persistent or not audio or not settings.TTS_CACHE_STORAGE_ENABLED:
+            return
+        try:
+            await storage_service.upload_file(audio, _storage_key(key), "audio/mpeg")
+        except Exception as exc:
+            logger.warning("tts_cache_store_failed", key=key, error=str(exc))
+
+
+def _storage_key(key: str) -> str:
+    """Object key in the bucket, fanned out by hash prefix."""
+    return f"{STORAGE_PREFIX}/{key[:2]}/{key}.mp3"
+
+
+_cache: TTSCache | None = None
+
+
+def get_tts_cache() -> TTSCache:
+    """Get or create the worker's TTS cache."""
+    global _cache
+    if _cache is None:
+        _cache = TTSCache()
+    return _cache
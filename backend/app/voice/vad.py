@@ -0,0 +1,153 @@
+"""Voice activity detection and endpointing for 16-bit mono PCM."""
+
+import math
+from collections import deque
+from dataclasses import dataclass
+
+import numpy as np
+
+from app.core.config import settings
+from app.voice.audio import PcmBuffer
+
+FRAME_MS = 20
+
+# Frames whose zero-crossing rate exceeds this are treated as unvoiced speech
+# (fricatives like "s", "f") when their energy is within UNVOICED_MARGIN_DB of
+# the threshold and clearly above the noise floor. Unvoiced frames only keep
+# an utterance going; an onset needs voiced (energy-only) frames.
+UNVOICED_ZCR = 0.25
+UNVOICED_MARGIN_DB = 10.0
+UNVOICED_FLOOR_MARGIN_DB = 6.0
+
+# The threshold tracks the background noise floor so a noisy line doesn't
+# read as continuous speech. The floor follows quieter frames down at once
+# and rises toward louder non-speech frames with this time constant; speech
+# frames never move it up.
+NOISE_MARGIN_DB = 12.0
+NOISE_FLOOR_RISE_SECONDS = 2.0
+_NOISE_FLOOR_ALPHA = 1.0 - math.exp(-FRAME_MS / 1000 / NOISE_FLOOR_RISE_SECONDS)
+
+
+@dataclass(slots=True)
+class VadResult:
+    """Outcome of feeding one chunk of audio into the detector."""
+
+    audio: bytes
+    speech_started: bool = False
+    speech_ended: bool = False
+
+
+class VoiceActivityDetector:
+    """Energy / zero-crossing VAD with trailing-silence endpointing.
+
+    Audio is analysed in 20 ms frames. Only speech is passed through:
+    leading silence is dropped (apart from `padding_ms` of pre-roll so the
+    onset isn't clipped), pauses inside an utterance are kept, and trailing
+    silence beyond `padding_ms` is discarded when the turn ends after
+    `endpoint_silence_ms` without speech.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        threshold_db: float = settings.VAD_ENERGY_THRESHOLD_DB,
+        endpoint_silence_ms: int = settings.VAD_ENDPOINT_SILENCE_MS,
+        min_speech_ms: int = settings.VAD_MIN_SPEECH_MS,
+        padding_ms: int = settings.VAD_PADDING_MS,
+    ) -> None:
+        self.frame_samples = sample_rate * FRAME_MS // 1000
+        self.frame_bytes = self.frame_samples * 2
+        self.threshold_db = threshold_db
+        self.endpoint_frames = max(1, endpoint_silence_ms // FRAME_MS)
+        self.min_speech_frames = max(1, min_speech_ms // FRAME_MS)
+        self.padding_frames = padding_ms // FRAME_MS
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget all state, e.g. after the client ends the turn itself."""
+        self.in_speech = False
+        self._pending = PcmBuffer(capacity=16 * 1024)
+        self._onset: deque[bytes] = deque(maxlen=self.padding_frames + self.min_speech_frames)
+        self._speech_run = 0
+        self._held_silence: list[bytes] = []
+        self._noise_floor_db: float | None = None
+
+    def process(self, chunk: bytes | memoryview) -> VadResult:
+        """Feed a chunk of PCM and return the audio to forward to STT."""
+        self._pending.extend(chunk)
+        n_frames = len(self._pending) // self.frame_bytes
+        if n_frames == 0:
+            return VadResult(audio=b"")
+
+        # Analyse and slice frames straight out of the buffer; only audio that
+        # must outlive this call (onset, held silence, output) is copied.
+        frames = self._pending.view()[: n_frames * self.frame_bytes]
+        energy_db, zcr = _features(np.frombuffer(frames, dtype="<i2").reshape(n_frames, -1))
+        out = bytearray()
+        result = VadResult(audio=b"")
+
+        for i in range(n_frames):
+            frame = frames[i * self.frame_bytes : (i + 1) * self.frame_bytes]
+            voiced, unvoiced = self._classify(float(energy_db[i]), float(zcr[i]))
+            if not self.in_speech:
+                self._onset.append(bytes(frame))
+                self._speech_run = self._speech_run + 1 if voiced else 0
+                if self._speech_run >= self.min_speech_frames:
+                    self.in_speech = True
+                    result.speech_started = True
+                    out.extend(b"".join(self._onset))
+                    self._onset.clear()
+                continue
+
+            if voiced or unvoiced:
+                # Pause inside the utterance — keep it for the recogniser
+                out.extend(b"".join(self._held_silence))
+                self._held_silence.clear()
+                out.extend(frame)
+                continue
+
+            self._held_silence.append(bytes(frame))
+            if len(self._held_silence) >= self.endpoint_frames:
+                out.extend(b"".join(self._held_silence[: self.padding_frames]))
+                self._held_silence.clear()
+                self._speech_run = 0
+                self.in_speech = False
+                result.speech_ended = True
+
+        self._pending.consume(n_frames * self.frame_bytes)
+        result.audio = bytes(out)
+        return result
+
+    def _classify(self, energy_db: float, zcr: float) -> tuple[bool, bool]:
+        """Return a frame's (voiced, unvoiced) speech flags.
+
+        Frames are classified one at a time, in order, so the result doesn't
+        depend on how the client chunks its audio.
+        """
+        if self._noise_floor_db is None:
+            # Seed from the line itself, capped in case the caller is already talking
+            self._noise_floor_db = min(energy_db, self.threshold_db)
+
+        floor = self._noise_floor_db
+        threshold = max(self.threshold_db, floor + NOISE_MARGIN_DB)
+        voiced = energy_db > threshold
+        unvoiced = (
+            zcr > UNVOICED_ZCR
+            and energy_db > threshold - UNVOICED_MARGIN_DB
+            and energy_db > floor + UNVOICED_FLOOR_MARGIN_DB
+        )
+
+        if energy_db < floor:
+            self._noise_floor_db = energy_db
+        elif not (voiced or unvoiced):
+            self._noise_floor_db += _NOISE_FLOOR_ALPHA * (energy_db - floor)
+        return voiced, unvoiced
+
+
+def _features(frames: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Per-frame energy (dBFS) and zero-crossing rate."""
+    samples = frames.astype(np.float32) / 32768.0
+    rms = np.sqrt(np.mean(samples * samples, axis=1))
+    energy_db = 20.0 * np.log10(rms + 1e-10)
+    zcr = np.mean(np.signbit(frames[:, 1:]) != np.signbit(frames[:, :-1]), axis=1)
+    return energy_db, zcr
@@ -1,6 +1,9 @@
 """Celery worker configuration."""
 
+import asyncio
+
 from celery import Celery
+from celery.signals import worker_init
 
 from app.core.config import settings
 
@@ -8,6 +11,7 @@ celery_app = Celery(
     "voxa",
     broker=settings.REDIS_URL,
     backend=settings.REDIS_URL,
+    include=["app.tasks.ingestion", "app.tasks.maintenance"],
 )
 
 celery_app.conf.update(
@@ -19,4 +23,28 @@ celery_app.conf.update(
     task_track_started=True,
     task_acks_late=True,
     worker_prefetch_multiplier=1,
+    worker_concurrency=settings.INGEST_WORKER_CONCURRENCY,
+    task_routes={"ingestion.*": {"queue": "ingestion"}},
+    beat_schedule={
+        "reconcile-vectors": {
+            "task": "maintenance.reconcile_vectors",
+            "schedule": settings.VECTOR_GC_INTERVAL_SECONDS,
+        },
+    },
 )
+
+
+@worker_init.connect
+def verify_shard_count(**_: object) -> None:
+    """Refuse to start with a QDRANT_SHARED_COLLECTIONS the stored chunks don't use."""
+    from app.rag import retriever
+
+    async def verify() -> None:
+        # Its own client: the process's one must be created on the task loop
+        client = retriever.connect_qdrant()
+        try:
+            await retriever.verify_shard_count(client=client)
+        finally:
+            await client.close()
+
+    asyncio.run(verify())
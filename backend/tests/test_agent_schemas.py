@@ -0,0 +1,15 @@
+"""Tests for agent request schemas."""
+
+import pytest
+from pydantic import ValidationError
+
+from app.schemas.agent import AgentUpdate
+
+
+def test_update_omitting_metadata_leaves_it_unchanged():
+    assert AgentUpdate(name="Support").model_dump(exclude_unset=True) == {"name": "Support"}
+
+
+def test_update_rejects_null_metadata():
+    with pytest.raises(ValidationError):
+        AgentUpdate.model_validate({"agent_metadata": None})
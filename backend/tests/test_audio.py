@@ -0,0 +1,78 @@
+"""Tests for voice-path audio helpers."""
+
+from collections.abc import AsyncIterator
+
+from app.voice.audio import PcmBuffer, PlaybackClock, iter_frames, reframe
+
+
+async def _chunks(*sizes: int) -> AsyncIterator[bytes]:
+    for i, size in enumerate(sizes):
+        yield bytes([i]) * size
+
+
+async def test_reframe_passes_the_first_chunk_on_at_once():
+    sizes = (300, 500, 500, 200)
+    frames = [bytes(f) async for f in reframe(_chunks(*sizes), frame_size=1000)]
+    assert [len(f) for f in frames] == [300, 1000, 200]
+    assert b"".join(frames) == b"".join([bytes([i]) * n for i, n in enumerate(sizes)])
+
+
+async def test_reframe_cuts_large_chunks_into_frames():
+    frames = [bytes(f) async for f in reframe(_chunks(10, 2500, 600), frame_size=1000)]
+    assert [len(f) for f in frames] == [10, 1000, 1000, 1000, 100]
+
+
+async def test_reframe_empty_stream():
+    assert [f async for f in reframe(_chunks())] == []
+
+
+def test_iter_frames():
+    assert [len(f) for f in iter_frames(b"x" * 2500, frame_size=1000)] == [1000, 1000, 500]
+
+
+def test_pcm_buffer_reuses_storage_and_keeps_views_valid():
+    buffer = PcmBuffer(capacity=4)
+    buffer.extend(b"ab")
+    view = buffer.view()
+    buffer.extend(b"cdef")
+    assert bytes(view) == b"ab"
+    assert bytes(buffer.view()) == b"abcdef"
+    buffer.consume(4)
+    assert bytes(buffer.view()) == b"ef"
+    buffer.clear()
+    assert len(buffer) == 0
+
+
+def test_playback_runs_in_real_time_from_the_first_frame():
+    clock = PlaybackClock(bytes_per_second=1000, latency=0.0)
+    # A 3 s reply sent all at once, faster than real time
+    clock.sent(1000, now=10.0)
+    clock.sent(2000, now=10.01)
+    assert clock.played_bytes(now=10.0) == 0
+    assert clock.played_bytes(now=11.5) == 1500
+    assert clock.remaining(now=11.5) == 1.5
+    assert clock.played_bytes(now=20.0) == 3000
+    assert clock.remaining(now=20.0) == 0.0
+
+
+def test_playback_stalls_when_audio_runs_out():
+    clock = PlaybackClock(bytes_per_second=1000, latency=0.0)
+    clock.sent(1000, now=0.0)
+    # The next sentence arrives 2 s later; playback resumes from there
+    clock.sent(1000, now=2.0)
+    assert clock.played_bytes(now=2.5) == 1500
+
+
+def test_playback_starts_after_the_latency():
+    clock = PlaybackClock(bytes_per_second=1000, latency=0.2)
+    clock.sent(1000, now=0.0)
+    assert clock.played_bytes(now=0.1) == 0
+    assert clock.played_bytes(now=0.7) == 500
+
+
+def test_reset_starts_a_new_reply():
+    clock = PlaybackClock(bytes_per_second=1000, latency=0.0)
+    clock.sent(1000, now=0.0)
+    clock.reset()
+    assert clock.sent_bytes == 0
+    assert clock.remaining(now=0.5) == 0.0
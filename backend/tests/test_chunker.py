@@ -0,0 +1,60 @@
+"""Tests for structure-aware chunking."""
+
+from app.rag.chunker import MIN_FILL, chunk_text, iter_chunks
+from app.rag.embeddings import count_tokens
+
+
+def _sentence(i: int) -> str:
+    return f"Sentence number {i} describes our refund policy in some detail."
+
+
+def _paragraphs(count: int, sentences: int) -> list[str]:
+    return [" ".join(_sentence(p * sentences + s) for s in range(sentences)) for p in range(count)]
+
+
+def test_chunks_stay_within_the_budget():
+    text = "\n\n".join(_paragraphs(6, 12))
+    chunks = chunk_text(text, max_tokens=100, overlap_tokens=20)
+    assert len(chunks) > 1
+    assert all(count_tokens(c) <= 100 for c in chunks)
+
+
+def test_words_longer_than_the_budget_are_cut_by_tokens():
+    chunks = chunk_text("a" * 5000, max_tokens=512, overlap_tokens=0)
+    assert len(chunks) > 1
+    assert all(count_tokens(c) <= 512 for c in chunks)
+    assert "".join(chunks) == "a" * 5000
+
+
+def test_chunks_split_mid_paragraph_repeat_trailing_sentences():
+    (paragraph,) = _paragraphs(1, 20)
+    chunks = chunk_text(paragraph, max_tokens=60, overlap_tokens=30)
+    assert len(chunks) > 2
+    for previous, chunk in zip(chunks, chunks[1:], strict=False):
+        overlap = next(chunk[:i] for i in range(len(chunk), 0, -1) if previous.endswith(chunk[:i]))
+        assert overlap.endswith(".") and 0 < count_tokens(overlap) <= 30
+
+
+def test_chunks_end_at_paragraphs_without_overlap():
+    paragraphs = _paragraphs(4, 3)
+    per_paragraph = count_tokens(paragraphs[0])
+    chunks = chunk_text("\n\n".join(paragraphs), max_tokens=int(per_paragraph * 2.5))
+    # Two whole paragraphs fill a chunk past MIN_FILL, so it ends there
+    assert 2 * per_paragraph >= MIN_FILL * int(per_paragraph * 2.5)
+    assert chunks == ["\n\n".join(paragraphs[:2]), "\n\n".join(paragraphs[2:])]
+
+
+def test_headings_start_new_chunks():
+    (first,) = _paragraphs(1, 8)
+    (second,) = _paragraphs(1, 4)
+    text = f"# Refunds\n\n{first}\n\n# Shipping\n\n{second}"
+    # The first section fills its chunk past MIN_FILL; both don't fit in one
+    budget = count_tokens(f"# Refunds\n\n{first}") + 10
+    chunks = chunk_text(text, max_tokens=budget)
+    assert chunks == [f"# Refunds\n\n{first}", f"# Shipping\n\n{second}"]
+
+
+def test_iter_chunks_matches_chunk_text_on_joined_segments():
+    segments = ["# Guide", *_paragraphs(3, 8), "", "## Details", *_paragraphs(2, 15)]
+    streamed = list(iter_chunks(segments, max_tokens=80, overlap_tokens=16))
+    assert streamed == chunk_text("\n".join(segments), max_tokens=80, overlap_tokens=16)
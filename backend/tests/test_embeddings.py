@@ -0,0 +1,66 @@
+"""Tests for embedding requests: bulk packing and per-tenant keys."""
+
+import asyncio
+
+import numpy as np
+
+from app.core.config import settings
+from app.rag import embeddings
+from app.rag.embeddings import EMBEDDING_MAX_INPUT_TOKENS, count_tokens, pack_batches
+
+
+def test_batches_stay_within_the_token_budget(monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_REQUEST_MAX_TOKENS", 10)
+    monkeypatch.setattr(settings, "EMBEDDING_REQUEST_MAX_INPUTS", 100)
+    texts = ["one two three four"] * 5
+    assert count_tokens(texts[0]) == 4
+
+    batches = pack_batches(texts)
+    assert batches == [(0, texts[:2]), (2, texts[2:4]), (4, texts[4:])]
+
+
+def test_batches_stay_within_the_input_limit(monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_REQUEST_MAX_INPUTS", 2)
+    texts = ["a", "b", "c", "d", "e"]
+    assert pack_batches(texts) == [(0, ["a", "b"]), (2, ["c", "d"]), (4, ["e"])]
+
+
+def test_oversized_inputs_are_truncated_and_sent_alone(monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_REQUEST_MAX_TOKENS", EMBEDDING_MAX_INPUT_TOKENS)
+    batches = pack_batches(["short", "word " * 9000, "tail"])
+    assert [offset for offset, _ in batches] == [0, 1, 2]
+    assert count_tokens(batches[1][1][0]) == EMBEDDING_MAX_INPUT_TOKENS
+
+
+def test_no_texts():
+    assert pack_batches([]) == []
+
+
+async def test_concurrent_callers_embed_with_their_own_keys(monkeypatch):
+    calls: list[tuple[str | None, list[str]]] = []
+
+    async def create(api_key: str | None, texts: list[str]) -> list[np.ndarray]:
+        calls.append((api_key, texts))
+        return [np.ones(4, dtype=np.float32) for _ in texts]
+
+    async def redis_get(keys: list[str]) -> list[None]:
+        return [None] * len(keys)
+
+    async def redis_set(vectors: dict) -> None:
+        pass
+
+    monkeypatch.setattr(embeddings, "_create", create)
+    monkeypatch.setattr(embeddings, "_redis_get", redis_get)
+    monkeypatch.setattr(embeddings, "_redis_set", redis_set)
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "platform-key")
+
+    await asyncio.gather(
+        embeddings.generate_embedding("question from org a", "key-a"),
+        embeddings.generate_embedding("question from org b", "key-b"),
+        embeddings.generate_embedding("question without a key"),
+    )
+    assert sorted(calls) == [
+        ("key-a", ["question from org a"]),
+        ("key-b", ["question from org b"]),
+        ("platform-key", ["question without a key"]),
+    ]
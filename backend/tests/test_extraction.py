@@ -0,0 +1,104 @@
+"""Tests for text extraction through the process pool."""
+
+import multiprocessing
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.rag import extraction
+from app.rag.extraction import iter_pdf_pages
+
+
+@pytest.fixture(autouse=True)
+def fresh_pool():
+    extraction._pool = None
+    yield
+    if extraction._pool is not None:
+        extraction._pool.shutdown(wait=True, cancel_futures=True)
+        extraction._pool = None
+
+
+def _write_pdf(path, pages: list[str]) -> None:
+    """A minimal PDF with one line of Helvetica text per page."""
+    count = len(pages)
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(count))
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {count} >>",
+    ]
+    font = 3 + 2 * count
+    for i, text in enumerate(pages):
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 {font} 0 R >> >> /Contents {4 + 2 * i} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n".encode()
+    out += f"startxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(out)
+
+
+def _extract_in_daemon(path: str, results) -> None:
+    try:
+        results.put(list(iter_pdf_pages(path)))
+    except BaseException as exc:
+        results.put(repr(exc))
+
+
+def test_pdf_page_ranges_are_extracted_in_the_pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "EXTRACT_PDF_PAGES_PER_JOB", 2)
+    texts = [f"Page {n} text" for n in range(1, 6)]
+    path = tmp_path / "doc.pdf"
+    _write_pdf(path, texts)
+
+    pages = list(iter_pdf_pages(str(path)))
+    assert [page.strip() for page in pages] == texts
+    assert isinstance(extraction._pool, extraction.ProcessPoolExecutor)
+
+
+def test_daemonic_process_extracts_in_thread(tmp_path):
+    # Celery prefork children are daemonic and can't start a process pool
+    path = tmp_path / "doc.pdf"
+    _write_pdf(path, ["Only page"])
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_extract_in_daemon, args=(str(path), results), daemon=True)
+    process.start()
+    try:
+        result = results.get(timeout=60)
+    finally:
+        process.join(timeout=10)
+    assert isinstance(result, list), result
+    assert [page.strip() for page in result] == ["Only page"]
+
+
+def test_job_lost_to_another_jobs_timeout_is_resubmitted(monkeypatch):
+    monkeypatch.setattr(settings, "EXTRACT_WORKERS", 2)
+    # Start the pool's processes before timing anything
+    extraction._result(extraction._Job.submit(time.sleep, 0), {"seconds": 0.0})
+
+    stuck = extraction._Job.submit(time.sleep, 30)
+    other = extraction._Job.submit(time.sleep, 3)
+    pool = other.pool
+
+    monkeypatch.setattr(settings, "EXTRACT_TIMEOUT_SECONDS", 1.0)
+    with pytest.raises(TimeoutError):
+        extraction._result(stuck, {"seconds": 0.0})
+
+    monkeypatch.setattr(settings, "EXTRACT_TIMEOUT_SECONDS", 30.0)
+    stats = {"seconds": 0.0}
+    assert extraction._result(other, stats) is None
+    assert other.pool is not pool
+    assert stats["seconds"] >= 3
@@ -0,0 +1,55 @@
+"""Tests for the in-process knowledge base index."""
+
+from qdrant_client.models import PointStruct
+
+from app.core.config import settings
+from app.rag.hot_index import HotIndex
+from app.rag.retriever import CollectionSpec, point_vector
+
+CHUNKS = [
+    "Our store opens at nine on weekdays.",
+    "Refunds are issued within 30 days of purchase.",
+    "Order SKU-44-901 ships from the east warehouse.",
+]
+# One direction per chunk, so dense search is easy to reason about
+EMBEDDINGS = [[1.0, 0.0, 0.0, 0.0], [0.0, 1.0, 0.0, 0.0], [0.0, 0.0, 1.0, 0.0]]
+
+
+def _index(hybrid: bool, dtype: str = "float32") -> HotIndex:
+    spec = CollectionSpec(hybrid=hybrid, dimensions=4)
+    points = [
+        PointStruct(id=i, vector=point_vector(chunk, embedding, spec), payload={"content": chunk})
+        for i, (chunk, embedding) in enumerate(zip(CHUNKS, EMBEDDINGS, strict=True))
+    ]
+    return HotIndex.build(points, spec, dtype)
+
+
+def test_dense_search_ranks_by_cosine_similarity():
+    results = _index(hybrid=False).search([0.2, 0.9, 0.1, 0.0], top_k=2)
+    assert [r["content"] for r in results] == [CHUNKS[1], CHUNKS[0]]
+    assert results[0]["score"] > results[1]["score"] > 0
+
+
+def test_int8_vectors_give_close_scores():
+    query = [0.2, 0.9, 0.1, 0.0]
+    full = _index(hybrid=False).search(query, top_k=3)
+    quantized = _index(hybrid=False, dtype="int8").search(query, top_k=3)
+    assert [r["content"] for r in quantized] == [r["content"] for r in full]
+    for a, b in zip(full, quantized, strict=True):
+        assert abs(a["score"] - b["score"]) < 0.02
+
+
+def test_hybrid_search_fuses_keyword_matches(monkeypatch):
+    monkeypatch.setattr(settings, "RAG_HYBRID_ENABLED", True)
+    index = _index(hybrid=True)
+    # The embedding points at the refunds chunk, but the product code matches another
+    query = [0.0, 1.0, 0.0, 0.0]
+    dense_only = index.search(query, top_k=1)
+    fused = index.search(query, top_k=1, query_text="where does sku44901 ship from")
+    assert dense_only[0]["content"] == CHUNKS[1]
+    assert fused[0]["content"] == CHUNKS[2]
+
+
+def test_empty_index():
+    spec = CollectionSpec(hybrid=True, dimensions=4)
+    assert HotIndex.build([], spec, "float32").search([1.0, 0, 0, 0], top_k=3) == []
@@ -0,0 +1,110 @@
+"""Tests for document uploads into a knowledge base."""
+
+import uuid
+from datetime import UTC, datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.exceptions import BadRequestException
+from app.models.knowledge_base import Document, DocumentStatus, KnowledgeBase
+from app.services import knowledge_base_service
+
+
+class FakeSession:
+    """Just enough of an AsyncSession for upload_document."""
+
+    def __init__(self, kb: KnowledgeBase, documents: list[Document]) -> None:
+        self.kb = kb
+        self.documents = documents
+
+    async def get(self, model, ident):
+        return self.kb if model is KnowledgeBase else None
+
+    async def execute(self, statement):
+        newest = max(self.documents, key=lambda doc: doc.created_at, default=None)
+        return SimpleNamespace(scalars=lambda: SimpleNamespace(first=lambda: newest))
+
+    def add(self, doc: Document) -> None:
+        self.documents.append(doc)
+
+    async def flush(self) -> None:
+        for doc in self.documents:
+            doc.id = doc.id or uuid.uuid4()
+            doc.created_at = doc.created_at or datetime.now(UTC)
+            doc.chunk_count = doc.chunk_count or 0
+
+    async def commit(self) -> None:
+        await self.flush()
+
+
+@pytest.fixture
+def existing():
+    kb = KnowledgeBase(id=uuid.uuid4(), agent_id=uuid.uuid4(), total_documents=1, size_bytes=10)
+    doc = Document(
+        id=uuid.uuid4(),
+        knowledge_base_id=kb.id,
+        filename="faq.md",
+        content_type="text/markdown",
+        size_bytes=10,
+        chunk_count=3,
+        status=DocumentStatus.COMPLETED,
+        created_at=datetime.now(UTC),
+    )
+    return kb, doc
+
+
+@pytest.fixture
+def queued(monkeypatch):
+    enqueued = []
+
+    async def upload_file(content, key, content_type):
+        pass
+
+    async def enqueue_document(doc_id, org_id):
+        enqueued.append(doc_id)
+
+    monkeypatch.setattr(knowledge_base_service.storage_service, "upload_file", upload_file)
+    monkeypatch.setattr(knowledge_base_service.ingestion, "enqueue_document", enqueue_document)
+    return enqueued
+
+
+async def test_same_filename_is_a_new_document_by_default(existing, queued):
+    kb, doc = existing
+    db = FakeSession(kb, [doc])
+
+    response = await knowledge_base_service.upload_document(
+        kb.id, "faq.md", "text/markdown", 25, b"new", db
+    )
+    assert response.id != doc.id
+    assert len(db.documents) == 2
+    assert doc.status == DocumentStatus.COMPLETED
+    assert (kb.total_documents, kb.size_bytes) == (2, 35)
+    assert queued == [str(response.id)]
+
+
+async def test_replace_reindexes_the_existing_document(existing, queued):
+    kb, doc = existing
+    db = FakeSession(kb, [doc])
+
+    response = await knowledge_base_service.upload_document(
+        kb.id, "faq.md", "text/markdown", 25, b"new", db, replace=True
+    )
+    assert response.id == doc.id
+    assert response.status == DocumentStatus.PENDING
+    assert len(db.documents) == 1
+    assert (kb.total_documents, kb.size_bytes) == (1, 25)
+    assert queued == [str(doc.id)]
+
+
+async def test_replace_is_rejected_while_the_document_is_processing(existing, queued):
+    kb, doc = existing
+    doc.status = DocumentStatus.PROCESSING
+    db = FakeSession(kb, [doc])
+
+    with pytest.raises(BadRequestException):
+        await knowledge_base_service.upload_document(
+            kb.id, "faq.md", "text/markdown", 25, b"new", db, replace=True
+        )
+    assert doc.status == DocumentStatus.PROCESSING
+    assert queued == []
@@ -0,0 +1,33 @@
+"""Tests for the in-process metrics registry and its exposition."""
+
+from app.core import metrics
+
+
+def test_counter_family_uses_the_sample_name():
+    requests = metrics.counter("voxa_test_requests", "Test requests", ("route",))
+    requests.inc(route="/health")
+    text = metrics.render()
+    assert "# HELP voxa_test_requests_total Test requests" in text
+    assert "# TYPE voxa_test_requests_total counter" in text
+    assert 'voxa_test_requests_total{route="/health"} 1.0' in text
+
+
+def test_histogram_buckets_are_cumulative():
+    latency = metrics.histogram("voxa_test_latency_seconds", "Test latency", buckets=(0.1, 1.0))
+    latency.observe(0.05)
+    latency.observe(0.5)
+    samples = list(latency.samples())
+    assert samples == [
+        'voxa_test_latency_seconds_bucket{le="0.1"} 1.0',
+        'voxa_test_latency_seconds_bucket{le="1.0"} 2.0',
+        'voxa_test_latency_seconds_bucket{le="+Inf"} 2.0',
+        "voxa_test_latency_seconds_count 2.0",
+        "voxa_test_latency_seconds_sum 0.55",
+    ]
+
+
+def test_org_label_does_not_expose_the_id():
+    org_id = "0b5e3f6e-8f43-4c2b-9d0c-2a6c1f0e9b11"
+    label = metrics.org_label(org_id)
+    assert label == metrics.org_label(org_id)
+    assert org_id not in label and len(label) == 12
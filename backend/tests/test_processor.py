@@ -0,0 +1,22 @@
+"""Tests for reading document files into text segments."""
+
+from app.rag import processor
+from app.rag.processor import iter_text
+
+
+def test_plain_text_is_read_in_blocks_split_at_line_breaks(tmp_path, monkeypatch):
+    monkeypatch.setattr(processor, "TEXT_BLOCK_BYTES", 8)
+    text = "first line\nsecond – línea\n\nthird"
+    path = tmp_path / "notes.txt"
+    path.write_text(text, encoding="utf-8")
+
+    segments = list(iter_text(str(path), "txt"))
+    assert "\n".join(segments) == text
+    # Multi-byte characters cut by a block boundary are decoded whole
+    assert all("�" not in segment for segment in segments)
+
+
+def test_invalid_utf8_is_replaced(tmp_path):
+    path = tmp_path / "legacy.txt"
+    path.write_bytes(b"caf\xe9 menu")
+    assert list(iter_text(str(path), "txt")) == ["caf� menu"]
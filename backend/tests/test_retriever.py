@@ -0,0 +1,67 @@
+"""Tests for mapping knowledge bases to Qdrant collections."""
+
+import pytest
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.models import FieldCondition, MatchValue
+
+from app.core.config import settings
+from app.rag import retriever
+from app.rag.retriever import SHARED_COLLECTION_PREFIX, TENANT_KEY, Location, locate
+
+
+def test_without_sharing_each_kb_has_its_own_collection():
+    assert locate("kb_1234", shards=0) == Location("kb_1234")
+    assert locate("kb_1234", shards=0).scope() is None
+
+
+def test_shared_collections_scope_by_tenant():
+    location = locate("kb_1234", shards=4)
+    assert location.collection.startswith(SHARED_COLLECTION_PREFIX)
+    assert location.tenant == "1234"
+    tenant = FieldCondition(key=TENANT_KEY, match=MatchValue(value="1234"))
+    assert location.scope().must == [tenant]
+
+
+def test_kbs_spread_across_shards_stably():
+    names = [f"kb_{i}" for i in range(200)]
+    shards = {locate(name, shards=4).collection for name in names}
+    assert shards == {f"{SHARED_COLLECTION_PREFIX}{i}" for i in range(4)}
+    assert [locate(n, shards=4) for n in names] == [locate(n, shards=4) for n in names]
+
+
+async def test_search_of_a_missing_collection_creates_nothing(monkeypatch):
+    client = AsyncQdrantClient(":memory:")
+    monkeypatch.setattr(retriever, "_qdrant_client", client)
+    monkeypatch.setattr(retriever, "_collections", {})
+    for shards in (0, 4):
+        monkeypatch.setattr(settings, "QDRANT_SHARED_COLLECTIONS", shards)
+        assert await retriever.search_vector("kb_1234", [1.0, 0.0], query_text="hours") == []
+    assert (await client.get_collections()).collections == []
+    assert retriever._collections == {}
+
+
+async def test_a_different_shard_count_is_refused(monkeypatch):
+    client = AsyncQdrantClient(":memory:")
+    monkeypatch.setattr(retriever, "_qdrant_client", client)
+    monkeypatch.setattr(retriever, "_collections", {})
+    await retriever.ensure_collection("kb_1234")  # unshared, not checked
+    await retriever._ensure_location(locate("kb_1234", shards=4), shards=4)
+
+    await retriever.verify_shard_count(4)
+    for shards in (0, 2, 8):
+        with pytest.raises(RuntimeError, match="strand"):
+            await retriever.verify_shard_count(shards)
+
+
+async def test_shard_count_is_recorded_on_older_shared_collections(monkeypatch):
+    client = AsyncQdrantClient(":memory:")
+    monkeypatch.setattr(retriever, "_qdrant_client", client)
+    await client.create_collection(f"{SHARED_COLLECTION_PREFIX}3", vectors_config={})
+
+    with pytest.raises(RuntimeError):
+        await retriever.verify_shard_count(3)
+    await retriever.verify_shard_count(4)
+    info = await client.get_collection(f"{SHARED_COLLECTION_PREFIX}3")
+    assert info.config.metadata == {retriever.SHARDS_KEY: 4}
+    with pytest.raises(RuntimeError):
+        await retriever.verify_shard_count(8)
@@ -0,0 +1,40 @@
+"""Tests for local sparse (BM25-style) vectors."""
+
+from app.rag.sparse import document_vector, query_vector, tokenize
+
+
+def test_tokenize_lowercases_words():
+    assert tokenize("Reset your Password, please!") == ["reset", "your", "password", "please"]
+
+
+def test_tokenize_expands_compounds():
+    assert tokenize("Order SKU-44-901") == [
+        "order",
+        "sku-44-901",
+        "sku",
+        "44",
+        "901",
+        "sku44901",
+    ]
+    # Differently punctuated codes share their joined form
+    assert "5550100" in tokenize("call 555.0100") and "5550100" in tokenize("555-0100")
+
+
+def test_tokenize_skips_punctuation_and_underscores():
+    assert tokenize("-- __ ... !") == []
+    assert tokenize("snake_case") == ["snake", "case"]
+
+
+def test_query_terms_match_document_terms():
+    doc_indices, weights = document_vector("The refund policy covers refunds within 30 days.")
+    query_indices, _ = query_vector("refund policy")
+    assert set(query_indices) <= set(doc_indices)
+    assert all(w > 0 for w in weights)
+
+
+def test_repeated_terms_weigh_more_with_diminishing_returns():
+    indices, weights = document_vector("refund refund refund policy")
+    by_index = dict(zip(indices, weights, strict=True))
+    refund = by_index[query_vector("refund")[0][0]]
+    policy = by_index[query_vector("policy")[0][0]]
+    assert policy < refund < 3 * policy
@@ -0,0 +1,43 @@
+"""Tests for the storage profile report script."""
+
+import random
+
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.models import PointStruct
+
+from app.rag import profiles, retriever
+from app.scripts import storage_profile_report
+
+
+async def test_report_on_a_collection_with_shortened_vectors(monkeypatch, capsys):
+    monkeypatch.setattr(retriever, "_qdrant_client", AsyncQdrantClient(":memory:"))
+    monkeypatch.setattr(retriever, "_collections", {})
+    spec = await retriever.create_collection("kb_source", profiles.get_profile("512"))
+    rng = random.Random(7)
+    points = [
+        PointStruct(
+            id=i,
+            vector=retriever.point_vector(
+                f"chunk {i}", [rng.gauss(0, 1) for _ in range(1536)], spec
+            ),
+            payload={"content": f"chunk {i}"},
+        )
+        for i in range(60)
+    ]
+    client = await retriever.get_qdrant()
+    await client.upsert("kb_source", points=points)
+
+    await storage_profile_report.report(
+        ["kb_source"],
+        ["int8", "binary"],
+        queries=5,
+        queries_file=None,
+        top_k=3,
+        max_points=1000,
+    )
+    table = capsys.readouterr().out.splitlines()
+    assert [row.split()[0] for row in table[-3:]] == ["full", "int8", "binary"]
+    # Full precision at the source's own 512 dimensions matches exact search
+    assert float(table[-3].split()[1]) == 1.0
+    listed = await client.get_collections()
+    assert [c.name for c in listed.collections] == ["kb_source"]
@@ -0,0 +1,75 @@
+"""Tests for server-side voice activity detection and endpointing."""
+
+import numpy as np
+
+from app.voice.vad import VoiceActivityDetector
+
+SAMPLE_RATE = 16000
+
+
+def _noise(seconds: float, rng: np.random.Generator, level: float = 0.0005) -> np.ndarray:
+    return rng.normal(0, level, int(seconds * SAMPLE_RATE))
+
+
+def _speech(seconds: float, rng: np.random.Generator) -> np.ndarray:
+    """A voiced tone with syllable-rate loudness changes and no pauses."""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    envelope = 0.65 + 0.35 * np.sin(2 * np.pi * 4 * t)
+    return 0.1 * envelope * np.sin(2 * np.pi * 180 * t) + _noise(seconds, rng)
+
+
+def _pcm(*parts: np.ndarray) -> bytes:
+    return (np.clip(np.concatenate(parts), -1, 1) * 32767).astype("<i2").tobytes()
+
+
+def _run(pcm: bytes, chunk_ms: int) -> tuple[list[float], list[float], bytes]:
+    """Feed PCM in chunks; return speech start/end times (s) and the forwarded audio."""
+    vad = VoiceActivityDetector(sample_rate=SAMPLE_RATE)
+    chunk = SAMPLE_RATE * 2 * chunk_ms // 1000
+    started, ended = [], []
+    out = bytearray()
+    for offset in range(0, len(pcm), chunk):
+        result = vad.process(pcm[offset : offset + chunk])
+        seconds = min(offset + chunk, len(pcm)) / (SAMPLE_RATE * 2)
+        if result.speech_started:
+            started.append(seconds)
+        if result.speech_ended:
+            ended.append(seconds)
+        out.extend(result.audio)
+    return started, ended, bytes(out)
+
+
+def test_continuous_speech_ends_at_the_same_time_for_any_chunk_size():
+    rng = np.random.default_rng(0)
+    pcm = _pcm(_noise(0.5, rng), _speech(6.0, rng), _noise(1.5, rng))
+
+    small = _run(pcm, 20)
+    large = _run(pcm, 256)
+
+    for started, ended, _ in (small, large):
+        assert len(started) == 1 and 0.5 <= started[0] < 0.9
+        # One endpoint, after the speech and the 700 ms of trailing silence
+        assert len(ended) == 1 and 7.1 <= ended[0] < 7.6
+    assert abs(small[1][0] - large[1][0]) <= 0.256
+    assert small[2] == large[2]
+    # The whole utterance was forwarded, not just its start
+    assert len(small[2]) >= 6.0 * SAMPLE_RATE * 2
+
+
+def test_silence_is_not_forwarded():
+    rng = np.random.default_rng(1)
+    started, ended, audio = _run(_pcm(_noise(3.0, rng)), 20)
+    assert started == [] and ended == [] and audio == b""
+
+
+def test_noise_floor_adapts_to_a_noisy_line():
+    rng = np.random.default_rng(2)
+    # Steady background noise above the fixed threshold, then speech over it
+    pcm = _pcm(
+        _noise(3.0, rng, level=0.01),
+        _speech(2.0, rng) + _noise(2.0, rng, level=0.01),
+        _noise(2.0, rng, level=0.01),
+    )
+    started, ended, _ = _run(pcm, 20)
+    assert len(started) == 1 and started[0] >= 3.0
+    assert len(ended) == 1 and ended[0] >= 5.0
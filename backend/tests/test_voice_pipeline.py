@@ -0,0 +1,173 @@
+"""Tests for the streaming voice pipeline: sentence splitting, barge-in and retrieval."""
+
+import asyncio
+import time
+from collections.abc import AsyncIterator
+from contextlib import aclosing
+from types import SimpleNamespace
+
+import litellm
+
+from app.core.config import settings
+from app.voice import pipeline as pipeline_module
+from app.voice.audio import PlaybackClock
+from app.voice.pipeline import MIN_SENTENCE_CHARS, VoicePipeline, split_sentences
+from app.voice.response_cache import SemanticResponseCache
+
+
+async def _tokens(*tokens: str) -> AsyncIterator[str]:
+    for token in tokens:
+        yield token
+
+
+async def _sentences(*tokens: str) -> list[str]:
+    return [s async for s in split_sentences(_tokens(*tokens))]
+
+
+async def test_sentences_split_across_tokens():
+    sentences = await _sentences(
+        "Thanks for calling Acme support", ". How can I", " help you today? ", "Bye"
+    )
+    assert sentences == ["Thanks for calling Acme support.", "How can I help you today?", "Bye"]
+
+
+async def test_short_fragments_merge_with_the_next_sentence():
+    sentences = await _sentences("Hi. ", "Thanks for calling Acme support today. ")
+    assert sentences == ["Hi. Thanks for calling Acme support today."]
+    assert len("Hi.") < MIN_SENTENCE_CHARS
+
+
+async def test_line_breaks_end_sentences():
+    sentences = await _sentences("Here are your options\n", "- the monthly plan\n")
+    assert sentences == ["Here are your options", "- the monthly plan"]
+
+
+async def test_abbreviation_without_space_does_not_split():
+    assert await _sentences("The total is 3.50 dollars per month.") == [
+        "The total is 3.50 dollars per month."
+    ]
+
+
+async def test_no_tokens():
+    assert await _sentences() == []
+    assert await _sentences("  ") == []
+
+
+# ---------------------------------------------------------------------------
+# Barge-in
+# ---------------------------------------------------------------------------
+
+# Audio bytes per sentence; at 1000 bytes/s each sentence plays for 0.2 s
+SENTENCE_BYTES = 200
+
+
+def _pipeline(monkeypatch, reply: list[str] | None = None) -> VoicePipeline:
+    pipeline = VoicePipeline(model="gpt-4o-mini", system_prompt="You are helpful.")
+    pipeline.playback = PlaybackClock(bytes_per_second=1000, latency=0.0)
+
+    async def synthesize(text: str, persistent: bool = False) -> bytes:
+        return b"\xff" * SENTENCE_BYTES
+
+    async def synthesize_stream(text: str) -> AsyncIterator[bytes]:
+        yield b"\xff" * SENTENCE_BYTES
+
+    async def acompletion(**kwargs):
+        async def chunks():
+            for token in reply or []:
+                delta = SimpleNamespace(content=token)
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+        return chunks()
+
+    monkeypatch.setattr(pipeline.tts, "synthesize", synthesize)
+    monkeypatch.setattr(pipeline.tts, "synthesize_stream", synthesize_stream)
+    monkeypatch.setattr(litellm, "acompletion", acompletion)
+    return pipeline
+
+
+async def _play(turn, seconds: float | None = None) -> list:
+    """Consume a reply like the websocket does, cancelling it after `seconds`."""
+    items: list = []
+
+    async def consume() -> None:
+        async with aclosing(turn):
+            async for item in turn:
+                items.append(item)
+
+    task = asyncio.create_task(consume())
+    done, _ = await asyncio.wait([task], timeout=seconds)
+    if not done:
+        task.cancel()
+        await asyncio.wait([task])
+    return items
+
+
+def _history(pipeline: VoicePipeline) -> list[tuple[str, str]]:
+    return [(m["role"], m["content"]) for m in pipeline.llm.messages[1:]]
+
+
+async def test_assistant_transcript_waits_until_the_reply_has_played(monkeypatch):
+    pipeline = _pipeline(monkeypatch)
+    start = time.monotonic()
+    items = await _play(pipeline.stream_greeting("Hello, thanks for calling Acme."))
+    assert time.monotonic() - start >= 0.18
+    assert items[-1] == {
+        "type": "transcript",
+        "role": "assistant",
+        "text": "Hello, thanks for calling Acme.",
+    }
+    assert _history(pipeline) == [("assistant", "Hello, thanks for calling Acme.")]
+
+
+async def test_barge_in_cuts_a_fully_sent_reply_to_what_was_played(monkeypatch):
+    sentences = ["Our store opens at nine. ", "It closes at six on weekdays. ", "Bye for now!"]
+    pipeline = _pipeline(monkeypatch, reply=sentences)
+    # All audio is sent at once; only the first sentence has played after 0.3 s
+    items = await _play(pipeline.stream_user_turn("When are you open?"), seconds=0.3)
+
+    assert sum(len(i) for i in items if isinstance(i, bytes | memoryview)) == 3 * SENTENCE_BYTES
+    assert not any(isinstance(i, dict) and i["role"] == "assistant" for i in items)
+    assert pipeline.last_spoken == "Our store opens at nine."
+    assert _history(pipeline) == [
+        ("user", "When are you open?"),
+        ("assistant", "Our store opens at nine."),
+    ]
+
+
+async def test_barge_in_before_the_reply_starts_keeps_the_previous_one(monkeypatch):
+    pipeline = _pipeline(monkeypatch)
+    await _play(pipeline.stream_greeting("Hello, thanks for calling Acme."))
+
+    async def slow_retrieval(user_text: str):
+        await asyncio.sleep(10)
+
+    pipeline.collection_name = "kb_test"
+    monkeypatch.setattr(pipeline, "_retrieve", slow_retrieval)
+    await _play(pipeline.stream_user_turn("When are you open?"), seconds=0.05)
+
+    assert pipeline.last_spoken == ""
+    assert _history(pipeline) == [("assistant", "Hello, thanks for calling Acme.")]
+
+
+# ---------------------------------------------------------------------------
+# Retrieval
+# ---------------------------------------------------------------------------
+
+
+async def test_short_turns_without_a_knowledge_base_skip_embedding(monkeypatch):
+    embedded: list[str] = []
+
+    async def generate_embedding(text: str, api_key: str | None = None) -> list[float]:
+        embedded.append(text)
+        return [1.0, 0.0]
+
+    monkeypatch.setattr(pipeline_module, "generate_embedding", generate_embedding)
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_MIN_WORDS", 3)
+    pipeline = _pipeline(monkeypatch, reply=["Sure thing, one moment please."])
+    pipeline.response_cache_namespace = "ns"
+    pipeline.response_cache = SemanticResponseCache()
+
+    await _play(pipeline.stream_user_turn("Yes"))
+    assert embedded == []
+    await _play(pipeline.stream_user_turn("What are your opening hours?"))
+    assert embedded == ["What are your opening hours?"]
@@ -233,6 +233,9 @@
           addMessage(data.role, data.text);
         } else if (data.type === 'audio_end') {
           statusEl.textContent = 'Your turn';
+        } else if (data.type === 'audio_interrupted') {
+          audioQueue = [];
+          if (playingSource) playingSource.stop();
         } else if (data.type === 'error') {
           statusEl.textContent = data.message;
         }
@@ -255,6 +258,7 @@
   // Play audio response
   let audioQueue = [];
   let isPlaying = false;
+  let playingSource = null;
 
   async function playAudio(data) {
     audioQueue.push(data);
@@ -270,8 +274,10 @@
           const source = audioCtx.createBufferSource();
           source.buffer = audioBuffer;
           source.connect(audioCtx.destination);
+          playingSource = source;
           source.start();
           await new Promise(r => source.onended = r);
+          playingSource = null;
         } catch (e) {
           console.warn('Audio playback error:', e);
         }
@@ -41,6 +41,7 @@ export function LiveCall({ agentId, agentName }: Props) {
   const scrollRef = useRef<HTMLDivElement>(null);
   const audioQueueRef = useRef<ArrayBuffer[]>([]);
   const isPlayingRef = useRef(false);
+  const playingSourceRef = useRef<AudioBufferSourceNode | null>(null);
 
   // Auto-scroll transcripts
   useEffect(() => {
@@ -61,10 +62,12 @@ export function LiveCall({ agentId, agentName }: Props) {
         const source = ctx.createBufferSource();
         source.buffer = audioBuffer;
         source.connect(ctx.destination);
+        playingSourceRef.current = source;
         source.start();
         await new Promise<void>((resolve) => {
           source.onended = () => resolve();
         });
+        playingSourceRef.current = null;
       } catch {
         // If decoding fails (e.g., partial chunk), skip
       }
@@ -170,6 +173,10 @@ export function LiveCall({ agentId, agentName }: Props) {
           }
         } else if (msg.type === "audio_end") {
           // Audio playback will handle itself via the queue
+        } else if (msg.type === "audio_interrupted") {
+          // Caller barged in — stop the agent mid-sentence and drop the rest
+          audioQueueRef.current = [];
+          playingSourceRef.current?.stop();
         }
       } catch {
         // Not JSON, ignore